@@ -16,6 +16,42 @@ def wake(case):
     plt.xlabel("r(m)")
 
 
+def wake_history(filename, run=-1, movie=''):
+    """ animate the wake of a run recorded in a VortexRing wake_file,
+        saving the animation to the movie file if given
+    """
+    from matplotlib import animation
+    from Atlas.wake_recorder import read_wake
+
+    frames = read_wake(filename)
+    frames = frames[frames['run'] == np.unique(frames['run'])[run]]
+
+    rmax = np.max(frames['r'])
+    zmin, zmax = np.min(frames['z']), np.max(frames['z'])
+
+    fig = plt.figure()
+
+    def draw(i):
+        plt.cla()
+        plt.title("Free Wake (step %d)" % frames['step'][i])
+        n = frames['disks'][i]
+        r = frames['r'][i, :n]
+        z = frames['z'][i, :n]
+        plt.plot(r, z, "b-")
+        plt.plot(r, z, "bo")
+        plt.plot(-r, z, "b-")
+        plt.plot(-r, z, "bo")
+        plt.axis([-rmax, rmax, zmin, zmax])
+
+        plt.xlabel("r(m)")
+
+    anim = animation.FuncAnimation(fig, draw, frames=len(frames))
+    if movie:
+        anim.save(movie)
+    else:
+        plt.show()
+
+
 def aero_def(case):
     yE = np.array(case['aso.discrete.yE'])
     cE = np.array(case['aso.discrete.cE'])
@@ -12,7 +12,7 @@ kwargs = {'author': 'Tristan A. Hearn',
                  'Topic :: Scientific/Engineering'],
  'description': 'OpenMDAO implementation of the Aerovelo Atlas human-powered helicopter design problem',
  'download_url': '',
- 'entry_points': '[openmdao.component]\nAtlas.properties.DiscretizeProperties=Atlas.properties:DiscretizeProperties\nAtlas.properties.QuadSparProperties=Atlas.properties:QuadSparProperties\nAtlas.heli_opt_multipoint.Multipoint=Atlas.heli_opt_multipoint:Multipoint\nAtlas.heli_opt_multipoint.ConfigGravity=Atlas.heli_opt_multipoint:ConfigGravity\nAtlas.properties.JointSparProperties=Atlas.properties:JointSparProperties\nAtlas.coefficients.DragCoefficient=Atlas.coefficients:DragCoefficient\nAtlas.heli_opt_multipoint.ConfigHigh=Atlas.heli_opt_multipoint:ConfigHigh\nAtlas.vortex.VortexRing=Atlas.vortex:VortexRing\nAtlas.properties.SparProperties=Atlas.properties:SparProperties\nAtlas.configuration.AtlasConfiguration=Atlas.configuration:AtlasConfiguration\nAtlas.heli_opt_complex.HeliOpt=Atlas.heli_opt_complex:HeliOpt\nAtlas.heli_opt_multipoint.ConfigLow=Atlas.heli_opt_multipoint:ConfigLow\nAtlas.aerostructural.AeroStructural=Atlas.aerostructural:AeroStructural\nAtlas.heli_opt_multipoint.HeliOptM=Atlas.heli_opt_multipoint:HeliOptM\nAtlas.heli_opt_complex.AeroStructuralOpt=Atlas.heli_opt_complex:AeroStructuralOpt\nAtlas.heli_opt_multipoint.ConfigWind=Atlas.heli_opt_multipoint:ConfigWind\nAtlas.thrust.Thrust=Atlas.thrust:Thrust\nAtlas.heli_opt_complex.ConfigOpt=Atlas.heli_opt_complex:ConfigOpt\nAtlas.heli_opt_multipoint.AeroStructuralWind=Atlas.heli_opt_multipoint:AeroStructuralWind\nAtlas.aerostructural.Results=Atlas.aerostructural:Results\nAtlas.helicalc.HeliCalc=Atlas.helicalc:HeliCalc\nAtlas.properties.ChordProperties=Atlas.properties:ChordProperties\nAtlas.aerostructural.Switch=Atlas.aerostructural:Switch\nAtlas.thrust.ActuatorDiskInducedVelocity=Atlas.thrust:ActuatorDiskInducedVelocity\nAtlas.heli_opt_multipoint.AeroStructuralLow=Atlas.heli_opt_multipoint:AeroStructuralLow\nAtlas.structures.FEM=Atlas.structures:FEM\nAtlas.structures.Structures=Atlas.structures:Structures\nAtlas.lift_drag.LiftDrag=Atlas.lift_drag:LiftDrag\nAtlas.structures.Strains=Atlas.structures:Strains\nAtlas.heli_opt_multipoint.AeroStructuralGravity=Atlas.heli_opt_multipoint:AeroStructuralGravity\nAtlas.heli_opt_multipoint.AeroStructuralHigh=Atlas.heli_opt_multipoint:AeroStructuralHigh\nAtlas.aero.Aero2=Atlas.aero:Aero2\nAtlas.structures.MassProperties=Atlas.structures:MassProperties\nAtlas.aero.Aero=Atlas.aero:Aero\nAtlas.structures.Failures=Atlas.structures:Failures\n\n[openmdao.container]\nAtlas.properties.DiscretizeProperties=Atlas.properties:DiscretizeProperties\nAtlas.structures.Failure=Atlas.structures:Failure\nAtlas.properties.QuadSparProperties=Atlas.properties:QuadSparProperties\nAtlas.heli_opt_multipoint.Multipoint=Atlas.heli_opt_multipoint:Multipoint\nAtlas.properties.JointSparProperties=Atlas.properties:JointSparProperties\nAtlas.heli_opt_multipoint.ConfigGravity=Atlas.heli_opt_multipoint:ConfigGravity\nAtlas.lift_drag.Fblade=Atlas.lift_drag:Fblade\nAtlas.configuration.Flags=Atlas.configuration:Flags\nAtlas.structures.Strain=Atlas.structures:Strain\nAtlas.coefficients.DragCoefficient=Atlas.coefficients:DragCoefficient\nAtlas.heli_opt_multipoint.ConfigHigh=Atlas.heli_opt_multipoint:ConfigHigh\nAtlas.vortex.VortexRing=Atlas.vortex:VortexRing\nAtlas.properties.SparProperties=Atlas.properties:SparProperties\nAtlas.configuration.AtlasConfiguration=Atlas.configuration:AtlasConfiguration\nAtlas.properties.ChordProperties=Atlas.properties:ChordProperties\nAtlas.heli_opt_complex.HeliOpt=Atlas.heli_opt_complex:HeliOpt\nAtlas.heli_opt_multipoint.ConfigLow=Atlas.heli_opt_multipoint:ConfigLow\nAtlas.aerostructural.AeroStructural=Atlas.aerostructural:AeroStructural\nAtlas.heli_opt_multipoint.HeliOptM=Atlas.heli_opt_multipoint:HeliOptM\nAtlas.heli_opt_complex.AeroStructuralOpt=Atlas.heli_opt_complex:AeroStructuralOpt\nAtlas.heli_opt_multipoint.ConfigWind=Atlas.heli_opt_multipoint:ConfigWind\nAtlas.configuration.PrescribedLoad=Atlas.configuration:PrescribedLoad\nAtlas.thrust.Thrust=Atlas.thrust:Thrust\nAtlas.heli_opt_complex.ConfigOpt=Atlas.heli_opt_complex:ConfigOpt\nAtlas.heli_opt_multipoint.AeroStructuralWind=Atlas.heli_opt_multipoint:AeroStructuralWind\nAtlas.aerostructural.Results=Atlas.aerostructural:Results\nAtlas.helicalc.HeliCalc=Atlas.helicalc:HeliCalc\nAtlas.properties.JointProperties=Atlas.properties:JointProperties\nAtlas.aerostructural.Switch=Atlas.aerostructural:Switch\nAtlas.thrust.ActuatorDiskInducedVelocity=Atlas.thrust:ActuatorDiskInducedVelocity\nAtlas.heli_opt_multipoint.AeroStructuralLow=Atlas.heli_opt_multipoint:AeroStructuralLow\nAtlas.structures.FEM=Atlas.structures:FEM\nAtlas.structures.Structures=Atlas.structures:Structures\nAtlas.structures.BucklingFailure=Atlas.structures:BucklingFailure\nAtlas.lift_drag.LiftDrag=Atlas.lift_drag:LiftDrag\nAtlas.structures.MaterialFailure=Atlas.structures:MaterialFailure\nAtlas.structures.Strains=Atlas.structures:Strains\nAtlas.heli_opt_multipoint.AeroStructuralGravity=Atlas.heli_opt_multipoint:AeroStructuralGravity\nAtlas.heli_opt_multipoint.AeroStructuralHigh=Atlas.heli_opt_multipoint:AeroStructuralHigh\nAtlas.aero.Aero2=Atlas.aero:Aero2\nAtlas.structures.MassProperties=Atlas.structures:MassProperties\nAtlas.aero.Aero=Atlas.aero:Aero\nAtlas.structures.Failures=Atlas.structures:Failures',
+ 'entry_points': '[openmdao.component]\nAtlas.properties.DiscretizeProperties=Atlas.properties:DiscretizeProperties\nAtlas.properties.QuadSparProperties=Atlas.properties:QuadSparProperties\nAtlas.heli_opt_multipoint.Multipoint=Atlas.heli_opt_multipoint:Multipoint\nAtlas.heli_opt_multipoint.ConfigGravity=Atlas.heli_opt_multipoint:ConfigGravity\nAtlas.properties.JointSparProperties=Atlas.properties:JointSparProperties\nAtlas.coefficients.DragCoefficient=Atlas.coefficients:DragCoefficient\nAtlas.heli_opt_multipoint.ConfigHigh=Atlas.heli_opt_multipoint:ConfigHigh\nAtlas.vortex.VortexRing=Atlas.vortex:VortexRing\nAtlas.vortex_table.TabulatedInducedVelocity=Atlas.vortex_table:TabulatedInducedVelocity\nAtlas.properties.SparProperties=Atlas.properties:SparProperties\nAtlas.configuration.AtlasConfiguration=Atlas.configuration:AtlasConfiguration\nAtlas.heli_opt_complex.HeliOpt=Atlas.heli_opt_complex:HeliOpt\nAtlas.heli_opt_multipoint.ConfigLow=Atlas.heli_opt_multipoint:ConfigLow\nAtlas.aerostructural.AeroStructural=Atlas.aerostructural:AeroStructural\nAtlas.heli_opt_multipoint.HeliOptM=Atlas.heli_opt_multipoint:HeliOptM\nAtlas.heli_opt_complex.AeroStructuralOpt=Atlas.heli_opt_complex:AeroStructuralOpt\nAtlas.heli_opt_multipoint.ConfigWind=Atlas.heli_opt_multipoint:ConfigWind\nAtlas.thrust.Thrust=Atlas.thrust:Thrust\nAtlas.heli_opt_complex.ConfigOpt=Atlas.heli_opt_complex:ConfigOpt\nAtlas.heli_opt_multipoint.AeroStructuralWind=Atlas.heli_opt_multipoint:AeroStructuralWind\nAtlas.aerostructural.Results=Atlas.aerostructural:Results\nAtlas.helicalc.HeliCalc=Atlas.helicalc:HeliCalc\nAtlas.properties.ChordProperties=Atlas.properties:ChordProperties\nAtlas.aerostructural.Switch=Atlas.aerostructural:Switch\nAtlas.thrust.ActuatorDiskInducedVelocity=Atlas.thrust:ActuatorDiskInducedVelocity\nAtlas.heli_opt_multipoint.AeroStructuralLow=Atlas.heli_opt_multipoint:AeroStructuralLow\nAtlas.structures.FEM=Atlas.structures:FEM\nAtlas.structures.Structures=Atlas.structures:Structures\nAtlas.lift_drag.LiftDrag=Atlas.lift_drag:LiftDrag\nAtlas.blade_element.BladeElement=Atlas.blade_element:BladeElement\nAtlas.structures.Strains=Atlas.structures:Strains\nAtlas.heli_opt_multipoint.AeroStructuralGravity=Atlas.heli_opt_multipoint:AeroStructuralGravity\nAtlas.heli_opt_multipoint.AeroStructuralHigh=Atlas.heli_opt_multipoint:AeroStructuralHigh\nAtlas.aero.Aero2=Atlas.aero:Aero2\nAtlas.structures.MassProperties=Atlas.structures:MassProperties\nAtlas.aero.Aero=Atlas.aero:Aero\nAtlas.structures.Failures=Atlas.structures:Failures\n\n[openmdao.container]\nAtlas.properties.DiscretizeProperties=Atlas.properties:DiscretizeProperties\nAtlas.structures.Failure=Atlas.structures:Failure\nAtlas.properties.QuadSparProperties=Atlas.properties:QuadSparProperties\nAtlas.heli_opt_multipoint.Multipoint=Atlas.heli_opt_multipoint:Multipoint\nAtlas.properties.JointSparProperties=Atlas.properties:JointSparProperties\nAtlas.heli_opt_multipoint.ConfigGravity=Atlas.heli_opt_multipoint:ConfigGravity\nAtlas.lift_drag.Fblade=Atlas.lift_drag:Fblade\nAtlas.configuration.Flags=Atlas.configuration:Flags\nAtlas.structures.Strain=Atlas.structures:Strain\nAtlas.coefficients.DragCoefficient=Atlas.coefficients:DragCoefficient\nAtlas.heli_opt_multipoint.ConfigHigh=Atlas.heli_opt_multipoint:ConfigHigh\nAtlas.vortex.VortexRing=Atlas.vortex:VortexRing\nAtlas.vortex_table.TabulatedInducedVelocity=Atlas.vortex_table:TabulatedInducedVelocity\nAtlas.properties.SparProperties=Atlas.properties:SparProperties\nAtlas.configuration.AtlasConfiguration=Atlas.configuration:AtlasConfiguration\nAtlas.properties.ChordProperties=Atlas.properties:ChordProperties\nAtlas.heli_opt_complex.HeliOpt=Atlas.heli_opt_complex:HeliOpt\nAtlas.heli_opt_multipoint.ConfigLow=Atlas.heli_opt_multipoint:ConfigLow\nAtlas.aerostructural.AeroStructural=Atlas.aerostructural:AeroStructural\nAtlas.heli_opt_multipoint.HeliOptM=Atlas.heli_opt_multipoint:HeliOptM\nAtlas.heli_opt_complex.AeroStructuralOpt=Atlas.heli_opt_complex:AeroStructuralOpt\nAtlas.heli_opt_multipoint.ConfigWind=Atlas.heli_opt_multipoint:ConfigWind\nAtlas.configuration.PrescribedLoad=Atlas.configuration:PrescribedLoad\nAtlas.thrust.Thrust=Atlas.thrust:Thrust\nAtlas.heli_opt_complex.ConfigOpt=Atlas.heli_opt_complex:ConfigOpt\nAtlas.heli_opt_multipoint.AeroStructuralWind=Atlas.heli_opt_multipoint:AeroStructuralWind\nAtlas.aerostructural.Results=Atlas.aerostructural:Results\nAtlas.helicalc.HeliCalc=Atlas.helicalc:HeliCalc\nAtlas.properties.JointProperties=Atlas.properties:JointProperties\nAtlas.aerostructural.Switch=Atlas.aerostructural:Switch\nAtlas.thrust.ActuatorDiskInducedVelocity=Atlas.thrust:ActuatorDiskInducedVelocity\nAtlas.heli_opt_multipoint.AeroStructuralLow=Atlas.heli_opt_multipoint:AeroStructuralLow\nAtlas.structures.FEM=Atlas.structures:FEM\nAtlas.structures.Structures=Atlas.structures:Structures\nAtlas.structures.BucklingFailure=Atlas.structures:BucklingFailure\nAtlas.lift_drag.LiftDrag=Atlas.lift_drag:LiftDrag\nAtlas.blade_element.BladeElement=Atlas.blade_element:BladeElement\nAtlas.structures.MaterialFailure=Atlas.structures:MaterialFailure\nAtlas.structures.Strains=Atlas.structures:Strains\nAtlas.heli_opt_multipoint.AeroStructuralGravity=Atlas.heli_opt_multipoint:AeroStructuralGravity\nAtlas.heli_opt_multipoint.AeroStructuralHigh=Atlas.heli_opt_multipoint:AeroStructuralHigh\nAtlas.aero.Aero2=Atlas.aero:Aero2\nAtlas.structures.MassProperties=Atlas.structures:MassProperties\nAtlas.aero.Aero=Atlas.aero:Aero\nAtlas.structures.Failures=Atlas.structures:Failures',
  'include_package_data': True,
  'install_requires': ['openmdao.main'],
  'keywords': ['openmdao'],
@@ -81,12 +81,15 @@ kwargs = {'author': 'Tristan A. Hearn',
                             'test/test_configuration.py',
                             'test/test_helicalc.py',
                             'test/test_lift_drag.py',
+                            'test/test_blade_element.py',
                             'test/test_multipoint.py',
+                            'test/test_polars.py',
                             'test/test_properties.py',
                             'test/test_results.py',
                             'test/test_structures.py',
                             'test/test_thrust.py',
                             'test/test_vortex.py',
+                            'test/test_vortex_table.py',
                             'test/testvals.py',
                             'test/vortex.mat']},
  'package_dir': {'': 'src'},
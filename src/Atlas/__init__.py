@@ -1,12 +1,16 @@
 from configuration import Flags, AtlasConfiguration
-from coefficients import DragCoefficient, frictionCoefficient
+from coefficients import DragCoefficient, frictionCoefficient, dragCoefficient, dragCoefficientFit
 from properties import prepreg_properties, wire_properties, DiscretizeProperties, \
                        JointProperties, SparProperties, ChordProperties
 from structures import PrescribedLoad, Strain, \
-                       MassProperties, FEM, Strains, Failures, Structures
+                       MassProperties, FEM, Strains, Failures, Structures, LOAD_CASES
+from polars import PolarDatabase, save_polars, load_polars, clear_polars
 from lift_drag import LiftDrag, Fblade
-from vortex import VortexRing
-from vortexC import VortexRingC
+from blade_element import BladeElement
+from wake_recorder import WakeRecorder, read_wake
+from vortex import VortexRing, vortex_ring_batch
+from vortexC import VortexRingC, vortex_ring_batchC
+from vortex_table import build_vortex_table, TabulatedInducedVelocity
 from thrust import Thrust, ActuatorDiskInducedVelocity
 from aero import Aero, Aero2
 from aerostructural import AeroStructural, Results
@@ -1,10 +1,10 @@
 
 from openmdao.main.api import Assembly
-from openmdao.main.datatypes.api import Int, Float, Array
+from openmdao.main.datatypes.api import Int, Float, Array, Bool
 
 import numpy as np
 
-from Atlas import Thrust, ActuatorDiskInducedVelocity, LiftDrag
+from Atlas import Thrust, ActuatorDiskInducedVelocity, BladeElement, TabulatedInducedVelocity
 # from Atlas import VortexRing
 from Atlas import VortexRingC as VortexRing  # use cython compiled version
 
@@ -68,42 +68,46 @@ class Aero(Assembly):
         self.connect('rho',       'induced.rho')
         self.connect('thrust.dT', 'induced.dT')
 
-        self.add('lift_drag', LiftDrag(Ns))
-        self.connect('yN',         'lift_drag.yN')
-        self.connect('Ns',         'lift_drag.Ns')
-        self.connect('dr',         'lift_drag.dr')
-        self.connect('r',          'lift_drag.r')
-        self.connect('rho',        'lift_drag.rho')
-        self.connect('visc',       'lift_drag.visc')
-        self.connect('vw',         'lift_drag.vw')
-        self.connect('vc',         'lift_drag.vc')
-        self.connect('Omega',      'lift_drag.Omega')
-        self.connect('c',          'lift_drag.c')
-        self.connect('Cl',         'lift_drag.Cl')
-        self.connect('d',          'lift_drag.d')
-        self.connect('yWire',      'lift_drag.yWire')
-        self.connect('zWire',      'lift_drag.zWire')
-        self.connect('tWire',      'lift_drag.tWire')
-        self.connect('Cm',         'lift_drag.Cm')
-        self.connect('xtU',        'lift_drag.xtU')
-        self.connect('xtL',        'lift_drag.xtL')
-        self.connect('induced.vi', 'lift_drag.vi')
-        self.connect('thrust.chordFrac', 'lift_drag.chordFrac')
+        self.add('blade', BladeElement(Ns))
+        self.connect('yN',         'blade.yN')
+        self.connect('Ns',         'blade.Ns')
+        self.connect('ycmax',      'blade.ycmax')
+        self.connect('dr',         'blade.dr')
+        self.connect('r',          'blade.r')
+        self.connect('rho',        'blade.rho')
+        self.connect('visc',       'blade.visc')
+        self.connect('vw',         'blade.vw')
+        self.connect('vc',         'blade.vc')
+        self.connect('Omega',      'blade.Omega')
+        self.connect('c',          'blade.c')
+        self.connect('Cl',         'blade.Cl')
+        self.connect('d',          'blade.d')
+        self.connect('yWire',      'blade.yWire')
+        self.connect('zWire',      'blade.zWire')
+        self.connect('tWire',      'blade.tWire')
+        self.connect('Cm',         'blade.Cm')
+        self.connect('xtU',        'blade.xtU')
+        self.connect('xtL',        'blade.xtL')
+        self.connect('induced.vi', 'blade.vi')
 
         self.create_passthrough('induced.vi')
-        self.create_passthrough('lift_drag.phi')
-        self.create_passthrough('lift_drag.Re')
-        self.create_passthrough('lift_drag.Cd')
-        self.create_passthrough('lift_drag.Fblade')
+        self.create_passthrough('blade.phi')
+        self.create_passthrough('blade.Re')
+        self.create_passthrough('blade.Cd')
+        self.create_passthrough('blade.Fblade')
 
         self.driver.workflow.add('thrust')
         self.driver.workflow.add('induced')
-        self.driver.workflow.add('lift_drag')
+        self.driver.workflow.add('blade')
 
 
 class Aero2(Assembly):
+    """ Aero with the free-wake (VortexRing) induced velocity, or with the
+        induced velocity interpolated from the given table file (see
+        build_vortex_table)
+    """
 
-    def __init__(self, Ns):
+    def __init__(self, Ns, table=''):
         super(Aero2, self).__init__()
 
         # inputs
@@ -141,6 +145,21 @@ class Aero2(Assembly):
 
         self.add('anhedral', Float(iotype='in'))
 
+        self.add('Nw',       Int(0,   iotype='in', desc='number of wake time steps, 0 to set from Ns'))
+        self.add('Ntt',      Int(0,   iotype='in', desc='number of substeps per time step, 0 to set from Ns'))
+        self.add('Ntheta',   Int(0,   iotype='in', desc='number of quadrature stations on each ring, 0 to set from Ns'))
+        self.add('vi_tol',   Float(0., iotype='in',
+                                   desc='relative change in vi between time steps to stop adding wake disks, '
+                                        '0 to march all Nw steps'))
+        self.add('far_wake', Int(0,   iotype='in',
+                                 desc='number of wake disks below which the wake is closed by semi-infinite '
+                                      'vortex cylinders, 0 for no far-wake closure'))
+        self.add('frozen_wake', Bool(False, iotype='in',
+                                     desc='evaluate vi from the influence matrix of a stored wake geometry'))
+        self.add('frozen_tol',  Float(0.01, iotype='in',
+                                      desc='relative change in rotor deflection, height or time step since the '
+                                           'stored wake beyond which the wake is marched again'))
+
         # configure
         self.add('thrust', Thrust(Ns))
         self.connect('Ns',        'thrust.Ns')
@@ -153,46 +172,58 @@ class Aero2(Assembly):
         self.connect('rho',       'thrust.rho')
         self.connect('Omega',     'thrust.Omega')
 
-        self.add('induced', VortexRing(Ns))
+        if table:
+            self.add('induced', TabulatedInducedVelocity(Ns))
+            self.induced.table = table
+        else:
+            self.add('induced', VortexRing(Ns))
         self.connect('yN',        'induced.yN')
         self.connect('Ns',        'induced.Ns')
         self.connect('b',         'induced.b')
         self.connect('h',         'induced.h')
-        self.connect('vc',        'induced.vc')
         self.connect('rho',       'induced.rho')
         self.connect('thrust.dT', 'induced.dT')
         self.connect('Omega',     'induced.Omega')
-        self.connect('q',         'induced.q')
-        self.connect('anhedral',  'induced.anhedral')
-
-        self.add('lift_drag', LiftDrag(Ns))
-        self.connect('yN',         'lift_drag.yN')
-        self.connect('Ns',         'lift_drag.Ns')
-        self.connect('dr',         'lift_drag.dr')
-        self.connect('r',          'lift_drag.r')
-        self.connect('rho',        'lift_drag.rho')
-        self.connect('visc',       'lift_drag.visc')
-        self.connect('vw',         'lift_drag.vw')
-        self.connect('vc',         'lift_drag.vc')
-        self.connect('Omega',      'lift_drag.Omega')
-        self.connect('c',          'lift_drag.c')
-        self.connect('Cl',         'lift_drag.Cl')
-        self.connect('d',          'lift_drag.d')
-        self.connect('yWire',      'lift_drag.yWire')
-        self.connect('zWire',      'lift_drag.zWire')
-        self.connect('tWire',      'lift_drag.tWire')
-        self.connect('Cm',         'lift_drag.Cm')
-        self.connect('xtU',        'lift_drag.xtU')
-        self.connect('xtL',        'lift_drag.xtL')
-        self.connect('induced.vi', 'lift_drag.vi')
-        self.connect('thrust.chordFrac', 'lift_drag.chordFrac')
+        if not table:
+            self.connect('vc',        'induced.vc')
+            self.connect('q',         'induced.q')
+            self.connect('anhedral',  'induced.anhedral')
+            self.connect('Nw',        'induced.Nw')
+            self.connect('Ntt',       'induced.Ntt')
+            self.connect('Ntheta',    'induced.Ntheta')
+            self.connect('vi_tol',    'induced.vi_tol')
+            self.connect('far_wake',  'induced.far_wake')
+            self.connect('frozen_wake', 'induced.frozen_wake')
+            self.connect('frozen_tol',  'induced.frozen_tol')
+
+        self.add('blade', BladeElement(Ns))
+        self.connect('yN',         'blade.yN')
+        self.connect('Ns',         'blade.Ns')
+        self.connect('ycmax',      'blade.ycmax')
+        self.connect('dr',         'blade.dr')
+        self.connect('r',          'blade.r')
+        self.connect('rho',        'blade.rho')
+        self.connect('visc',       'blade.visc')
+        self.connect('vw',         'blade.vw')
+        self.connect('vc',         'blade.vc')
+        self.connect('Omega',      'blade.Omega')
+        self.connect('c',          'blade.c')
+        self.connect('Cl',         'blade.Cl')
+        self.connect('d',          'blade.d')
+        self.connect('yWire',      'blade.yWire')
+        self.connect('zWire',      'blade.zWire')
+        self.connect('tWire',      'blade.tWire')
+        self.connect('Cm',         'blade.Cm')
+        self.connect('xtU',        'blade.xtU')
+        self.connect('xtL',        'blade.xtL')
+        self.connect('induced.vi', 'blade.vi')
 
         self.create_passthrough('induced.vi')
-        self.create_passthrough('lift_drag.phi')
-        self.create_passthrough('lift_drag.Re')
-        self.create_passthrough('lift_drag.Cd')
-        self.create_passthrough('lift_drag.Fblade')
+        self.create_passthrough('blade.phi')
+        self.create_passthrough('blade.Re')
+        self.create_passthrough('blade.Cd')
+        self.create_passthrough('blade.Fblade')
 
         self.driver.workflow.add('thrust')
         self.driver.workflow.add('induced')
-        self.driver.workflow.add('lift_drag')
+        self.driver.workflow.add('blade')
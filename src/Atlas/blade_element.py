@@ -0,0 +1,197 @@
+import numpy as np
+
+from openmdao.main.api import Component
+from openmdao.main.datatypes.api import Int, Float, Array, Str, VarTree
+
+from lift_drag import Fblade, LOAD_ELEMENTS, LOAD_OUTPUTS, elements, \
+                      wire_length, wire_length_partials, blade_loads, blade_loads_partials, \
+                      loads_jacobian
+from derivatives import apply_jacobian, apply_jacobianT
+from polars import load_polars
+
+
+def chord_fraction(yN, ycmax):
+    """ fraction of each element covered by the chord, with the transitional
+        partial element at ycmax
+    """
+    yN = elements(yN, None)
+
+    chordFrac = np.ones(len(yN) - 1, dtype=np.result_type(yN, ycmax))
+    sTrans = np.nonzero(np.real(yN) < np.real(ycmax))[0][-1]
+    chordFrac[sTrans] = yN[sTrans+1] - ycmax / (yN[sTrans+1] - yN[sTrans])
+
+    return chordFrac
+
+
+def chord_fraction_partials(yN, ycmax):
+    """ derivatives of chord_fraction with respect to yN (Ns, Ns+1) and
+        ycmax
+    """
+    yN = elements(yN, None)
+    Ns = len(yN) - 1
+
+    dyN = np.zeros((Ns, Ns+1))
+    dycmax = np.zeros(Ns)
+
+    sTrans = np.nonzero(yN < ycmax)[0][-1]
+    dy = yN[sTrans+1] - yN[sTrans]
+    dyN[sTrans, sTrans] = -ycmax / dy**2
+    dyN[sTrans, sTrans+1] = 1. + ycmax / dy**2
+    dycmax[sTrans] = -1. / dy
+
+    return dyN, dycmax
+
+
+def blade_thrust(chordFrac, rho, Omega, r, Cl, c, dr):
+    """ thrust of each element assuming small angles """
+    return chordFrac * 0.5 * rho * (Omega * r)**2 * Cl * c * dr
+
+
+def blade_thrust_partials(chordFrac, rho, Omega, r, Cl, c, dr):
+    """ derivatives of the thrust of each element (blade_thrust) with
+        respect to each argument
+    """
+    T = 0.5 * (Omega * r)**2 * Cl * c * dr
+    return {'chordFrac': rho * T,
+            'rho':       chordFrac * T,
+            'Omega':     chordFrac * rho * Omega * r**2 * Cl * c * dr,
+            'r':         chordFrac * rho * Omega**2 * r * Cl * c * dr,
+            'Cl':        chordFrac * 0.5 * rho * (Omega * r)**2 * c * dr,
+            'c':         chordFrac * 0.5 * rho * (Omega * r)**2 * Cl * dr,
+            'dr':        chordFrac * 0.5 * rho * (Omega * r)**2 * Cl * c}
+
+
+def thrust_jacobian(chordFrac, rho, Omega, r, Cl, c, dr, yN, ycmax):
+    """ Jacobian blocks J[output, input] of the thrust dT and chordFrac of
+        the elements
+    """
+    partials = blade_thrust_partials(chordFrac, rho, Omega, r, Cl, c, dr)
+    dyN, dycmax = chord_fraction_partials(yN, ycmax)
+
+    J = {}
+    for name in ('r', 'Cl', 'c', 'dr'):
+        J['dT', name] = np.diag(partials[name])
+    for name in ('rho', 'Omega'):
+        J['dT', name] = partials[name].reshape(-1, 1)
+    J['dT', 'yN'] = partials['chordFrac'][:, np.newaxis] * dyN
+    J['dT', 'ycmax'] = (partials['chordFrac'] * dycmax).reshape(-1, 1)
+    J['chordFrac', 'yN'] = dyN
+    J['chordFrac', 'ycmax'] = dycmax.reshape(-1, 1)
+
+    return J
+
+
+class BladeElement(Component):
+    """ Thrust, lift and drag of the blade elements, evaluated for all
+        elements at once. Replaces LiftDrag in Aero and Aero2, where Thrust
+        stays to feed the induced velocity (induced.dT), which this
+        component depends on through vi, so taking dT from it would make a
+        dataflow cycle.
+    """
+
+    def __init__(self, Ns):
+        super(BladeElement, self).__init__()
+
+        # inputs
+        self.add('Ns',        Int(0, iotype='in', desc='number of elements'))
+
+        self.add('yN',        Array(np.zeros(Ns+1), iotype='in', desc='node locations'))
+        self.add('dr',        Array(np.zeros(Ns),   iotype='in', desc='length of each element'))
+        self.add('r',         Array(np.zeros(Ns),   iotype='in', desc='radial location of each element'))
+
+        self.add('ycmax',     Float(0., iotype='in'))
+
+        self.add('rho',       Float(0., iotype='in', desc='air density'))
+        self.add('visc',      Float(0., iotype='in', desc='air viscosity'))
+        self.add('vw',        Float(0., iotype='in', desc='wind velocity'))
+        self.add('vc',        Float(0., iotype='in', desc='vertical velocity'))
+        self.add('Omega',     Float(0., iotype='in', desc='rotor angular velocity'))
+
+        self.add('vi',        Array(np.zeros(Ns), iotype='in', desc='induced downwash distribution'))
+        self.add('c',         Array(np.zeros(Ns), iotype='in', desc='chord distribution'))
+        self.add('Cl',        Array(np.zeros(Ns), iotype='in', desc='lift coefficient distribution'))
+        self.add('d',         Array(np.zeros(Ns), iotype='in', desc='spar diameter distribution'))
+
+        self.add('yWire',     Array([0], iotype='in', desc='location of wire attachment along span'))
+        self.add('zWire',     Float(0.,  iotype='in', desc='depth of wire attachement'))
+        self.add('tWire',     Float(0.,  iotype='in', desc='thickness of wire'))
+
+        self.add('Cm',        Array(np.zeros(Ns), iotype='in', desc=''))
+        self.add('xtU',       Array(np.zeros(Ns), iotype='in', desc='fraction of laminar flow on the upper surface'))
+        self.add('xtL',       Array(np.zeros(Ns), iotype='in', desc='fraction of laminar flow on the lower surface'))
+        self.add('tc',        Array(np.zeros(Ns), iotype='in', desc='thickness to chord ratio of the airfoil'))
+
+        self.add('Cdfit',     Int(1, iotype='in', desc='0 - analytic model for drag coefficient, 1 - curve fit on BE airfoils'))
+
+        self.add('polars',    Str('', iotype='in', desc='airfoil polar file (see save_polars) for Cd and Cm, '
+                                                        'empty for the Cdfit model and the Cm input'))
+        self.add('airfoil',   Array(np.zeros(Ns, dtype=int), iotype='in', desc='airfoil number of each element in the polars'))
+
+        # outputs
+        self.add('dT',        Array(np.zeros((Ns, 1)), iotype='out', desc='thrust'))
+        self.add('chordFrac', Array(np.zeros(Ns), iotype='out'))
+        self.add('Re',        Array(np.zeros(Ns), iotype='out', desc='Reynolds number'))
+        self.add('Cd',        Array(np.zeros(Ns), iotype='out', desc='drag coefficients'))
+        self.add('phi',       Array(np.zeros(Ns), iotype='out', desc=''))
+        self.add('Fblade',    VarTree(Fblade(Ns), iotype='out', desc=''))
+
+    def execute(self):
+        Ns = self.Ns
+
+        r, dr, c, Cl = [elements(getattr(self, name), Ns) for name in ('r', 'dr', 'c', 'Cl')]
+
+        chordFrac = chord_fraction(self.yN, self.ycmax)
+        Lwire = wire_length(self.yN, dr, self.yWire, self.zWire).sum(axis=1)
+
+        self.chordFrac = chordFrac
+        self.dT = blade_thrust(chordFrac, self.rho, self.Omega, r, Cl, c, dr).reshape(Ns, 1)
+
+        self.Re, self.Cd, self.phi, loads = \
+            blade_loads(self.rho, self.visc, self.vw, self.vc, self.Omega,
+                        **self.load_inputs(chordFrac, Lwire))
+
+        Fblade = self.Fblade
+        Fblade.Fx, Fblade.Fz, Fblade.My, Fblade.Q, Fblade.P, Fblade.Pi, Fblade.Pp = loads
+
+    def load_inputs(self, chordFrac, Lwire):
+        """ element inputs of blade_loads """
+        inputs = dict((name, elements(getattr(self, name), self.Ns))
+                      for name in LOAD_ELEMENTS if name not in ('Lwire', 'chordFrac'))
+        inputs.update(chordFrac=chordFrac, Lwire=Lwire, tWire=self.tWire, Cdfit=self.Cdfit)
+        if self.polars:
+            inputs.update(polars=load_polars(self.polars),
+                          airfoil=np.asarray(self.airfoil, dtype=int).flatten()[:self.Ns])
+        return inputs
+
+    def list_deriv_vars(self):
+        return ('yN', 'ycmax', 'r', 'vi', 'c', 'Cl', 'dr', 'd', 'yWire', 'zWire', 'tWire',
+                'Cm', 'xtU', 'xtL', 'tc') + ('rho', 'visc', 'vw', 'vc', 'Omega'), ('dT', 'chordFrac') + LOAD_OUTPUTS
+
+    def linearize(self):
+        """ Jacobian of the thrust, lift and drag """
+        Ns = self.Ns
+
+        r, dr, c, Cl = [elements(getattr(self, name), Ns) for name in ('r', 'dr', 'c', 'Cl')]
+
+        chordFrac = chord_fraction(self.yN, self.ycmax)
+        dyN, dycmax = chord_fraction_partials(self.yN, self.ycmax)
+        Lwire = wire_length(self.yN, dr, self.yWire, self.zWire).sum(axis=1)
+
+        partials = blade_loads_partials(self.rho, self.visc, self.vw, self.vc, self.Omega,
+                                        **self.load_inputs(chordFrac, Lwire))
+        wire = wire_length_partials(self.yN, dr, self.yWire, self.zWire)
+
+        self.J = thrust_jacobian(chordFrac, self.rho, self.Omega, r, Cl, c, dr, self.yN, self.ycmax)
+        self.J.update(loads_jacobian(partials, wire))
+
+        # loads through the chord fraction
+        for k, out in enumerate(LOAD_OUTPUTS):
+            dchordFrac = partials['chordFrac'][k]
+            self.J[out, 'yN'] = self.J[out, 'yN'] + dchordFrac[:, np.newaxis] * dyN
+            self.J[out, 'ycmax'] = (dchordFrac * dycmax).reshape(-1, 1)
+
+    def apply_deriv(self, arg, result):
+        apply_jacobian(self.J, arg, result)
+
+    def apply_derivT(self, arg, result):
+        apply_jacobianT(self.J, arg, result)
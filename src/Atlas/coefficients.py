@@ -1,29 +1,99 @@
 from openmdao.main.api import Component
 from openmdao.lib.datatypes.api import Float
-from math import sqrt
+
+import numpy as np
 
 
 def frictionCoefficient(Re, xtc):
-    """ Computes Cf of a flat plate at Re, with xtc fraction of laminar flow
+    """ Computes Cf of a flat plate at Re, with xtc fraction of laminar flow.
+        Re and xtc may be arrays (broadcast against each other) and complex;
+        the regime of each point is chosen from the real part of xtc.
     """
+    Re, xtc = np.broadcast_arrays(np.asarray(Re), np.asarray(xtc))
+
+    turbulent = np.real(xtc) == 0
+    laminar = np.real(xtc) == 1
+    mixed = ~(turbulent | laminar)
+
+    # transition fraction in the partially laminar range only, so the
+    # fully turbulent and fully laminar points stay finite
+    x = np.where(mixed, xtc, 0.5)
+
     # Fully turbulent
-    if xtc == 0:
-        Cfflat = 0.072/(Re)**0.2
+    Cfturbulent = 0.072/Re**0.2
     # Fully laminar
-    elif xtc == 1:
-        Cfflat = (1.328/sqrt(Re))
+    Cflaminar = 1.328/np.sqrt(Re)
     # Partially laminar
-    else:
-        Cflam = (1.328/sqrt(Re))*xtc**(-0.5)             # Cf of laminar part
-        deltalamc = (5/sqrt(Re))*sqrt(xtc)               # boundary layer thickness, delta/c, of laminar part
-        deltaturbc = (0.13/0.097)*deltalamc              # boundary layer thickness, delta/c, of turbulent part
-        x0c = xtc - (Re**0.2*deltaturbc/0.375)**(1/0.8)  # imaginary start point of turbulent BL
-        CfturbFull = 0.072/((1-x0c)*Re)**0.2             # Cf of flat plate of length c-x0
-        CfturbStart = 0.072/((xtc-x0c)*Re)**0.2          # Cf of imaginary part of turb BL
-        Cfturb = (CfturbFull*(1-x0c) - CfturbStart*(xtc-x0c))/(1-xtc)  # Cf of turbulent part
-        Cfflat = Cflam*xtc + Cfturb*(1-xtc)
+    Cflam = Cflaminar*x**(-0.5)                     # Cf of laminar part
+    deltalamc = (5/np.sqrt(Re))*np.sqrt(x)          # boundary layer thickness, delta/c, of laminar part
+    deltaturbc = (0.13/0.097)*deltalamc             # boundary layer thickness, delta/c, of turbulent part
+    x0c = x - (Re**0.2*deltaturbc/0.375)**(1/0.8)   # imaginary start point of turbulent BL
+    CfturbFull = 0.072/((1-x0c)*Re)**0.2            # Cf of flat plate of length c-x0
+    CfturbStart = 0.072/((x-x0c)*Re)**0.2           # Cf of imaginary part of turb BL
+    Cfturb = (CfturbFull*(1-x0c) - CfturbStart*(x-x0c))/(1-x)  # Cf of turbulent part
+    Cfmixed = Cflam*x + Cfturb*(1-x)
+
+    Cfflat = np.where(turbulent, Cfturbulent, np.where(laminar, Cflaminar, Cfmixed))
+    return Cfflat[()]
+
+
+def dragCoefficient(Re, tc, xtcU, xtcL):
+    """ Computes the drag coefficient of an airfoil at Reynolds number Re,
+        with thickness to chord ratio tc and xtcU and xtcL fraction of
+        laminar flow on the upper and lower surfaces, from the friction of a
+        flat plate with a form factor. Accepts arrays like frictionCoefficient.
+    """
+    CfU = frictionCoefficient(Re, xtcU)
+    CfL = frictionCoefficient(Re, xtcL)
+    Cfflat = (CfU + CfL)/2
+    return 2*Cfflat*(1 + 2*tc + 60*tc**4)
+
+
+def dragCoefficientFit(Re, xtcU, xtcL):
+    """ Computes the drag coefficient of an airfoil at Reynolds number Re,
+        with xtcU and xtcL fraction of laminar flow on the upper and lower
+        surfaces respectively. The result is a fit on existing HPH airfoils.
+        Accepts arrays like frictionCoefficient.
+    """
+    Cf15_15 = 0.6798*Re**(-0.283)
+    Cf60_100 = 22.09*Re**(-0.604)
+
+    xtc = xtcU + xtcL
+    return Cf15_15 + (Cf60_100 - Cf15_15)*(xtc - 0.3)/(1.6 - 0.3)
+
+
+def sectionDragCoefficient(Re, tc, xtcU, xtcL, Cdfit=1):
+    """ drag coefficient of the wing sections with the model selected by
+        Flags.Cdfit (0 - analytic model, 1 - curve fit on HPH airfoils)
+    """
+    if Cdfit == 0:
+        return dragCoefficient(Re, tc, xtcU, xtcL)
+    return dragCoefficientFit(Re, xtcU, xtcL)
+
+
+def sectionDragPartials(Re, tc, xtcU, xtcL, Cdfit=1):
+    """ derivatives of each point of sectionDragCoefficient with respect to
+        Re, tc, xtcU and xtcL. The curve fit is differentiated analytically,
+        the analytic model by complex step of each argument (the points are
+        independent, so one step per argument).
+    """
+    if Cdfit == 0:
+        args = [np.asarray(a, dtype=float) for a in np.broadcast_arrays(Re, tc, xtcU, xtcL)]
+        h = 1e-30
+        partials = []
+        for i in range(4):
+            step = list(args)
+            step[i] = step[i] + 1j*h
+            partials.append(np.imag(dragCoefficient(*step)) / h)
+        return tuple(partials)
+
+    Cf15_15 = 0.6798*Re**(-0.283)
+    Cf60_100 = 22.09*Re**(-0.604)
 
-    return Cfflat
+    xtc = xtcU + xtcL
+    dxtc = (Cf60_100 - Cf15_15)/(1.6 - 0.3)
+    dRe = (-0.283*Cf15_15 + (-0.604*Cf60_100 + 0.283*Cf15_15)*(xtc - 0.3)/(1.6 - 0.3))/Re
+    return dRe, 0.*dRe, dxtc + 0.*dRe, dxtc + 0.*dRe
 
 
 class DragCoefficient(Component):
@@ -37,7 +107,4 @@ class DragCoefficient(Component):
     Cd   = Float(0., iotype='out', desc='')
 
     def execute(self):
-        CfU = frictionCoefficient(self.Re, self.xtcU)
-        CfL = frictionCoefficient(self.Re, self.xtcL)
-        Cfflat = (CfU + CfL)/2
-        self.Cd = 2*Cfflat*(1 + 2*self.tc + 60*self.tc**4)
+        self.Cd = dragCoefficient(self.Re, self.tc, self.xtcU, self.xtcL)
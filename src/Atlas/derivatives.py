@@ -0,0 +1,77 @@
+import numpy as np
+
+
+def get_value(comp, name):
+    """ value of a variable of comp, including the variables of its
+        variable trees ('Fblade.Fx')
+    """
+    value = comp
+    for part in name.split('.'):
+        value = getattr(value, part)
+    return value
+
+
+def apply_jacobian(J, arg, result):
+    """ forward mode product with the Jacobian blocks J[output, input] of a
+        component (see Thrust.linearize)
+    """
+    for (out, name), block in J.items():
+        if out in result and name in arg:
+            dy = np.dot(block, np.reshape(arg[name], -1))
+            result[out] += dy.reshape(np.shape(result[out]))
+
+
+def apply_jacobianT(J, arg, result):
+    """ adjoint mode product with the Jacobian blocks J[output, input] of a
+        component (see Thrust.linearize)
+    """
+    for (out, name), block in J.items():
+        if out in arg and name in result:
+            dx = np.dot(block.T, np.reshape(arg[out], -1))
+            result[name] += dx.reshape(np.shape(result[name]))
+
+
+def complex_step_jacobian(comp, h=1e-30):
+    """ Jacobian blocks J[output, input] of comp over its list_deriv_vars by
+        complex step, one execution for each element of each input
+    """
+    inputs, outputs = comp.list_deriv_vars()
+
+    J = {}
+    for name in inputs:
+        x0 = getattr(comp, name)
+        x = np.asarray(x0)
+
+        columns = []
+        for i in range(x.size):
+            xc = x.astype(complex).flatten()
+            xc[i] += 1j*h
+            setattr(comp, name, xc.reshape(x.shape) if x.ndim else xc[0])
+            comp.execute()
+            columns.append([np.imag(np.asarray(get_value(comp, out))).flatten() / h
+                            for out in outputs])
+
+        setattr(comp, name, x0)
+        for k, out in enumerate(outputs):
+            J[out, name] = np.array([column[k] for column in columns]).T
+
+    comp.execute()
+    return J
+
+
+def check_derivatives(comp, h=1e-30):
+    """ largest error of each block of the analytic Jacobian of comp
+        (linearize) against complex step, relative to the largest entry of
+        the block
+    """
+    comp.linearize()
+    Jcs = complex_step_jacobian(comp, h)
+
+    errors = {}
+    for key, block in Jcs.items():
+        J = comp.J.get(key, np.zeros(block.shape))
+        scale = np.abs(block).max() if block.size else 0.
+        err = np.abs(J - block).max() if block.size else 0.
+        errors[key] = err / scale if scale > 0 else err
+
+    return errors
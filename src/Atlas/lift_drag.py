@@ -1,12 +1,15 @@
 # pylint: disable=line-too-long, invalid-name, bad-whitespace, trailing-whitespace, too-many-locals, line-too-long
 # Partially autogenerated with SMOP version 0.22
 # /OpenMDAO/dev/hschilli/latest/devenv/bin/smop lift_drag.m -o lift_drag.py
-from math import sqrt, sin, cos, atan2
 import numpy as np
 
-from openmdao.lib.datatypes.api import Int, Float, Array, VarTree
+from openmdao.lib.datatypes.api import Int, Float, Array, Str, VarTree
 from openmdao.main.api import Component, VariableTree
 
+from Atlas.coefficients import dragCoefficientFit, sectionDragCoefficient, sectionDragPartials
+from Atlas.derivatives import apply_jacobian, apply_jacobianT
+from Atlas.polars import load_polars
+
 
 class Fblade(VariableTree):
 
@@ -22,6 +25,267 @@ class Fblade(VariableTree):
         self.add('Pp', Array(np.zeros(Ns), desc=''))
 
 
+# differentiable inputs of blade_loads, per element and scalar
+LOAD_ELEMENTS = ('r', 'vi', 'c', 'Cl', 'dr', 'd', 'Lwire', 'chordFrac', 'Cm', 'xtU', 'xtL', 'tc')
+LOAD_SCALARS = ('rho', 'visc', 'vw', 'vc', 'Omega', 'tWire')
+
+LOAD_OUTPUTS = ('Re', 'Cd', 'phi', 'Fblade.Fx', 'Fblade.Fz', 'Fblade.My',
+                'Fblade.Q', 'Fblade.P', 'Fblade.Pi', 'Fblade.Pp')
+
+
+def elements(value, Ns):
+    """ value as a flat float (or complex) array of the first Ns elements """
+    value = np.asarray(value)
+    return value.astype(np.result_type(value, 1.)).flatten()[:Ns]
+
+
+def arctan2(y, x):
+    """ np.arctan2, extended to complex step perturbations of y and x """
+    if np.iscomplexobj(y) or np.iscomplexobj(x):
+        yr, xr = np.real(y), np.real(x)
+        return np.arctan2(yr, xr) + 1j*(xr*np.imag(y) - yr*np.imag(x))/(xr**2 + yr**2)
+    return np.arctan2(y, x)
+
+
+def wire_length(yN, dr, yWire, zWire):
+    """ length of wire (Ns, len(yWire)) in front of each element, for wires
+        attached at yWire and zWire below the root
+    """
+    yN = elements(yN, None)
+    yWire = elements(yWire, None)
+
+    y0 = yN[:-1, np.newaxis]
+    y1 = yN[1:, np.newaxis]
+    span = np.where(np.real(y1) < np.real(yWire), elements(dr, None).reshape(-1, 1), yWire - y0)
+
+    # no wire (yWire = 0) in front of any element
+    inside = np.real(y0) < np.real(yWire)
+    return np.where(inside, span * np.sqrt(zWire**2 + yWire**2) / np.where(inside, yWire, 1.), 0.)
+
+
+def wire_length_partials(yN, dr, yWire, zWire):
+    """ derivatives of the total wire length in front of each element
+        (wire_length summed over the wires) with respect to dr (per element),
+        yN (Ns, Ns+1), yWire (Ns, len(yWire)) and zWire
+    """
+    yN = elements(yN, None)
+    yWire = elements(yWire, None)
+    Ns = len(yN) - 1
+
+    y0 = yN[:-1, np.newaxis]
+    y1 = yN[1:, np.newaxis]
+    inside = y0 < yWire
+    full = inside & (y1 < yWire)
+    partial = inside & ~full
+
+    # no wire (yWire = 0) in front of any element
+    yWire = np.where(yWire != 0, yWire, 1.)
+    root = np.sqrt(zWire**2 + yWire**2)
+    g = root / yWire
+    span = np.where(full, elements(dr, None).reshape(-1, 1), yWire - y0)
+
+    dyN = np.zeros((Ns, Ns+1))
+    dyN[np.arange(Ns), np.arange(Ns)] = -np.sum(partial * g, axis=1)
+
+    return {'dr':    np.sum(full * g, axis=1),
+            'yN':    dyN,
+            'yWire': inside * (span * -zWire**2 / (yWire**2 * root)) + partial * g,
+            'zWire': np.sum(inside * span * zWire / (yWire * root), axis=1)}
+
+
+def cylinder_drag(Re):
+    """ drag coefficient of a cylinder (spar or wire) at Reynolds number Re """
+    return -1e-10*Re**3 + 7e-07*Re**2 - 0.0013*Re + 1.7397
+
+
+def cylinder_drag_slope(Re):
+    """ derivative of cylinder_drag """
+    return -3e-10*Re**2 + 1.4e-06*Re - 0.0013
+
+
+def wing_polars(polars, airfoil, Re, Cl, wing):
+    """ Cd and Cm of the wing sections from the PolarDatabase polars, and
+        their derivatives (see PolarDatabase.drag), zero on the spar
+    """
+    coefficients = polars.drag(np.broadcast_to(airfoil, wing.shape)[wing], Re[wing],
+                               np.broadcast_to(Cl, wing.shape)[wing])
+
+    values = []
+    for C in coefficients:
+        value = np.zeros(wing.shape, dtype=np.result_type(C, 1.))
+        value[wing] = C
+        values.append(value)
+    return values
+
+
+def blade_loads(rho, visc, vw, vc, Omega, r, vi, c, Cl, dr, d, Lwire, tWire,
+                chordFrac, Cm, xtU, xtL, tc=0., Cdfit=1, polars=None, airfoil=0):
+    """ Reynolds number, drag coefficient, inflow angle and blade loads
+        (Fx, Fz, My, Q, P, Pi, Pp) of all elements, where Lwire is the total
+        length of wire in front of each element and Cdfit selects the drag
+        model of the wing sections (see sectionDragCoefficient). With a
+        PolarDatabase polars, the Cd and Cm of the wing sections are looked
+        up at their Cl in the polars of their airfoil numbers instead.
+    """
+    U2 = (Omega * r + vw)**2 + (vc + vi)**2
+    U = np.sqrt(U2)
+    q = 0.5 * rho * U2
+
+    # wing sections, and the root spar where there is no chord
+    wing = np.real(c) > 0.001
+    Re = rho * U * np.where(wing, c, d) / visc
+
+    if polars is None:
+        CdWing = sectionDragCoefficient(Re, tc, xtU, xtL, Cdfit)
+    else:
+        CdWing, CmWing = wing_polars(polars, airfoil, Re, Cl, wing)[:2]
+        Cm = np.where(wing, CmWing, Cm)
+
+    ReSpar = np.where(wing, 0., Re)
+    Cd = np.where(wing, CdWing, np.where(np.real(ReSpar) < 3500, cylinder_drag(ReSpar), 1.))
+
+    dL = np.where(wing, q * Cl * c * dr, 0.)
+    dD = q * Cd * np.where(wing, c, d) * dr
+
+    # wire drag
+    ReWire = rho * U * tWire / visc
+    dD = dD + q * cylinder_drag(ReWire) * tWire * Lwire
+
+    phi = arctan2(vc + vi, vw + Omega * r)
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+
+    Fz = chordFrac * (dL * cos_phi - dD * sin_phi)
+    Fx = chordFrac * (dD * cos_phi + dL * sin_phi)
+    My = chordFrac * (q * Cm * c * c * dr)
+    Q = Fx * r
+    P = Q * Omega
+    Pi = chordFrac * (dL * sin_phi * r * Omega)
+    Pp = chordFrac * (dD * cos_phi * r * Omega)
+
+    return Re, Cd, phi, (Fx, Fz, My, Q, P, Pi, Pp)
+
+
+def blade_loads_partials(rho, visc, vw, vc, Omega, r, vi, c, Cl, dr, d, Lwire, tWire,
+                         chordFrac, Cm, xtU, xtL, tc=0., Cdfit=1, polars=None, airfoil=0):
+    """ derivatives of blade_loads with respect to each of LOAD_ELEMENTS and
+        LOAD_SCALARS, by forward differentiation: a dict of the derivatives
+        of the LOAD_OUTPUTS of every element. The outputs of an element only
+        depend on the inputs of the same element, so these are the diagonals
+        (LOAD_ELEMENTS) and the columns (LOAD_SCALARS) of the Jacobian.
+    """
+    Ns = len(r)
+
+    X = Omega * r + vw
+    Y = vc + vi
+    U2 = X**2 + Y**2
+    U = np.sqrt(U2)
+    q = 0.5 * rho * U2
+
+    wing = c > 0.001
+    L = np.where(wing, c, d)
+    Re = rho * U * L / visc
+
+    if polars is None:
+        CdWing = sectionDragCoefficient(Re, tc, xtU, xtL, Cdfit)
+        Cd_Re, Cd_tc, Cd_xtU, Cd_xtL = sectionDragPartials(Re, tc, xtU, xtL, Cdfit)
+        Cd_Cl = Cm_Re = Cm_Cl = 0.
+    else:
+        CdWing, CmWing, Cd_Re, Cd_Cl, Cm_Re, Cm_Cl = wing_polars(polars, airfoil, Re, Cl, wing)
+        Cd_tc = Cd_xtU = Cd_xtL = 0.
+        Cm = np.where(wing, CmWing, Cm)
+
+    spar = ~wing & (Re < 3500)
+    Cd = np.where(wing, CdWing, np.where(spar, cylinder_drag(Re), 1.))
+
+    Lift = np.where(wing, q * Cl * c * dr, 0.)
+    ReWire = rho * U * tWire / visc
+    CdWire = cylinder_drag(ReWire)
+    Drag = q * Cd * L * dr + q * CdWire * tWire * Lwire
+
+    phi = np.arctan2(Y, X)
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+
+    Fx = chordFrac * (Drag * cos_phi + Lift * sin_phi)
+    Q = Fx * r
+
+    partials = {}
+    for name in LOAD_ELEMENTS + LOAD_SCALARS:
+        t = dict.fromkeys(LOAD_ELEMENTS + LOAD_SCALARS, 0.)
+        t[name] = 1.
+
+        dX = t['Omega'] * r + Omega * t['r'] + t['vw']
+        dY = t['vc'] + t['vi']
+        dU2 = 2 * (X * dX + Y * dY)
+        dU = dU2 / (2 * U)
+        dq = 0.5 * (t['rho'] * U2 + rho * dU2)
+
+        dL = np.where(wing, t['c'], t['d'])
+        dRe = (t['rho'] * U * L + rho * dU * L + rho * U * dL) / visc - Re * t['visc'] / visc
+        dCd = np.where(wing, (Cd_Re * dRe + Cd_Cl * t['Cl'] + Cd_tc * t['tc'] +
+                              Cd_xtU * t['xtU'] + Cd_xtL * t['xtL']),
+                       np.where(spar, cylinder_drag_slope(Re) * dRe, 0.))
+        if polars is None:
+            dCm = t['Cm']
+        else:
+            dCm = np.where(wing, Cm_Re * dRe + Cm_Cl * t['Cl'], t['Cm'])
+
+        dLift = np.where(wing, (dq * Cl * c * dr + q * t['Cl'] * c * dr +
+                                q * Cl * t['c'] * dr + q * Cl * c * t['dr']), 0.)
+        dReWire = (t['rho'] * U * tWire + rho * dU * tWire + rho * U * t['tWire']) / visc \
+                - ReWire * t['visc'] / visc
+        dDrag = dq * (Cd * L * dr + CdWire * tWire * Lwire) \
+              + q * (dCd * L * dr + Cd * dL * dr + Cd * L * t['dr']) \
+              + q * cylinder_drag_slope(ReWire) * dReWire * tWire * Lwire \
+              + q * CdWire * (t['tWire'] * Lwire + tWire * t['Lwire'])
+
+        dphi = (X * dY - Y * dX) / U2
+        dcos = -sin_phi * dphi
+        dsin = cos_phi * dphi
+
+        dcf = t['chordFrac']
+        dFz = dcf * (Lift * cos_phi - Drag * sin_phi) \
+            + chordFrac * (dLift * cos_phi + Lift * dcos - dDrag * sin_phi - Drag * dsin)
+        dFx = dcf * (Drag * cos_phi + Lift * sin_phi) \
+            + chordFrac * (dDrag * cos_phi + Drag * dcos + dLift * sin_phi + Lift * dsin)
+        dMy = dcf * q * Cm * c * c * dr \
+            + chordFrac * (dq * Cm * c * c * dr + q * dCm * c * c * dr +
+                           2 * q * Cm * c * t['c'] * dr + q * Cm * c * c * t['dr'])
+        dQ = dFx * r + Fx * t['r']
+        dP = dQ * Omega + Q * t['Omega']
+        dPi = (dcf * Lift * sin_phi + chordFrac * (dLift * sin_phi + Lift * dsin)) * r * Omega \
+            + chordFrac * Lift * sin_phi * (t['r'] * Omega + r * t['Omega'])
+        dPp = (dcf * Drag * cos_phi + chordFrac * (dDrag * cos_phi + Drag * dcos)) * r * Omega \
+            + chordFrac * Drag * cos_phi * (t['r'] * Omega + r * t['Omega'])
+
+        partials[name] = tuple(np.zeros(Ns) + p for p in
+                               (dRe, dCd, dphi, dFx, dFz, dMy, dQ, dP, dPi, dPp))
+
+    return partials
+
+
+def loads_jacobian(partials, wire):
+    """ Jacobian blocks J[output, input] of the LOAD_OUTPUTS from the
+        partials of blade_loads and the wire length (wire_length_partials)
+    """
+    J = {}
+    for k, out in enumerate(LOAD_OUTPUTS):
+        for name in LOAD_ELEMENTS:
+            if name != 'Lwire':
+                J[out, name] = np.diag(partials[name][k])
+        for name in LOAD_SCALARS:
+            J[out, name] = partials[name][k].reshape(-1, 1)
+
+        dLwire = partials['Lwire'][k]
+        J[out, 'dr'] = J[out, 'dr'] + np.diag(dLwire * wire['dr'])
+        J[out, 'yN'] = dLwire[:, np.newaxis] * wire['yN']
+        J[out, 'yWire'] = dLwire[:, np.newaxis] * wire['yWire']
+        J[out, 'zWire'] = (dLwire * wire['zWire']).reshape(-1, 1)
+
+    return J
+
+
 class LiftDrag(Component):
     """ Computes lift and drag
     """
@@ -56,6 +320,13 @@ class LiftDrag(Component):
         self.add('Cm',        Array(np.zeros(Ns), iotype='in', desc=''))
         self.add('xtU',       Array(np.zeros(Ns), iotype='in', desc='fraction of laminar flow on the upper surface'))
         self.add('xtL',       Array(np.zeros(Ns), iotype='in', desc='fraction of laminar flow on the lower surface'))
+        self.add('tc',        Array(np.zeros(Ns), iotype='in', desc='thickness to chord ratio of the airfoil'))
+
+        self.add('Cdfit',     Int(1, iotype='in', desc='0 - analytic model for drag coefficient, 1 - curve fit on BE airfoils'))
+
+        self.add('polars',    Str('', iotype='in', desc='airfoil polar file (see save_polars) for Cd and Cm, '
+                                                        'empty for the Cdfit model and the Cm input'))
+        self.add('airfoil',   Array(np.zeros(Ns, dtype=int), iotype='in', desc='airfoil number of each element in the polars'))
 
         # outputs
         self.add('Re',        Array(np.zeros(Ns), iotype='out', desc='Reynolds number'))
@@ -64,58 +335,50 @@ class LiftDrag(Component):
         self.add('Fblade',    VarTree(Fblade(Ns), iotype='out', desc=''))
 
     def execute(self):
-        # Pre-allocate output arrays
-        self.Re = np.zeros(self.Ns)
-        self.Cd = np.zeros(self.Ns)
-        self.phi = np.zeros(self.Ns)
-        self.Fblade.Fx = np.zeros(self.Ns)
-        self.Fblade.Fz = np.zeros(self.Ns)
-        self.Fblade.My = np.zeros(self.Ns)
-        self.Fblade.Q = np.zeros(self.Ns)
-        self.Fblade.P = np.zeros(self.Ns)
-        self.Fblade.Pi = np.zeros(self.Ns)
-        self.Fblade.Pp = np.zeros(self.Ns)
-
-        # Compute lift and drag using full angles
-        for s in range(self.Ns):
-            # where vw is wind, vc is vertical velocity
-            U = sqrt((self.Omega * self.r[s] + self.vw)**2 + (self.vc + self.vi[s])**2)
-
-            # wing section
-            if self.c[s] > 0.001:
-                self.Re[s] = self.rho * U * self.c[s] / self.visc
-                self.Cd[s] = self.dragCoefficientFit(self.Re[s], self.xtU[s], self.xtL[s])
-                dL = 0.5 * self.rho * U**2 * self.Cl[s] * self.c[s] * self.dr[s]
-                dD = 0.5 * self.rho * U**2 * self.Cd[s] * self.c[s] * self.dr[s]
-            else:
-                # root spar section
-                self.Re[s] = self.rho * U * self.d[s] / self.visc
-                if self.Re < 3500:
-                    self.Cd[s] = -1e-10*self.Re[s]**3 + 7e-07*self.Re[s]**2 - 0.0013*self.Re[s] + 1.7397
-                else:
-                    self.Cd[s] = 1
-                dL = 0
-                dD = 0.5 * self.rho * U**2 * self.Cd[s] * self.d[s] * self.dr[s]
-
-            # add wire drag
-            for w in range(len(self.yWire)):
-                if self.yN[s] < self.yWire[w]:
-                    if self.yN[s + 1] < self.yWire[w]:
-                        L = self.dr[s] * sqrt(self.zWire**2 + self.yWire[w]**2) / self.yWire[w]
-                    else:
-                        L = (self.yWire[w] - self.yN[s]) * sqrt(self.zWire**2 + self.yWire[w]**2) / self.yWire[w]
-                    ReWire = self.rho * U * self.tWire / self.visc
-                    CdWire = -1e-10*ReWire**3 + 7e-07*ReWire**2 - 0.0013*ReWire + 1.7397
-                    dD = dD + 0.5 * self.rho * U**2 * CdWire * self.tWire * L
-
-            self.phi[s] = atan2(self.vc + self.vi[s], self.vw + self.Omega * self.r[s])
-            self.Fblade.Fz[s] = self.chordFrac[s] * (dL * cos(self.phi[s]) - dD * sin(self.phi[s]))
-            self.Fblade.Fx[s] = self.chordFrac[s] * (dD * cos(self.phi[s]) + dL * sin(self.phi[s]))
-            self.Fblade.My[s] = self.chordFrac[s] * (0.5 * self.rho * U**2 * self.Cm[s] * self.c[s] * self.c[s] * self.dr[s])
-            self.Fblade.Q[s]  = self.Fblade.Fx[s] * self.r[s]
-            self.Fblade.P[s]  = self.Fblade.Q[s]  * self.Omega
-            self.Fblade.Pi[s] = self.chordFrac[s] * (dL * sin(self.phi[s]) * self.r[s] * self.Omega)
-            self.Fblade.Pp[s] = self.chordFrac[s] * (dD * cos(self.phi[s]) * self.r[s] * self.Omega)
+        Ns = self.Ns
+
+        dr = elements(self.dr, Ns)
+        Lwire = wire_length(self.yN, dr, self.yWire, self.zWire).sum(axis=1)
+
+        # lift and drag of all elements using full angles
+        self.Re, self.Cd, self.phi, loads = \
+            blade_loads(self.rho, self.visc, self.vw, self.vc, self.Omega, **self.load_inputs(Lwire))
+
+        Fblade = self.Fblade
+        Fblade.Fx, Fblade.Fz, Fblade.My, Fblade.Q, Fblade.P, Fblade.Pi, Fblade.Pp = loads
+
+    def load_inputs(self, Lwire):
+        """ element inputs of blade_loads """
+        inputs = dict((name, elements(getattr(self, name), self.Ns))
+                      for name in LOAD_ELEMENTS if name != 'Lwire')
+        inputs.update(Lwire=Lwire, tWire=self.tWire, Cdfit=self.Cdfit)
+        if self.polars:
+            inputs.update(polars=load_polars(self.polars),
+                          airfoil=np.asarray(self.airfoil, dtype=int).flatten()[:self.Ns])
+        return inputs
+
+    def list_deriv_vars(self):
+        return ('yN', 'r', 'vi', 'c', 'Cl', 'dr', 'd', 'yWire', 'zWire', 'tWire', 'chordFrac',
+                'Cm', 'xtU', 'xtL', 'tc') + ('rho', 'visc', 'vw', 'vc', 'Omega'), LOAD_OUTPUTS
+
+    def linearize(self):
+        """ Jacobian of the lift and drag """
+        Ns = self.Ns
+
+        dr = elements(self.dr, Ns)
+        Lwire = wire_length(self.yN, dr, self.yWire, self.zWire).sum(axis=1)
+
+        partials = blade_loads_partials(self.rho, self.visc, self.vw, self.vc, self.Omega,
+                                        **self.load_inputs(Lwire))
+        wire = wire_length_partials(self.yN, dr, self.yWire, self.zWire)
+
+        self.J = loads_jacobian(partials, wire)
+
+    def apply_deriv(self, arg, result):
+        apply_jacobian(self.J, arg, result)
+
+    def apply_derivT(self, arg, result):
+        apply_jacobianT(self.J, arg, result)
 
     def dragCoefficientFit(self, Re, xtU, xtL):
         """
@@ -124,9 +387,4 @@ class LiftDrag(Component):
         laminar flow on the upper and lower surfaces respectively.
         The result is a fit on existing HPH airfoils.
         """
-        Cf15_15 = 0.6798*Re**(-0.283)
-        Cf60_100 = 22.09*Re**(-0.604)
-
-        xtc = xtU + xtL
-        Cd = Cf15_15 + (Cf60_100 - Cf15_15)*(xtc - 0.3)/(1.6 - 0.3)
-        return Cd
+        return dragCoefficientFit(Re, xtU, xtL)
@@ -0,0 +1,216 @@
+import os
+import warnings
+
+import numpy as np
+
+
+def spline_coefficients(x, y):
+    """ coefficients (len(x)-1, 4) of the natural cubic spline through
+        (x, y), y = c0 + c1 t + c2 t^2 + c3 t^3 on each interval with
+        t = x - x[i]
+    """
+    n = len(x)
+    h = np.diff(x)
+
+    # second derivatives, zero at the ends
+    A = np.zeros((n, n))
+    rhs = np.zeros(n)
+    A[0, 0] = A[-1, -1] = 1.
+    for i in range(1, n-1):
+        A[i, i-1:i+2] = h[i-1], 2*(h[i-1] + h[i]), h[i]
+        rhs[i] = 6*((y[i+1] - y[i])/h[i] - (y[i] - y[i-1])/h[i-1])
+    M = np.linalg.solve(A, rhs)
+
+    return np.column_stack((y[:-1],
+                            (y[1:] - y[:-1])/h - h*(2*M[:-1] + M[1:])/6,
+                            M[:-1]/2,
+                            (M[1:] - M[:-1])/(6*h)))
+
+
+def locate(keys, offset, n, airfoil, x):
+    """ interval of x in the grids of each airfoil, concatenated in keys
+        (shifted by the airfoil number, see PolarDatabase) with n points
+        from offset
+    """
+    i = np.searchsorted(keys, airfoil * PolarDatabase.SHIFT + np.real(x)) - 1 - offset[airfoil]
+    return np.clip(i, 0, n[airfoil] - 2)
+
+
+class PolarDatabase(object):
+    """ Lift, drag and moment coefficients of a set of airfoils, tabulated
+        over Reynolds number and angle of attack (degrees). The tables of
+        all airfoils are held in flat arrays with the cubic spline
+        coefficients in alpha of each Reynolds number, computed once, and
+        interpolated linearly in log(Re). Lookups are vectorized over
+        elements with different airfoils and accept complex Re and Cl.
+    """
+
+    # spacing of the airfoils in the concatenated grids
+    SHIFT = 1e4
+
+    # error in Cl beyond which angle has not found the lift coefficient
+    CL_TOL = 1e-6
+
+    def __init__(self, polars):
+        """ polars is a sequence of (name, Re, alpha, Cl, Cd, Cm) with the
+            coefficients of shape (len(Re), len(alpha))
+        """
+        self.names = []
+        logRe, alpha, coef = [], [], []
+        self.nRe, self.nalpha, self.seg = [], [], []
+
+        nseg = 0
+        for k, (name, Re, a, Cl, Cd, Cm) in enumerate(polars):
+            Re = np.asarray(Re, dtype=float).flatten()
+            a = np.asarray(a, dtype=float).flatten()
+            tables = [np.asarray(C, dtype=float).reshape(len(Re), len(a)) for C in (Cl, Cd, Cm)]
+            if len(a) < 2 or np.any(np.diff(a) <= 0) or np.any(np.diff(Re) <= 0):
+                raise Exception('the polar of %s must have increasing Re and at least two alpha' % name)
+            if np.abs(a).max() >= self.SHIFT/2:
+                raise Exception('the polar of %s spans too wide a range of alpha' % name)
+
+            # a single Reynolds number is constant in Re
+            if len(Re) == 1:
+                Re = np.append(Re, Re * np.e)
+                tables = [np.vstack((C, C)) for C in tables]
+
+            self.names.append(name)
+            self.nRe.append(len(Re))
+            self.nalpha.append(len(a))
+            self.seg.append(nseg)
+            nseg += len(Re) * (len(a) - 1)
+
+            logRe.append(k * self.SHIFT + np.log(Re))
+            alpha.append(k * self.SHIFT + a)
+            coef.append([np.concatenate([spline_coefficients(a, C[j]) for j in range(len(Re))])
+                         for C in tables])
+
+        self.nRe = np.array(self.nRe)
+        self.nalpha = np.array(self.nalpha)
+        self.seg = np.array(self.seg)
+        self.Re0 = np.concatenate(([0], np.cumsum(self.nRe)[:-1]))
+        self.alpha0 = np.concatenate(([0], np.cumsum(self.nalpha)[:-1]))
+
+        self.logRe = np.concatenate(logRe)
+        self.alpha = np.concatenate(alpha)
+        self.coef = np.concatenate(coef, axis=1)    # (Cl/Cd/Cm, segment, 4)
+
+    @classmethod
+    def load(cls, filename):
+        """ read a database written by save_polars """
+        data = np.load(filename)
+        return cls([(str(name),) + tuple(data['%s_%s' % (name, key)]
+                                         for key in ('Re', 'alpha', 'Cl', 'Cd', 'Cm'))
+                    for name in data['names']])
+
+    def index(self, names):
+        """ airfoil numbers of the given airfoil names """
+        return np.array([self.names.index(name) for name in names])
+
+    def evaluate(self, airfoil, Re, alpha):
+        """ Cl, Cd and Cm (3, n) at the points (airfoil, Re, alpha), and
+            their derivatives with respect to alpha and Re
+        """
+        airfoil, Re, alpha = np.broadcast_arrays(np.asarray(airfoil, dtype=int), Re, alpha)
+        logRe = np.log(Re)
+
+        j = locate(self.logRe, self.Re0, self.nRe, airfoil, logRe)
+        i = locate(self.alpha, self.alpha0, self.nalpha, airfoil, alpha)
+
+        x0 = self.logRe[self.Re0[airfoil] + j] - airfoil * self.SHIFT
+        x1 = self.logRe[self.Re0[airfoil] + j + 1] - airfoil * self.SHIFT
+        w = (logRe - x0) / (x1 - x0)
+
+        t = alpha - (self.alpha[self.alpha0[airfoil] + i] - airfoil * self.SHIFT)
+        seg = self.seg[airfoil] + j * (self.nalpha[airfoil] - 1) + i
+        c0 = self.coef[:, seg]
+        c1 = self.coef[:, seg + self.nalpha[airfoil] - 1]
+
+        C0 = c0[..., 0] + t*(c0[..., 1] + t*(c0[..., 2] + t*c0[..., 3]))
+        C1 = c1[..., 0] + t*(c1[..., 1] + t*(c1[..., 2] + t*c1[..., 3]))
+        dC0 = c0[..., 1] + t*(2*c0[..., 2] + 3*t*c0[..., 3])
+        dC1 = c1[..., 1] + t*(2*c1[..., 2] + 3*t*c1[..., 3])
+
+        C = (1 - w)*C0 + w*C1
+        C_alpha = (1 - w)*dC0 + w*dC1
+        C_Re = (C1 - C0) / (x1 - x0) / Re
+
+        return C, C_alpha, C_Re
+
+    def angle(self, airfoil, Re, Cl, iterations=20):
+        """ angle of attack giving the lift coefficient Cl, by Newton
+            iterations from zero (pre-stall branch), within the table.
+            Iterations stop where the lift curve is flat. A lift coefficient
+            out of reach (beyond stall or the table) is left at the angle
+            the iterations stopped at, with a warning.
+        """
+        airfoil, Re, Cl = np.broadcast_arrays(np.asarray(airfoil, dtype=int), Re, Cl)
+        lo = self.alpha[self.alpha0[airfoil]] - airfoil * self.SHIFT
+        hi = self.alpha[self.alpha0[airfoil] + self.nalpha[airfoil] - 1] - airfoil * self.SHIFT
+
+        alpha = np.zeros(Cl.shape, dtype=np.result_type(Re, Cl, 1.))
+        for n in range(iterations):
+            C, C_alpha, _ = self.evaluate(airfoil, Re, alpha)
+
+            # no step where the lift curve is flat (at stall)
+            flat = np.abs(C_alpha[0]) < 1e-12
+            alpha = alpha - np.where(flat, 0., (C[0] - Cl) / np.where(flat, 1., C_alpha[0]))
+            alpha = np.where(np.real(alpha) < lo, lo, np.where(np.real(alpha) > hi, hi, alpha))
+
+        C = self.evaluate(airfoil, Re, alpha)[0]
+        missed = np.abs(np.real(C[0] - Cl)) > self.CL_TOL
+        if np.any(missed):
+            warnings.warn('%d of %d lift coefficients are out of reach of the polars'
+                          % (np.count_nonzero(missed), missed.size))
+
+        return alpha
+
+    def drag(self, airfoil, Re, Cl):
+        """ Cd and Cm at the angle of attack giving Cl, and their derivatives
+            with respect to Re and Cl: Cd, Cm, Cd_Re, Cd_Cl, Cm_Re, Cm_Cl.
+            Where Cl is out of reach or the lift curve is flat, alpha is
+            held fixed in the derivatives.
+        """
+        alpha = self.angle(airfoil, Re, Cl)
+        C, C_alpha, C_Re = self.evaluate(airfoil, Re, alpha)
+
+        # alpha(Re, Cl) at constant lift
+        held = (np.abs(np.real(C[0] - Cl)) > self.CL_TOL) | (np.abs(C_alpha[0]) < 1e-12)
+        alpha_Cl = np.where(held, 0., 1. / np.where(held, 1., C_alpha[0]))
+        alpha_Re = -C_Re[0] * alpha_Cl
+
+        return C[1], C[2], \
+            C_Re[1] + C_alpha[1]*alpha_Re, C_alpha[1]*alpha_Cl, \
+            C_Re[2] + C_alpha[2]*alpha_Re, C_alpha[2]*alpha_Cl
+
+
+def save_polars(filename, polars):
+    """ write polars (name, Re, alpha, Cl, Cd, Cm), as given to
+        PolarDatabase, to an .npz file
+    """
+    tables = {'names': np.array([p[0] for p in polars])}
+    for p in polars:
+        for key, value in zip(('Re', 'alpha', 'Cl', 'Cd', 'Cm'), p[1:]):
+            tables['%s_%s' % (p[0], key)] = np.asarray(value, dtype=float)
+    np.savez_compressed(filename, **tables)
+
+
+# databases read by load_polars, with the modification time and size of
+# their files
+_databases = {}
+
+
+def load_polars(filename):
+    """ PolarDatabase of the file, read again only when the file has
+        changed
+    """
+    stat = os.stat(filename)
+    key = (stat.st_mtime, stat.st_size)
+    if filename not in _databases or _databases[filename][0] != key:
+        _databases[filename] = (key, PolarDatabase.load(filename))
+    return _databases[filename][1]
+
+
+def clear_polars():
+    """ forget the databases read by load_polars """
+    _databases.clear()
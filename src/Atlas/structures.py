@@ -1,15 +1,20 @@
 import numpy as np
 
+from collections import OrderedDict
+from hashlib import sha1
+
+from scipy.linalg import cholesky_banded, cho_solve_banded
+
 from math import pi, sqrt, sin, cos, tan, atan2
 
 from openmdao.main.api import Assembly, Component, VariableTree
-from openmdao.lib.datatypes.api import Int, Float, Array, VarTree
+from openmdao.lib.datatypes.api import Int, Float, Array, VarTree, Bool
 
 from configuration import Flags, PrescribedLoad
 from properties import JointProperties, \
                        SparProperties, JointSparProperties, QuadSparProperties, \
                        ChordProperties, wire_properties, prepreg_properties
-from lift_drag import Fblade
+from lift_drag import Fblade, elements
 
 
 # data structures used in structural calculations
@@ -132,6 +137,223 @@ class MassProperties(Component):
                       + self.mElseRotor + self.mElseCentre + self.mElseR * self.R + self.mPilot
 
 
+def stiffness_template(entries):
+    """ symmetric 12x12 coefficients of a stiffness term, from the entries
+        (i, j, coefficient) of its upper triangle
+    """
+    T = np.zeros((12, 12))
+    for i, j, coef in entries:
+        T[i, j] = T[j, i] = coef
+    return T
+
+
+# coefficients of the local elastic stiffness matrix for each of the terms
+# EIx/dy^3, EIx/dy^2, EIx/dy, EA/dy, EIz/dy^3, EIz/dy^2, EIz/dy and GJ/dy
+STIFFNESS_TEMPLATES = np.array([
+    stiffness_template([(0, 0, 12), (0, 6, -12), (6, 6, 12)]),
+    stiffness_template([(0, 5, -6), (0, 11, -6), (5, 6, 6), (6, 11, 6)]),
+    stiffness_template([(5, 5, 4), (5, 11, 2), (11, 11, 4)]),
+    stiffness_template([(1, 1, 1), (1, 7, -1), (7, 7, 1)]),
+    stiffness_template([(2, 2, 12), (2, 8, -12), (8, 8, 12)]),
+    stiffness_template([(2, 3, 6), (2, 9, 6), (3, 8, -6), (8, 9, -6)]),
+    stiffness_template([(3, 3, 4), (3, 9, 2), (9, 9, 4)]),
+    stiffness_template([(4, 4, 1), (4, 10, -1), (10, 10, 1)]),
+])
+
+
+def element_stiffness(dy, EIx, EIz, EA, GJ):
+    """ local elastic stiffness matrices (12, 12, Ns) of the elements """
+    terms = np.array([EIx / dy**3, EIx / dy**2, EIx / dy, EA / dy,
+                      EIz / dy**3, EIz / dy**2, EIz / dy, GJ / dy])
+    return np.einsum('tij,ts->ijs', STIFFNESS_TEMPLATES, terms)
+
+
+def element_dofs(Ns):
+    """ global degrees of freedom (12, Ns) of the element matrices """
+    return np.arange(12)[:, np.newaxis] + 6*np.arange(Ns)
+
+
+def point_loads(yN, y, Fy, Fz, M):
+    """ consistent force vectors (12, Ns) of the elements for a point force
+        (Fy along the spar, Fz) and moment M at y, applied to the element
+        with yN[s] <= y < yN[s+1]
+    """
+    dy = np.diff(yN)
+    a = y - yN[:-1]
+    x = a / dy
+    inside = (yN[:-1] <= y) & (y < yN[1:])
+
+    Fe = np.zeros((12, len(dy)))
+    Fe[1]  = Fy * (1 - x)
+    Fe[2]  = Fz * (2 * x**3 - 3 * x**2 + 1)
+    Fe[3]  = Fz * a * (x**2 - 2 * x + 1)
+    Fe[4]  = M * (1 - x)
+    Fe[7]  = Fy * x
+    Fe[8]  = Fz * (-2 * x**3 + 3 * x**2)
+    Fe[9]  = Fz * a * (x**2 - x)
+    Fe[10] = M * x
+    return Fe * inside
+
+
+# load cases of FEM, superposed with the magnitudes of load_factors
+LOAD_CASES = ('aero', 'gravity', 'wire', 'pointZ', 'pointM', 'distributedX', 'distributedZ', 'distributedM')
+
+
+def nodal_loads(f):
+    """ element force vectors (12, Ns) applying the nodal forces f (6, Ns) at
+        both nodes, with the x and z moments reversed at the outboard node
+    """
+    sign = np.array([1, 1, 1, -1, 1, -1])[:, np.newaxis]
+    return np.vstack((f, sign * f))
+
+
+def distributed_loads(dy, X, Z, M):
+    """ consistent force vectors (12, Ns) of the elements for distributed
+        loads X, Z and moment M per unit length
+    """
+    Fe = np.zeros((12, len(dy)))
+    Fe[0]  = X * dy / 2
+    Fe[2]  = Z * dy / 2
+    Fe[3]  = Z * dy * dy / 12
+    Fe[4]  = M * dy / 2
+    Fe[5]  = -X * dy * dy / 12
+    Fe[6]  = X * dy / 2
+    Fe[8]  = Z * dy / 2
+    Fe[9]  = -Z * dy * dy / 12
+    Fe[10] = M * dy / 2
+    Fe[11] = X * dy * dy / 12
+    return Fe
+
+
+def load_basis(yN, fblade, xEA, cE, mSpar, mChord, xCG, yWire, zWire, yLoad):
+    """ element force vectors (12, Ns, len(LOAD_CASES)) of the aero forces
+        fblade, gravity, a unit tension of the wire, unit prescribed point
+        force and moment at yLoad and unit prescribed distributed loads
+    """
+    dy = np.diff(yN)
+    Ns = len(dy)
+
+    Fe = np.zeros((12, Ns, len(LOAD_CASES)))
+
+    # aerodynamic forces
+    xAC = 0.25
+    Fx, Fz, My = [elements(getattr(fblade, name), Ns) for name in ('Fx', 'Fz', 'My')]
+    Faero = np.zeros((6, Ns))
+    Faero[0] = Fx / 2
+    Faero[2] = Fz / 2
+    Faero[3] = Fz * dy / 12
+    Faero[4] = My / 2 + (xEA - xAC) * cE * Fz / 2
+    Faero[5] = -Fx * dy / 12
+    Fe[:, :, 0] = nodal_loads(Faero)
+
+    # gravitational forces
+    g = 9.81
+    Fg = np.zeros((6, Ns))
+    Fg[2] = -(mSpar + mChord) * g / 2
+    Fg[3] = -(mSpar + mChord) * g * dy / 12
+    Fg[4] = (xCG - xEA) * cE * (mSpar + mChord) * g / 2
+    Fe[:, :, 1] = nodal_loads(Fg)
+
+    # Wire forces (using consistent force vector), each wire replaces the
+    # force vector of the previous ones so only the last one applies
+    if len(yWire):
+        thetaWire = atan2(zWire, yWire[-1])
+        Fe[:, :, 2] = point_loads(yN, yWire[-1], -cos(thetaWire), -sin(thetaWire), 0.)
+
+    # Prescribed point load (using consistent force vector)
+    Fe[:, :, 3] = point_loads(yN, yLoad, 0., 1., 0.)
+    Fe[:, :, 4] = point_loads(yN, yLoad, 0., 0., 1.)
+
+    # Prescribed distributed load
+    Fe[:, :, 5] = distributed_loads(dy, 1., 0., 0.)
+    Fe[:, :, 6] = distributed_loads(dy, 0., 1., 0.)
+    Fe[:, :, 7] = distributed_loads(dy, 0., 0., 1.)
+
+    return Fe
+
+
+def load_factors(Load, TWire, nWire, presLoad):
+    """ magnitudes of the LOAD_CASES for the load flag Load (see Flags), the
+        tensions of the nWire wires and the prescribed load
+    """
+    aero = float(Load == 0)                   # include aero forces
+    gravity = float(Load == 0 or Load == 1)   # gravity and wire forces
+    prescribed = float(Load == 2)
+
+    return np.array([aero,
+                     gravity,
+                     gravity * TWire[nWire-1] if nWire else 0.,
+                     prescribed * presLoad.pointZ,
+                     prescribed * presLoad.pointM,
+                     prescribed * presLoad.distributedX,
+                     prescribed * presLoad.distributedZ,
+                     prescribed * presLoad.distributedM])
+
+
+def banded_stiffness(k):
+    """ global stiffness matrix assembled from the element matrices k
+        (12, 12, Ns) in upper symmetric banded storage, ab[11 + i - j, j] = K[i, j]
+    """
+    Ns = k.shape[2]
+
+    a, b = np.triu_indices(12)
+    rows, cols = np.broadcast_arrays((11 + a - b)[:, np.newaxis], element_dofs(Ns)[b])
+
+    ab = np.zeros((12, 6*(Ns+1)))
+    np.add.at(ab, (rows, cols), k[a, b, :])
+    return ab
+
+
+def dense_stiffness(ab):
+    """ full symmetric matrix of the upper banded storage ab """
+    u, n = ab.shape[0] - 1, ab.shape[1]
+
+    K = np.zeros((n, n))
+    for d in range(u + 1):
+        i = np.arange(n - d)
+        K[i, i + d] = K[i + d, i] = ab[u - d, d:]
+    return K
+
+
+def factor_stiffness(ab):
+    """ banded Cholesky factor of K in upper banded storage ab, None if K is
+        not positive definite (singular configurations)
+    """
+    try:
+        return cholesky_banded(ab)
+    except np.linalg.LinAlgError:
+        return None
+
+
+def solve_stiffness(ab, cb, F):
+    """ solution of K q = F with K in upper banded storage ab and its factor
+        cb (factor_stiffness), by least squares on the full matrix if there
+        is no factor
+    """
+    if cb is None:
+        q, _, _, _ = np.linalg.lstsq(dense_stiffness(ab), F)
+        return q
+    return cho_solve_banded((cb, False), F)
+
+
+def stiffness_key(*arrays):
+    """ hash of the arrays that define a stiffness matrix """
+    key = sha1()
+    for value in arrays:
+        value = np.ascontiguousarray(value, dtype=float)
+        key.update(str(value.shape))
+        key.update(value.tostring())
+    return key.hexdigest()
+
+
+# factorizations of the constrained stiffness matrices of FEM, by
+# stiffness_key of the stiffness inputs, most recently used last
+_factorizations = OrderedDict()
+
+# largest number of factorizations kept in _factorizations
+CACHE_SIZE = 16
+
+
 class FEM(Component):
     """ Computes the deformation of the spar
     """
@@ -164,6 +386,11 @@ class FEM(Component):
 
         self.add('presLoad', VarTree(PrescribedLoad(), iotype='in'))
 
+        self.add('superpose', Bool(False, iotype='in',
+                                   desc='superpose the deformations of the LOAD_CASES, solved again only '
+                                        'when the stiffness or the load distributions change, but for '
+                                        'the aero forces which are solved in every run'))
+
         # outputs
         self.add('k', Array(np.zeros((Ns+2, Ns+2, Ns)), iotype='out', desc='local elastic stiffness matrix'))
         self.add('K', Array(np.zeros((Ns+2, Ns+2, Ns)), iotype='out', desc='global stiffness matrix'))
@@ -171,183 +398,52 @@ class FEM(Component):
         self.add('F', Array(np.zeros((6*(Ns+1), 1)), iotype='out', desc='global force vector'))
         self.add('q', Array(np.zeros((6*(Ns+1), 1)), iotype='out', desc='deformation'))
 
+        self.add('Fbasis',      Array(np.zeros((6*(Ns+1), len(LOAD_CASES))), iotype='out',
+                                      desc='global force vectors of the LOAD_CASES'))
+        self.add('qbasis',      Array(np.zeros((6*(Ns+1), len(LOAD_CASES))), iotype='out',
+                                      desc='deformations of the LOAD_CASES (with superpose)'))
+        self.add('loadFactors', Array(np.zeros(len(LOAD_CASES)), iotype='out',
+                                      desc='magnitudes of the LOAD_CASES, F = Fbasis loadFactors'))
+
+        # key of the stiffness and load distributions (but the aero forces)
+        # of qbasis
+        self._basis = None
+
     def execute(self):
-        # short aliases
-        yN  = self.yN
-        EIx = self.EIx
-        EIz = self.EIz
-        EA  = self.EA
-        GJ  = self.GJ
-        xEA = self.xEA
-        cE  = self.cE
-        mSpar  = self.mSpar
-        mChord = self.mChord
-        xCG   = self.xCG
-        yWire = self.yWire
+        yN = elements(self.yN, None)
+        Ns = len(yN) - 1  # number of elements
+
+        EIx, EIz, EA, GJ, xEA, cE, mSpar, mChord, xCG = \
+            [elements(getattr(self, name), Ns) for name in
+             ('EIx', 'EIz', 'EA', 'GJ', 'xEA', 'cE', 'mSpar', 'mChord', 'xCG')]
+        yWire = elements(self.yWire, None)
+        TWire = elements(self.TWire, None)
         zWire = self.zWire
-        TWire = self.TWire
         fblade = self.fblade
         presLoad = self.presLoad
 
-        Ns = len(yN) - 1  # number of elements
-        dy = np.zeros(Ns)
-        for s in range(Ns+1):
-            dy[s-1] = yN[s] - yN[s-1]  # length of each element
+        dy = np.diff(yN)  # length of each element
 
         # FEM computation for structural deformations
         # -------------------------------------------
 
-        # Initialize global stiffness matrix
-        K = np.zeros(((Ns+1)*6, (Ns+1)*6))  # global stiffness
-        F = np.zeros(((Ns+1)*6, 1))         # global force vector
+        # Local elastic stiffness matrices
+        k = element_stiffness(dy, EIx, EIz, EA, GJ)
 
-        # Create global stiffness maxtrix and force vector
-        k = np.zeros((12, 12, Ns))
+        # Perform dihedral and sweep rotations here if needed
 
-        for s in range(Ns):
+        # Force vectors of the load cases and their magnitudes
+        Fbasis = np.zeros(((Ns+1)*6, len(LOAD_CASES)))
+        np.add.at(Fbasis, element_dofs(Ns),
+                  load_basis(yN, fblade, xEA, cE, mSpar, mChord, xCG, yWire, zWire, presLoad.y))
+        loadFactors = load_factors(self.flags.Load, TWire, len(yWire), presLoad)
+
+        # Assemble global force vector
+        F = np.dot(Fbasis, loadFactors).reshape(-1, 1)
 
-            # Local elastic stiffness matrix
-            k[0,   0, s] = 12 * EIx[s] / (dy[s] * dy[s] * dy[s])
-            k[0,   5, s] = -6 * EIx[s] / (dy[s] * dy[s])
-            k[5,   0, s] = k[0, 5, s]
-            k[0,   6, s] = -12 * EIx[s] / (dy[s] * dy[s] * dy[s])
-            k[6,   0, s] = k[0, 6, s]
-            k[0,  11, s] = -6 * EIx[s] / (dy[s] * dy[s])
-            k[11,  0, s] = k[0, 11, s]
-            k[1,   1, s] = EA[s] / dy[s]
-            k[1,   7, s] = -EA[s] / dy[s]
-            k[7,   1, s] = k[1, 7, s]
-            k[2,   2, s] = 12 * EIz[s] / (dy[s] * dy[s] * dy[s])
-            k[2,   3, s] = 6 * EIz[s] / (dy[s] * dy[s])
-            k[3,   2, s] = k[2, 3, s]
-            k[2,   8, s] = -12 * EIz[s] / (dy[s] * dy[s] * dy[s])
-            k[8,   2, s] = k[2, 8, s]
-            k[2,   9, s] = 6 * EIz[s] / (dy[s] * dy[s])
-            k[9,   2, s] = k[2, 9, s]
-            k[3,   3, s] = 4 * EIz[s] / dy[s]
-            k[3,   8, s] = -6 * EIz[s] / (dy[s] * dy[s])
-            k[8,   3, s] = k[3, 8, s]
-            k[3,   9, s] = 2 * EIz[s] / dy[s]
-            k[9,   3, s] = k[3, 9, s]
-            k[4,   4, s] = GJ[s] / dy[s]
-            k[4,  10, s] = -GJ[s] / dy[s]
-            k[10,  4, s] = k[4, 10, s]
-            k[5,   5, s] = 4 * EIx[s] / dy[s]
-            k[5,   6, s] = 6 * EIx[s] / (dy[s] * dy[s])
-            k[6,   5, s] = k[5, 6, s]
-            k[5,  11, s] = 2 * EIx[s] / dy[s]
-            k[11,  5, s] = k[5, 11, s]
-            k[6,   6, s] = 12 * EIx[s] / (dy[s] * dy[s] * dy[s])
-            k[6,  11, s] = 6 * EIx[s] / (dy[s] * dy[s])
-            k[11,  6, s] = k[6, 11, s]
-            k[7,   7, s] = EA[s] / dy[s]
-            k[8,   8, s] = 12 * EIz[s] / (dy[s] * dy[s] * dy[s])
-            k[8,   9, s] = -6 * EIz[s] / (dy[s] * dy[s])
-            k[9,   8, s] = k[8, 9, s]
-            k[9,   9, s] = 4 * EIz[s] / dy[s]
-            k[10, 10, s] = GJ[s] / dy[s]
-            k[11, 11, s] = 4 * EIx[s] / dy[s]
-
-            # Perform dihedral and sweep rotations here if needed
-
-            # Assemble global stiffness matrix
-            K[(6*s):(6*s + 12), (6*s):(6*s + 12)] = \
-                K[(6*s):(6*s + 12), (6*s):(6*s + 12)] + k[:, :, s]
-
-            Faero = np.zeros((6, 1))
-            if self.flags.Load == 0:  # include aero forces
-                # aerodynamic forces
-                xAC = 0.25
-                Faero[0] = fblade.Fx[s] / 2
-                Faero[1] = 0
-                Faero[2] = fblade.Fz[s] / 2
-                Faero[3] = fblade.Fz[s] * dy[s] / 12
-                Faero[4] = fblade.My[s] / 2 + (xEA[s] - xAC) * cE[s] * fblade.Fz[s] / 2
-                Faero[5] = -fblade.Fx[s] * dy[s] / 12
-
-            Fg = np.zeros((6, 1))
-            Fwire = np.zeros((12, 1))
-
-            if (self.flags.Load == 0) or (self.flags.Load == 1):
-                # gravitational forces
-                g = 9.81
-                Fg[0] = 0
-                Fg[1] = 0
-                Fg[2] = -(mSpar[s] + mChord[s]) * g / 2
-                Fg[3] = -(mSpar[s] + mChord[s]) * g * dy[s] / 12
-                Fg[4] = (xCG[s] - xEA[s]) * cE[s] * (mSpar[s] + mChord[s]) * g / 2
-                Fg[5] = 0
-
-                # Wire forces (using consistent force vector)
-                for w in range(len(yWire)):
-                    if (yWire[w] >= yN[s]) and (yWire[w] < yN[s+1]):
-                        thetaWire = atan2(zWire, yWire[w])
-                        a = yWire[w] - yN[s]
-                        L = dy[s]
-                        FxWire = -cos(thetaWire) * TWire[w]
-                        FzWire = -sin(thetaWire) * TWire[w]
-                        Fwire[0] = 0
-                        Fwire[1] = FxWire * (1 - a/L)
-                        Fwire[2] = FzWire * (2 * (a/L)**3 - 3 * (a/L)**2 + 1)
-                        Fwire[3] = FzWire * a * ((a/L)**2 - 2 * (a/L) + 1)
-                        Fwire[4] = 0
-                        Fwire[5] = 0
-                        Fwire[6] = 0
-                        Fwire[7] = FxWire * (a/L)
-                        Fwire[8] = FzWire * (-2 * (a/L)**3 + 3*(a/L)**2)
-                        Fwire[9] = FzWire * a * ((a/L)**2 - (a/L))
-                        Fwire[10] = 0
-                        Fwire[11] = 0
-                    else:
-                        Fwire = np.zeros((12, 1))
-
-            Fpres = np.zeros((12, 1))
-
-            if self.flags.Load == 2:
-                # Prescribed point load (using consistent force vector)
-                if (presLoad.y >= yN[s]) and (presLoad.y < yN[s+1]):
-                    a = presLoad.y - yN[s]
-                    L = dy[s]
-                    Fpres[0]  = 0
-                    Fpres[1]  = 0
-                    Fpres[2]  = presLoad.pointZ * (2 * (a / L)**3 - 3 * (a / L)**2 + 1)
-                    Fpres[3]  = presLoad.pointZ * a * ((a / L)**2 - 2 * (a / L) + 1)
-                    Fpres[4]  = presLoad.pointM * (1 - a / L)
-                    Fpres[5]  = 0
-                    Fpres[6]  = 0
-                    Fpres[7]  = 0
-                    Fpres[8]  = presLoad.pointZ * (- 2 * (a / L)**3 + 3 * (a / L)**2)
-                    Fpres[9]  = presLoad.pointZ * a * ((a / L)**2 - (a / L))
-                    Fpres[10] = presLoad.pointM * (a / L)
-                    Fpres[11] = 0
-
-                # Prescribed distributed load
-                Fpres[0]  = Fpres[0]  + presLoad.distributedX * dy[s] / 2
-                Fpres[1]  = Fpres[1]  + 0
-                Fpres[2]  = Fpres[2]  + presLoad.distributedZ * dy[s] / 2
-                Fpres[3]  = Fpres[3]  + presLoad.distributedZ * dy[s] * dy[s] / 12
-                Fpres[4]  = Fpres[4]  + presLoad.distributedM * dy[s] / 2
-                Fpres[5]  = Fpres[5]  - presLoad.distributedX * dy[s] * dy[s] / 12
-                Fpres[6]  = Fpres[6]  + presLoad.distributedX * dy[s] / 2
-                Fpres[7]  = Fpres[7]  + 0
-                Fpres[8]  = Fpres[8]  + presLoad.distributedZ * dy[s] / 2
-                Fpres[9]  = Fpres[9]  - presLoad.distributedZ * dy[s] * dy[s] / 12
-                Fpres[10] = Fpres[10] + presLoad.distributedM * dy[s] / 2
-                Fpres[11] = Fpres[11] + presLoad.distributedX * dy[s] * dy[s] / 12
-
-            # Assemble global force vector
-            F[(s*6 + 0)]  = F[(s*6 + 0)]  + Fpres[0]  + Fwire[0]  + Fg[0] + Faero[0]  # x force
-            F[(s*6 + 1)]  = F[(s*6 + 1)]  + Fpres[1]  + Fwire[1]  + Fg[1] + Faero[1]  # y force
-            F[(s*6 + 2)]  = F[(s*6 + 2)]  + Fpres[2]  + Fwire[2]  + Fg[2] + Faero[2]  # z force
-            F[(s*6 + 3)]  = F[(s*6 + 3)]  + Fpres[3]  + Fwire[3]  + Fg[3] + Faero[3]  # x moment
-            F[(s*6 + 4)]  = F[(s*6 + 4)]  + Fpres[4]  + Fwire[4]  + Fg[4] + Faero[4]  # y moment
-            F[(s*6 + 5)]  = F[(s*6 + 5)]  + Fpres[5]  + Fwire[5]  + Fg[5] + Faero[5]  # z moment
-            F[(s*6 + 6)]  = F[(s*6 + 6)]  + Fpres[6]  + Fwire[6]  + Fg[0] + Faero[0]  # x force
-            F[(s*6 + 7)]  = F[(s*6 + 7)]  + Fpres[7]  + Fwire[7]  + Fg[1] + Faero[1]  # y force
-            F[(s*6 + 8)]  = F[(s*6 + 8)]  + Fpres[8]  + Fwire[8]  + Fg[2] + Faero[2]  # z force
-            F[(s*6 + 9)]  = F[(s*6 + 9)]  + Fpres[9]  + Fwire[9]  - Fg[3] - Faero[3]  # x moment
-            F[(s*6 + 10)] = F[(s*6 + 10)] + Fpres[10] + Fwire[10] + Fg[4] + Faero[4]  # y moment
-            F[(s*6 + 11)] = F[(s*6 + 11)] + Fpres[11] + Fwire[11] - Fg[5] - Faero[5]  # z moment
+        # Assemble global stiffness matrix (banded, half-bandwidth 11)
+        Kb = banded_stiffness(k)
+        K = dense_stiffness(Kb)
 
         # Add constraints to all 6 dof at root
 
@@ -359,12 +455,31 @@ class FEM(Component):
                     ii = np.array([ii, ss]).reshape(1, -1)
             Fc = F[(ii-1)]
             Kc = K[(ii-1), (ii-1)]
+            qc, _, _, _ = np.linalg.lstsq(Kc, Fc)
         else:
             Fc = F[6:]
-            Kc = K[6:, 6:]
-
-        # Solve constrained system
-        qc, _, _, _ = np.linalg.lstsq(Kc, Fc)
+            Kbc = Kb[:, 6:]  # entries coupling to the root are outside the band
+
+            # Solve constrained system
+            key = stiffness_key(yN, EIx, EIz, EA, GJ)
+
+            if self.superpose:
+                # the aero forces (the first case) change in every coupled
+                # iteration and are solved on their own, the other cases
+                # only when the stiffness or the spar change
+                basis = stiffness_key(yN, EIx, EIz, EA, GJ, Fbasis[:, 1:])
+                if basis != self._basis:
+                    qbasis = np.zeros(((Ns+1)*6, len(LOAD_CASES)))
+                    qbasis[6:] = self.solve(key, Kbc, Fbasis[6:])
+                    self._basis = basis
+                else:
+                    qbasis = self.qbasis.copy()
+                    qbasis[6:, :1] = self.solve(key, Kbc, Fbasis[6:, :1])
+                self.qbasis = qbasis
+                qc = np.dot(self.qbasis[6:], loadFactors).reshape(-1, 1)
+            else:
+                qc = self.solve(key, Kbc, Fc)
+                self._basis = None
 
         if self.flags.wingWarp > 0:
             self.q[ii, 1] = qc
@@ -376,6 +491,41 @@ class FEM(Component):
         self.k = k
         self.K = K
         self.F = F
+        self.Fbasis = Fbasis
+        self.loadFactors = loadFactors
+
+    def solve(self, key, Kbc, rhs):
+        """ solution of the constrained system Kbc (banded) for the right
+            hand sides rhs, with the factorization of Kbc cached by its
+            stiffness_key
+        """
+        # factorize the stiffness only when it is not in the cache
+        if key in _factorizations:
+            cb = _factorizations.pop(key)
+        else:
+            cb = factor_stiffness(Kbc)
+            while len(_factorizations) >= CACHE_SIZE:
+                _factorizations.popitem(last=False)
+        _factorizations[key] = cb
+
+        return solve_stiffness(Kbc, cb, rhs)
+
+    def superposed(self, loadFactors):
+        """ global force vector and deformation for the magnitudes loadFactors
+            of the LOAD_CASES, without solving, from the deformations of the
+            last run with superpose
+        """
+        if self._basis is None:
+            raise Exception('FEM has no deformations of the load cases, run it with superpose')
+
+        F = np.dot(self.Fbasis, loadFactors).reshape(-1, 1)
+        q = np.dot(self.qbasis, loadFactors).reshape(-1, 1)
+        return F, q
+
+    @classmethod
+    def clear_cache(cls):
+        """ discard the cached factorizations of the stiffness matrices """
+        _factorizations.clear()
 
 
 class Strains(Component):
@@ -958,6 +1108,7 @@ class Structures(Assembly):
         # inputs for FEM
         self.add('fblade',       VarTree(Fblade(Ns), iotype='in'))
         self.add('presLoad',     VarTree(PrescribedLoad(), iotype='in'))
+        self.add('superpose',    Bool(False, iotype='in', desc='superpose the deformations of the FEM load cases'))
 
         # configure
         self.add('spar', SparProperties(Ns))
@@ -1024,6 +1175,7 @@ class Structures(Assembly):
         self.connect('TWire',        'fem.TWire')
         self.connect('fblade',       'fem.fblade')
         self.connect('presLoad',     'fem.presLoad')
+        self.connect('superpose',    'fem.superpose')
 
         self.add('strains', Strains(Ns))
         self.connect('yN',    'strains.yN')
@@ -1078,3 +1230,20 @@ class Structures(Assembly):
         self.driver.workflow.add('spar')
         self.driver.workflow.add('strains')
         self.driver.workflow.add('failure')
+
+    def load_case(self, loadFactors):
+        """ deformation, internal forces and strains for the magnitudes
+            loadFactors of the FEM LOAD_CASES, without solving, after a run
+            with superpose
+        """
+        F, q = self.fem.superposed(loadFactors)
+
+        strains = Strains(len(self.strains.d))
+        strains.yN = self.strains.yN
+        strains.d = self.strains.d
+        strains.k = self.fem.k
+        strains.F = F
+        strains.q = q
+        strains.execute()
+
+        return q, strains.Finternal, strains.strain
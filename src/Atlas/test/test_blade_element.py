@@ -0,0 +1,137 @@
+import unittest
+
+import numpy as np
+
+from Atlas import BladeElement, LiftDrag, Thrust, dragCoefficient
+from Atlas.derivatives import check_derivatives
+
+
+def relative_err(x, y):
+    return (np.abs(x-y)/np.linalg.norm(x)).max()
+
+
+class BladeElementTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.inputs = {
+            'Ns':    10,
+            'yN':    np.arange(11.),
+            'dr':    np.ones(10),
+            'r':     np.arange(10.) + 0.5,
+            'ycmax': 1.4656,
+            'rho':   1.18,
+            'visc':  1.78e-05,
+            'vw':    0.,
+            'vc':    0.,
+            'Omega': 1.0367,
+            'vi':    np.array([0.035025, 0.100048, 0.160388, 0.174335, 0.182077,
+                               0.184890, 0.183906, 0.180033, 0.174075, 0.136191]),
+            'c':     np.array([0.2729, 1.3903, 1.1757, 1.0176, 0.8818,
+                               0.7602, 0.6507, 0.5528, 0.4666, 0.3925]),
+            'Cl':    np.array([1.5000, 1.4987, 1.4604, 1.4239, 1.3940,
+                               1.3642, 1.3344, 1.3046, 1.2747, 0.8299]),
+            'd':     np.array([0.0843, 0.0780, 0.0718, 0.0655, 0.0592,
+                               0.0530, 0.0477, 0.0431, 0.0384, 0.0338]),
+            'yWire': np.array([5.8852, 8.2]),
+            'zWire': 1.,
+            'tWire': 0.0016,
+            'Cm':    -np.array([0.1500, 0.1494, 0.1330, 0.1200, 0.1200,
+                                0.1200, 0.1200, 0.1200, 0.1200, 0.1200]),
+            'xtU':   np.array([0.05] + [0.15]*9),
+            'xtL':   np.array([0.05] + [0.30]*9),
+        }
+
+    def run_component(self, comp):
+        for name, value in self.inputs.items():
+            if hasattr(comp, name):
+                setattr(comp, name, value)
+        comp.run()
+        return comp
+
+    def test_blade_element(self):
+        """ test BladeElement against Thrust and LiftDrag
+        """
+        comp = self.run_component(BladeElement(10))
+
+        thrust = self.run_component(Thrust(10))
+        self.assertLess(relative_err(thrust.dT, comp.dT), 1e-12)
+        self.assertLess(relative_err(thrust.chordFrac.flatten(), comp.chordFrac), 1e-12)
+
+        self.inputs['chordFrac'] = comp.chordFrac
+        lift_drag = self.run_component(LiftDrag(10))
+        for name in ('Re', 'Cd', 'phi'):
+            self.assertLess(relative_err(getattr(lift_drag, name), getattr(comp, name)), 1e-12)
+        for name in ('Fx', 'Fz', 'My', 'Q', 'P', 'Pi', 'Pp'):
+            self.assertLess(relative_err(getattr(lift_drag.Fblade, name),
+                                         getattr(comp.Fblade, name)), 1e-12)
+
+    def test_spar(self):
+        """ test the drag of the root spar where there is no chord
+        """
+        self.inputs['c'][0] = 0.
+        self.inputs['yWire'] = np.array([5.8852])
+        comp = self.run_component(BladeElement(10))
+
+        rho, visc, tWire = self.inputs['rho'], self.inputs['visc'], self.inputs['tWire']
+        U = np.hypot(self.inputs['Omega'] * 0.5, self.inputs['vi'][0])
+        Re = rho * U * self.inputs['d'][0] / visc
+        Cd = -1e-10*Re**3 + 7e-07*Re**2 - 0.0013*Re + 1.7397
+        ReWire = rho * U * tWire / visc
+        CdWire = -1e-10*ReWire**3 + 7e-07*ReWire**2 - 0.0013*ReWire + 1.7397
+        L = np.sqrt(1 + 5.8852**2) / 5.8852
+        dD = 0.5 * rho * U**2 * (Cd * self.inputs['d'][0] + CdWire * tWire * L)
+
+        self.assertAlmostEqual(comp.Re[0], Re, 8)
+        self.assertAlmostEqual(comp.Cd[0], Cd, 12)
+        self.assertAlmostEqual(comp.Fblade.Fx[0], dD * np.cos(comp.phi[0]), 12)
+        self.assertAlmostEqual(comp.Fblade.Fz[0], -dD * np.sin(comp.phi[0]), 12)
+
+    def test_analytic_drag(self):
+        """ test the analytic drag model of the wing sections (Cdfit = 0)
+        """
+        self.inputs['Cdfit'] = 0
+        self.inputs['tc'] = 0.14 * np.ones(10)
+        comp = self.run_component(BladeElement(10))
+
+        Cd = dragCoefficient(comp.Re, 0.14, self.inputs['xtU'], self.inputs['xtL'])
+        self.assertLess(relative_err(Cd, comp.Cd), 1e-12)
+
+    def test_derivatives(self):
+        """ test the Jacobians of BladeElement and LiftDrag against complex step,
+            with a root spar, partially covered elements and both drag models
+        """
+        self.inputs['c'][0] = 0.
+        self.inputs['chordFrac'] = np.linspace(0.5, 1., 10)
+        self.inputs['tc'] = 0.14 * np.ones(10)
+        self.inputs['vc'] = 0.3
+        self.inputs['vw'] = 0.2
+
+        for Cdfit in (0, 1):
+            self.inputs['Cdfit'] = Cdfit
+            for comp in (BladeElement(10), LiftDrag(10)):
+                self.run_component(comp)
+                errors = check_derivatives(comp)
+                self.assertLess(max(errors.values()), 1e-12)
+
+        # without wires
+        self.inputs['yWire'] = np.array([0.])
+        for comp in (BladeElement(10), LiftDrag(10)):
+            self.run_component(comp)
+            errors = check_derivatives(comp)
+            self.assertTrue(all(err < 1e-12 for err in errors.values()))
+
+        # forward and adjoint products
+        arg = {'vi': np.ones(10), 'Omega': 0.1}
+        result = {'Fblade.Fz': np.zeros(10), 'dT': np.zeros((10, 1))}
+        comp.apply_deriv(arg, result)
+
+        argT = {'Fblade.Fz': np.ones(10), 'dT': np.ones((10, 1))}
+        resultT = {'vi': np.zeros(10), 'Omega': 0.}
+        comp.apply_derivT(argT, resultT)
+
+        self.assertAlmostEqual(np.sum(result['Fblade.Fz']) + np.sum(result['dT']),
+                               np.sum(resultT['vi']) + 0.1*resultT['Omega'], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
-from Atlas import DragCoefficient, frictionCoefficient
+from Atlas import DragCoefficient, frictionCoefficient, dragCoefficient, dragCoefficientFit
 import unittest
+import numpy as np
 from openmdao.util.testutil import assert_rel_error
 
 
@@ -58,6 +59,37 @@ class AtlasTestCase(unittest.TestCase):
 
         assert_rel_error(self, Cfflat, 0.0019241, self.tol)
 
+    def test_arrays(self):
+        """ array and complex arguments, with points in all three regimes
+        """
+        Re = np.array([[5e5], [4.7632e5]])
+        xtc = np.array([0., 0.15, 0.5, 1.])
+
+        Cf = frictionCoefficient(Re, xtc)
+        self.assertEqual(Cf.shape, (2, 4))
+        for i in range(2):
+            for j in range(4):
+                self.assertEqual(Cf[i, j], frictionCoefficient(Re[i, 0], xtc[j]))
+        assert_rel_error(self, Cf[0, 2], 0.003846, self.tol)
+        assert_rel_error(self, Cf[1, 3], 0.0019241, self.tol)
+
+        Cd = dragCoefficient(4.7632e5, 0.15, np.array([0.15, 0.5]), np.array([0.15, 1.]))
+        assert_rel_error(self, Cd[0], 0.013329, self.tol)
+        assert_rel_error(self, Cd[1], 0.0077468, self.tol)
+
+        # complex step derivatives against central differences
+        h = 1e-30
+        for f, args in ((frictionCoefficient, (Re[0, 0], xtc)),
+                        (dragCoefficientFit, (Re[0, 0], 0.15, 0.3))):
+            dRe = f(Re[0, 0] + 1j*h, *args[1:]).imag / h
+            fd = (f(Re[0, 0] + 1., *args[1:]) - f(Re[0, 0] - 1., *args[1:])) / 2.
+            self.assertLess(np.max(np.abs(dRe - fd) / np.abs(fd)), 1e-6)
+
+        dx = frictionCoefficient(Re[0, 0], np.array([0.15, 0.5]) + 1j*h).imag / h
+        fd = (frictionCoefficient(Re[0, 0], np.array([0.15, 0.5]) + 1e-6) -
+              frictionCoefficient(Re[0, 0], np.array([0.15, 0.5]) - 1e-6)) / 2e-6
+        self.assertLess(np.max(np.abs(dx - fd) / np.abs(fd)), 1e-6)
+
 
 if __name__ == "__main__":
     unittest.main()
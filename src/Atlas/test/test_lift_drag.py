@@ -1,5 +1,6 @@
 # pylint: disable=line-too-long, invalid-name, bad-whitespace, trailing-whitespace, too-many-locals, line-too-long
 from Atlas import LiftDrag
+from Atlas.lift_drag import wire_length
 import numpy as np
 import unittest
 
@@ -135,6 +136,23 @@ class AtlasTestLiftDrag(unittest.TestCase):
         ])
         self.assertLess(relative_err(Re, comp.Re), tol)
 
+    def test_wire_length(self):
+        yN = np.linspace(0., 10., 11)
+        yWire = np.array([2.5, 5.])
+        L = wire_length(yN, np.ones(10), yWire, 1.)
+
+        expected = np.zeros((10, 2))
+        expected[:2, 0] = 1.
+        expected[2, 0] = 0.5
+        expected[:5, 1] = 1.
+        expected *= np.sqrt(1. + yWire**2) / yWire
+        self.assertLess(absolute_err(expected, L), 1e-15)
+
+        # without wires
+        with np.errstate(all='raise'):
+            L = wire_length(yN, np.ones(10), np.array([0.]), 1.)
+        self.assertLess(absolute_err(np.zeros((10, 1)), L), 1e-15)
+
 
 if __name__ == "__main__":
     unittest.main()
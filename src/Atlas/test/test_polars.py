@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+from Atlas import save_polars, load_polars, clear_polars, PolarDatabase, LiftDrag
+from Atlas.derivatives import check_derivatives
+
+
+def airfoil_polar(name, scale):
+    """ smooth polar of a test airfoil """
+    Re = np.array([1e5, 2e5, 5e5, 1e6])
+    alpha = np.linspace(-5., 15., 21)
+    a, R = np.meshgrid(alpha, Re)
+
+    Cl = scale * 0.1 * (a + 2.) * (1 + 0.05*np.log(R / 1e5))
+    Cd = 0.01 * (R / 1e5)**-0.2 + 0.0002 * (a - 2.)**2
+    Cm = -0.1 * scale + 0.002 * a
+    return name, Re, alpha, Cl, Cd, Cm
+
+
+class PolarDatabaseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'polars.npz')
+        self.polars = [airfoil_polar('thin', 1.), airfoil_polar('thick', 1.2)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_lookup(self):
+        """ test the interpolation and inversion of the tables
+        """
+        save_polars(self.filename, self.polars)
+        db = load_polars(self.filename)
+        self.assertEqual(db.names, ['thin', 'thick'])
+        self.assertTrue(load_polars(self.filename) is db)
+
+        # exact on the grid, for both airfoils at once
+        name, Re, alpha, Cl, Cd, Cm = self.polars[1]
+        airfoil = db.index(['thin', 'thick'])
+        C, _, _ = db.evaluate(airfoil, Re[2], alpha[7])
+        self.assertAlmostEqual(C[0, 1], Cl[2, 7], 12)
+        self.assertAlmostEqual(C[1, 1], Cd[2, 7], 12)
+        self.assertAlmostEqual(C[2, 1], Cm[2, 7], 12)
+        self.assertAlmostEqual(C[0, 0], self.polars[0][3][2, 7], 12)
+
+        # splines between the angles of attack (the polar is quadratic in alpha)
+        C, C_alpha, _ = db.evaluate(1, Re[1], 3.3)
+        self.assertAlmostEqual(C[1], 0.01 * 2**-0.2 + 0.0002 * 1.3**2, 5)
+        self.assertAlmostEqual(C_alpha[0], 0.12 * (1 + 0.05*np.log(2.)), 6)
+
+        # angle of attack of a given lift, for mixed airfoils and Reynolds numbers
+        airfoil = np.array([0, 1, 1, 0])
+        Re = np.array([1.5e5, 3e5, 8e5, 1e6])
+        Cl = np.array([0.3, 0.5, 0.9, 1.1])
+        alpha = db.angle(airfoil, Re, Cl)
+        C, _, _ = db.evaluate(airfoil, Re, alpha)
+        self.assertLess(np.abs(C[0] - Cl).max(), 1e-12)
+
+        Cd, Cm, Cd_Re, Cd_Cl, Cm_Re, Cm_Cl = db.drag(airfoil, Re, Cl)
+        for k in range(4):
+            self.assertEqual(db.drag(airfoil[k], Re[k], Cl[k])[0], Cd[k])
+
+        # derivatives at constant lift against complex step
+        h = 1e-30
+        self.assertLess(np.abs(db.drag(airfoil, Re + 1j*h, Cl)[0].imag / h - Cd_Re).max(), 1e-15)
+        self.assertLess(np.abs(db.drag(airfoil, Re, Cl + 1j*h)[1].imag / h - Cm_Cl).max(), 1e-12)
+
+    def test_load(self):
+        """ test that changed files are read again
+        """
+        save_polars(self.filename, self.polars)
+        db = load_polars(self.filename)
+
+        os.remove(self.filename)
+        save_polars(self.filename, self.polars[:1])
+        os.utime(self.filename, (0, 0))
+        db1 = load_polars(self.filename)
+        self.assertEqual(db1.names, ['thin'])
+        self.assertTrue(load_polars(self.filename) is db1)
+
+        clear_polars()
+        self.assertFalse(load_polars(self.filename) is db1)
+
+    def test_flat(self):
+        """ test the inversion of a flat lift curve
+        """
+        db = PolarDatabase([airfoil_polar('flat', 0.)])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            alpha = db.angle(0, 2e5, np.array([0., 0.5]))
+            Cd, Cm, Cd_Re, Cd_Cl, Cm_Re, Cm_Cl = db.drag(0, 2e5, np.array([0., 0.5]))
+        self.assertTrue(np.all(np.isfinite(alpha)))
+        self.assertTrue(np.all(Cd_Cl == 0.) and np.all(Cm_Cl == 0.))
+        self.assertTrue(np.all(np.isfinite(Cd_Re)) and np.all(np.isfinite(Cm_Re)))
+
+    def test_stall(self):
+        """ test lift coefficients beyond stall and the table
+        """
+        name, Re, alpha, Cl, Cd, Cm = airfoil_polar('stall', 1.)
+        Cl = np.minimum(Cl, 1.3)
+        db = PolarDatabase([(name, Re, alpha, Cl, Cd, Cm)])
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            Cd, Cm, Cd_Re, Cd_Cl, Cm_Re, Cm_Cl = db.drag(0, 2e5, np.array([0.5, 1.5, 3.]))
+        self.assertEqual(len(caught), 1)
+        self.assertTrue('2 of 3' in str(caught[0].message))
+
+        # alpha is held fixed in the derivatives of the points out of reach
+        self.assertNotEqual(Cd_Cl[0], 0.)
+        self.assertTrue(np.all(Cd_Cl[1:] == 0.) and np.all(Cm_Cl[1:] == 0.))
+        self.assertTrue(np.all(np.isfinite(Cd_Re)) and np.all(np.isfinite(Cm_Re)))
+
+        # and no warning for those in reach
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            db.angle(0, 2e5, np.array([0.5, 1.2]))
+        self.assertEqual(len(caught), 0)
+
+    def test_LiftDrag(self):
+        """ test LiftDrag with airfoil polars
+        """
+        save_polars(self.filename, self.polars)
+        db = load_polars(self.filename)
+
+        comp = LiftDrag(4)
+        comp.Ns = 4
+        comp.yN = np.linspace(0., 8., 5)
+        comp.r = np.linspace(1., 7., 4)
+        comp.dr = 2 * np.ones(4)
+        comp.rho = 1.18
+        comp.visc = 1.78e-05
+        comp.vc = 0.1
+        comp.Omega = 1.0367
+        comp.vi = np.array([0.1, 0.15, 0.17, 0.16])
+        comp.c = np.array([0., 1.2, 0.9, 0.6])
+        comp.d = 0.08 * np.ones(4)
+        comp.Cl = np.array([1.2, 1.1, 1., 0.9])
+        comp.Cm = -0.12 * np.ones(4)
+        comp.chordFrac = np.ones(4)
+        comp.yWire = np.array([5.])
+        comp.zWire = 1.
+        comp.tWire = 0.0016
+        comp.polars = self.filename
+        comp.airfoil = np.array([0, 1, 1, 0])
+        comp.run()
+
+        Cd, Cm = db.drag(comp.airfoil[1:], comp.Re[1:], comp.Cl[1:])[:2]
+        self.assertLess(np.abs(comp.Cd[1:] - Cd).max(), 1e-15)
+
+        U2 = (comp.Omega * comp.r)**2 + (comp.vc + comp.vi)**2
+        My = 0.5 * comp.rho * U2[1:] * Cm * comp.c[1:]**2 * comp.dr[1:]
+        self.assertLess(np.abs(comp.Fblade.My[1:] - My).max(), 1e-12)
+
+        errors = check_derivatives(comp)
+        self.assertLess(max(errors.values()), 1e-10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,14 @@
 from Atlas import Flags, JointProperties, PrescribedLoad, Fblade, Strain, \
-                  MassProperties, FEM, Strains, Failures, Structures
+                  MassProperties, FEM, Strains, Failures, Structures, LOAD_CASES
 
 import os
 
+import numpy as np
+
 from scipy.io import loadmat
 
+from Atlas import structures
+
 import unittest
 
 
@@ -133,6 +137,116 @@ class TestStructures(unittest.TestCase):
         # check outputs
         self.check_FEM(comp, data)
 
+    def run_spar(self, Ns):
+        """ run FEM for a uniform spar of Ns elements with two wires """
+        comp = FEM(Ns)
+        comp.flags = Flags()
+        comp.yN  = np.linspace(0., 10., Ns+1)
+        comp.EIx = 2e4 * np.ones(Ns)
+        comp.EIz = 1e3 * np.ones(Ns)
+        comp.EA  = 1e7 * np.ones(Ns)
+        comp.GJ  = 5e2 * np.ones(Ns)
+        comp.cE  = np.linspace(1.2, 0.4, Ns)
+        comp.xEA = 0.27 * np.ones(Ns)
+        comp.fblade = Fblade(Ns)
+        comp.fblade.Fx = 0.1 * np.ones(Ns)
+        comp.fblade.Fz = np.linspace(0.5, 2., Ns)
+        comp.fblade.My = -0.05 * np.ones(Ns)
+        comp.mSpar  = 0.02 * np.ones(Ns)
+        comp.mChord = 0.03 * np.ones(Ns)
+        comp.xCG    = 0.3 * np.ones(Ns)
+        comp.yWire = np.array([3.3, 7.7])
+        comp.zWire = 1.
+        comp.TWire = np.array([40., 30.])
+        comp.run()
+        return comp
+
+    def test_FEM_banded(self):
+        """ test the banded solution of a refined spar and the least squares
+            fallback for a singular spar
+        """
+        comp = self.run_spar(200)
+        q = np.linalg.solve(comp.K[6:, 6:], comp.F[6:])
+        self.assertEqual(comp.q.shape, (6*201, 1))
+        self.assertTrue(np.all(comp.q[:6] == 0))
+        self.assertLess(np.abs(comp.q[6:] - q).max(), 1e-6 * np.abs(q).max())
+
+        # no torsional stiffness
+        comp.GJ = np.zeros(200)
+        comp.run()
+        q, _, _, _ = np.linalg.lstsq(comp.K[6:, 6:], comp.F[6:])
+        self.assertLess(np.abs(comp.q[6:] - q).max(), 1e-8 * np.abs(q).max())
+
+    def test_FEM_cache(self):
+        """ test the reuse of the stiffness factorization for new loads
+        """
+        FEM.clear_cache()
+        comp = self.run_spar(20)
+        self.assertEqual(len(structures._factorizations), 1)
+
+        # new loads, same stiffness
+        comp.TWire = np.array([60., 10.])
+        comp.fblade.Fz = np.linspace(1., 3., 20)
+        comp.run()
+        self.assertEqual(len(structures._factorizations), 1)
+        q = np.linalg.solve(comp.K[6:, 6:], comp.F[6:])
+        self.assertLess(np.abs(comp.q[6:] - q).max(), 1e-8 * np.abs(q).max())
+
+        # new stiffness
+        comp.EIx = 3e4 * np.ones(20)
+        comp.run()
+        self.assertEqual(len(structures._factorizations), 2)
+        q = np.linalg.solve(comp.K[6:, 6:], comp.F[6:])
+        self.assertLess(np.abs(comp.q[6:] - q).max(), 1e-8 * np.abs(q).max())
+
+        # least recently used factorizations are dropped
+        for n in range(structures.CACHE_SIZE):
+            comp.EIz = (1e3 + n) * np.ones(20)
+            comp.run()
+        self.assertEqual(len(structures._factorizations), structures.CACHE_SIZE)
+
+        FEM.clear_cache()
+        self.assertEqual(len(structures._factorizations), 0)
+
+    def test_FEM_superpose(self):
+        """ test the superposition of the deformations of the load cases
+        """
+        comp = self.run_spar(20)
+        F, q = comp.F, comp.q
+
+        comp.superpose = True
+        comp.run()
+        self.assertLess(np.abs(comp.q - q).max(), 1e-10 * np.abs(q).max())
+        self.assertLess(np.abs(comp.F - F).max(), 1e-12 * np.abs(F).max())
+
+        # new wire tension from the stored deformations, and by running again
+        loadFactors = comp.loadFactors.copy()
+        loadFactors[LOAD_CASES.index('wire')] = 75.
+        F, q = comp.superposed(loadFactors)
+
+        comp.TWire = np.array([40., 75.])
+        comp.run()
+        self.assertLess(np.abs(comp.q - q).max(), 1e-12 * np.abs(q).max())
+        self.assertLess(np.abs(comp.F - F).max(), 1e-12 * np.abs(F).max())
+
+        q = np.linalg.solve(comp.K[6:, 6:], comp.F[6:])
+        self.assertLess(np.abs(comp.q[6:] - q).max(), 1e-8 * np.abs(q).max())
+
+        # prescribed loads
+        comp.flags.Load = 2
+        comp.presLoad.distributedZ = 0.5
+        comp.run()
+        q = np.linalg.solve(comp.K[6:, 6:], comp.F[6:])
+        self.assertLess(np.abs(comp.q[6:] - q).max(), 1e-8 * np.abs(q).max())
+
+        # new aero forces are solved on their own, with the stored cases
+        qbasis = comp.qbasis.copy()
+        comp.fblade.Fz = comp.fblade.Fz * 1.2
+        comp.run()
+        self.assertTrue(np.all(comp.qbasis[:, 1:] == qbasis[:, 1:]))
+        q = np.linalg.solve(comp.K[6:, 6:], comp.F[6:])
+        self.assertLess(np.abs(comp.q[6:] - q).max(), 1e-8 * np.abs(q).max())
+
     def check_strains(self, comp, data):
         """ check component internal force and strain results against MATLAB data  """
 
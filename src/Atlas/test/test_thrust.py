@@ -4,6 +4,7 @@ import numpy as np
 from openmdao.util.testutil import assert_rel_error
 
 from Atlas import thrust
+from Atlas.derivatives import check_derivatives
 
 
 class ThrustTestCase(unittest.TestCase):
@@ -100,6 +101,37 @@ class ThrustTestCase(unittest.TestCase):
         assert_rel_error(self, comp.chordFrac, chordFrac, 1e-4)
         assert_rel_error(self, comp.dT, dT, 1e-4)
 
+    def test_derivatives(self):
+        comp = thrust.Thrust(10)
+        comp.Ns = 10
+        comp.yN = np.linspace(0., 10., 11)
+        comp.ycmax = 1.4656
+        comp.rho = 1.18
+        comp.Omega = 1.0367
+        comp.r = np.linspace(0.5, 9.5, 10)
+        comp.dr = np.ones(10)
+        comp.c = np.linspace(1.4, 0.4, 10)
+        comp.Cl = np.linspace(1.5, 0.8, 10)
+        comp.run()
+
+        errors = check_derivatives(comp)
+        self.assertLess(max(errors.values()), 1e-12)
+
+        comp = thrust.ActuatorDiskInducedVelocity(10)
+        comp.Ns = 10
+        comp.vc = 0.2
+        comp.b = 2
+        comp.rho = 1.18
+        comp.R = 10.
+        comp.h = 1.5
+        comp.r = np.linspace(0.5, 9.5, 10)
+        comp.dr = np.ones(10)
+        comp.dT = np.linspace(0.1, 27., 10).reshape(10, 1)
+        comp.run()
+
+        errors = check_derivatives(comp)
+        self.assertLess(max(errors.values()), 1e-12)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -101,8 +101,603 @@ class Test_Vortex(unittest.TestCase):
 
         self.check_outputs(comp, data)
 
+    def test_elliptic_kernel(self):
+        """ test the closed form ring influence against fine quadrature
+        """
+        from Atlas.vortex import ring_velocity, ring_velocity_elliptic
+
+        yp = np.array([0., 0.5, 2.5, 4.0])
+        zp = np.array([0.3, -0.2, 0.1, -1.0])
+        r  = np.array([1., 2., 3.])
+        zr = np.array([-0.5, -0.3, 0.4])
+        Gamma = np.array([0.2, -0.1, 0.3])
+
+        Ntheta = 4000
+        dtheta = np.pi / Ntheta
+        thetaArray = np.linspace(dtheta/2, np.pi - dtheta/2, Ntheta)
+
+        vr, vz = ring_velocity(yp, zp, r, zr, Gamma, 1e-9, thetaArray)
+        vr_e, vz_e = ring_velocity_elliptic(yp, zp, r, zr, Gamma, 1e-9)
+
+        assert relative_err(vr, vr_e) < 1e-6
+        assert relative_err(vz, vz_e) < 1e-6
+
+    def test_VortexRingC_elliptic(self):
+        """ test the cython version of the closed form kernel against the
+            python version
+        """
+        comp, data = self.initialize('VortexRing')
+        comp.kernel = 'elliptic'
+        comp.run()
+
+        compC, data = self.initialize('VortexRingC')
+        compC.kernel = 'elliptic'
+        compC.run()
+
+        assert relative_err(comp.vi, compC.vi) < 1e-10
+
+    def test_VortexRingC_elliptic_nan(self):
+        """ test that the compiled closed form kernel returns for undefined
+            ring geometry
+        """
+        from Atlas import vortex_ring_batchC
+
+        comp, data = self.initialize('VortexRingC')
+        q = np.array(data['q'], dtype=float).reshape(1, -1)
+        q[0, 20] = np.nan
+
+        vi, Gamma, r, z = vortex_ring_batchC(comp.b, comp.yN, comp.rho, [comp.Omega], [comp.h],
+                                             data['dT'].reshape(1, -1), q, comp.anhedral,
+                                             'elliptic', num_threads=2)
+        assert np.any(np.isnan(vi))
+
+    def test_VortexRingC_threads(self):
+        """ test that the threaded cython version matches the serial one
+        """
+        comp, data = self.initialize('VortexRingC')
+        comp.run()
+
+        for num_threads in (2, 4):
+            compT, data = self.initialize('VortexRingC')
+            compT.num_threads = num_threads
+            compT.run()
+
+            assert np.all(comp.vi == compT.vi)
+            assert np.all(comp.z == compT.z)
+            assert np.all(comp.r == compT.r)
+
+    def test_VortexRingC_single(self):
+        """ test the single precision kernel against double precision
+        """
+        for kernel in ('quadrature', 'elliptic'):
+            comp, data = self.initialize('VortexRingC')
+            comp.kernel = kernel
+            comp.run()
+
+            compS, data = self.initialize('VortexRingC')
+            compS.kernel = kernel
+            compS.precision = 'single'
+            compS.run()
+            assert relative_err(comp.vi, compS.vi) < 1e-3
+
+            compV, data = self.initialize('VortexRingC')
+            compV.kernel = kernel
+            compV.precision = 'validate'
+            compV.run()
+            assert np.all(compV.vi == compS.vi)
+            assert relative_err(compV.dvi_single, compS.vi - comp.vi) < 1e-12
+
+        # with frozen and warm wakes each precision keeps a wake of its own
+        for name in ('frozen_wake', 'warm_start'):
+            runs = []
+            for precision in ('double', 'single', 'validate'):
+                comp, data = self.initialize('VortexRingC')
+                comp.precision = precision
+                setattr(comp, name, True)
+                comp.run()
+                comp.dT = data['dT'] * 1.05
+                comp.run()
+                runs.append(comp)
+
+            comp, compS, compV = runs
+            assert np.all(compV.vi == compS.vi)
+            assert np.any(compV.dvi_single != 0.)
+            assert relative_err(compV.dvi_single, compS.vi - comp.vi) < 1e-12
+
+        # and the double precision reference is not recorded
+        import os
+        import shutil
+        import tempfile
+        from Atlas.wake_recorder import read_wake
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            comp, data = self.initialize('VortexRingC')
+            comp.precision = 'validate'
+            comp.wake_file = os.path.join(tempdir, 'validate.wake')
+            comp.run()
+
+            frames = read_wake(comp.wake_file)
+            self.assertEqual(len(frames), comp.r.shape[0])
+            assert np.all(frames['run'] == 0)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_fidelity(self):
+        """ test the wake fidelity inputs
+        """
+        # the fidelity set from Ns
+        comp, data = self.initialize('VortexRingC')
+        comp.Nw = 8
+        comp.Ntt = 3
+        comp.Ntheta = 20
+        comp.run()
+        assert relative_err(comp.vi, data['vi']) < 1e-7
+
+        # stopping on the change in vi
+        comp, data = self.initialize('VortexRing')
+        comp.Nw = 20
+        comp.vi_tol = 0.05
+        comp.run()
+
+        compC, data = self.initialize('VortexRingC')
+        compC.Nw = 20
+        compC.vi_tol = 0.05
+        compC.run()
+
+        Nd = np.count_nonzero(comp.Gamma[:, -1])
+        self.assertTrue(Nd < 21)
+        self.assertEqual(np.count_nonzero(compC.Gamma[:, -1]), Nd)
+        assert relative_err(comp.vi, compC.vi) < 1e-10
+
+    def test_fidelity_stopped(self):
+        """ test the derivatives and frozen wake of a march stopped on the
+            change in vi
+        """
+        comp, data = self.initialize('VortexRingC')
+        comp.Nw = 20
+        comp.vi_tol = 0.05
+        comp.run()
+        comp.linearize()
+        vi = comp.vi.copy()
+
+        fd, data = self.initialize('VortexRingC')
+        fd.Nw = 20
+        fd.vi_tol = 0.05
+        fd.dT[5] += 1e-5
+        fd.run()
+        assert relative_err((fd.vi - vi).flatten() / 1e-5, comp.J['dT'][:, 5]) < 1e-3
+
+        # the stored wake has the disks of the march
+        comp.frozen_wake = True
+        comp.run()
+        comp.dT = comp.dT * 1.05
+        comp.run()
+        assert relative_err(vi * 1.05, comp.vi) < 1e-12
+
+    def test_batch(self):
+        """ test the batched evaluation against separate runs
+        """
+        from Atlas import vortex_ring_batch, vortex_ring_batchC
+
+        comp, data = self.initialize('VortexRing')
+
+        scales = [(1., 1., 1.), (1.01, 1., 1.), (1., 0.98, 1.2)]
+        dT    = np.array([data['dT'] * s[0] for s in scales])
+        Omega = np.array([comp.Omega * s[1] for s in scales])
+        h     = np.array([comp.h * s[2] for s in scales])
+        q     = np.array([data['q'] for s in scales])
+
+        for kernel in ('quadrature', 'elliptic'):
+            vi, Gamma, r, z = vortex_ring_batch(comp.b, comp.yN, comp.rho, Omega, h, dT, q,
+                                                comp.anhedral, kernel)
+
+            viC, GammaC, rC, zC = vortex_ring_batchC(comp.b, comp.yN, comp.rho, Omega, h, dT, q,
+                                                     comp.anhedral, kernel, num_threads=2)
+            assert relative_err(vi, viC) < 1e-10
+            assert relative_err(z, zC) < 1e-10
+
+            for i in range(len(scales)):
+                comp, data = self.initialize('VortexRing')
+                comp.kernel = kernel
+                comp.dT = dT[i]
+                comp.Omega = Omega[i]
+                comp.h = h[i]
+                comp.run()
+
+                assert relative_err(comp.vi.flatten(), vi[i]) < 1e-12
+                assert relative_err(comp.Gamma, Gamma[i]) < 1e-12
+                assert relative_err(comp.r, r[i]) < 1e-12
+                assert relative_err(comp.z, z[i]) < 1e-12
+
+    def test_derivatives(self):
+        """ test the adjoint derivatives against finite differences
+        """
+        comp, data = self.initialize('VortexRingC')
+        comp.run()
+        comp.linearize()
+        vi = comp.vi.copy()
+
+        for name, i, step in (('Omega', None, 1e-6), ('h', None, 1e-6), ('anhedral', None, 1e-7),
+                              ('dT', 5, 1e-5), ('q', 32, 1e-7)):
+            fd, data = self.initialize('VortexRingC')
+            if i is None:
+                setattr(fd, name, getattr(fd, name) + step)
+                J = comp.J[name]
+            else:
+                getattr(fd, name)[i] += step
+                J = comp.J[name][:, i]
+            fd.run()
+
+            assert relative_err((fd.vi - vi).flatten() / step, J) < 1e-3
+
+        # forward and adjoint products
+        arg = {'dT': np.ones((comp.Ns, 1)), 'Omega': 0.1}
+        result = {'vi': np.zeros((comp.Ns, 1))}
+        comp.apply_deriv(arg, result)
+
+        argT = {'vi': np.ones((comp.Ns, 1))}
+        resultT = {'dT': np.zeros((comp.Ns, 1)), 'Omega': 0.}
+        comp.apply_derivT(argT, resultT)
+
+        self.assertAlmostEqual(np.sum(result['vi']),
+                               np.sum(resultT['dT']) + 0.1*resultT['Omega'], 10)
+
+    def test_derivatives_far_wake(self):
+        """ test the adjoint derivatives with the far-wake closure against
+            finite differences
+        """
+        comp, data = self.initialize('VortexRingC')
+        comp.far_wake = 4
+        comp.run()
+        comp.linearize()
+        vi = comp.vi.copy()
+
+        for name, i, step in (('Omega', None, 1e-6), ('h', None, 1e-6), ('anhedral', None, 1e-7),
+                              ('dT', 5, 1e-5), ('q', 32, 1e-7)):
+            fd, data = self.initialize('VortexRingC')
+            fd.far_wake = 4
+            if i is None:
+                setattr(fd, name, getattr(fd, name) + step)
+                J = comp.J[name]
+            else:
+                getattr(fd, name)[i] += step
+                J = comp.J[name][:, i]
+            fd.run()
+
+            assert relative_err((fd.vi - vi).flatten() / step, J) < 1e-3
+
+        # the treecode, warm starts and frozen wakes are not differentiated
+        for name, value in (('tree_theta', 0.5), ('warm_start', True), ('frozen_wake', True)):
+            comp, data = self.initialize('VortexRing')
+            setattr(comp, name, value)
+            self.assertRaises(Exception, comp.linearize)
+
+    def test_wake_tangent(self):
+        """ test the tangent of the wake march against its adjoint
+        """
+        from Atlas.vortex import wake_tangent, wake_adjoint
+
+        rs = np.random.RandomState(0)
+        Ns, Nw, Ntt = 6, 4, 2
+        yN = np.linspace(0., 10., Ns+1)
+        yE = (yN[:-1] + yN[1:]) / 2
+        Gamma0 = np.concatenate(([0.], rs.rand(Ns)))
+        qh = 0.1 * rs.randn(Ns+1)
+
+        Ntheta = 12
+        dtheta = np.pi / Ntheta
+        thetaArray = np.linspace(dtheta/2, np.pi - dtheta/2, Ntheta)
+
+        args = (Gamma0, yN, yE, qh, 1.5, 0.2, Nw, Ntt, Nw, 0.8, thetaArray)
+
+        dGamma0 = rs.randn(Ns+1, 2)
+        dqh = rs.randn(Ns+1, 2)
+        dh = rs.randn(2)
+        ddt = rs.randn(2)
+        dvi = wake_tangent(*(args + (dGamma0, dqh, dh, ddt)))
+
+        vi_bar = rs.randn(Ns, 3)
+        Gamma0_bar, qh_bar, h_bar, dt_bar = wake_adjoint(*(args + (vi_bar,)))
+
+        lhs = vi_bar.T.dot(dvi)
+        rhs = Gamma0_bar.T.dot(dGamma0) + qh_bar.T.dot(dqh) + \
+              np.outer(h_bar, dh) + np.outer(dt_bar, ddt)
+        assert relative_err(lhs, rhs) < 1e-10
+
+    def test_integrators(self):
+        """ test the higher-order and adaptive wake integrators
+        """
+        for integrator in ('rk2', 'rk4', 'adaptive'):
+            comp, data = self.initialize('VortexRing')
+            comp.integrator = integrator
+            comp.run()
+
+            compC, data = self.initialize('VortexRingC')
+            compC.integrator = integrator
+            compC.run()
+
+            assert relative_err(comp.vi, compC.vi) < 1e-10
+            assert relative_err(comp.z, compC.z) < 1e-10
+
+        # few substeps against a converged euler wake
+        ref, data = self.initialize('VortexRingC')
+        ref.Nw = 2
+        ref.Ntt = 64
+        ref.run()
+
+        err = {}
+        for integrator in ('euler', 'rk4', 'adaptive'):
+            comp, data = self.initialize('VortexRingC')
+            comp.Nw = 2
+            comp.Ntt = 2
+            comp.integrator = integrator
+            comp.run()
+            err[integrator] = relative_err(ref.z, comp.z)
+
+        self.assertTrue(err['rk4'] < err['euler'] / 5)
+        self.assertTrue(err['adaptive'] < err['euler'] / 5)
+
+    def test_far_wake(self):
+        """ test the far-wake closure
+        """
+        from Atlas.vortex import far_wake_rings, wake_velocity
+
+        # cylinders against long stacks of rings at the same spacing
+        Ns = 10
+        R = np.linspace(1., 8., Ns)
+        Gamma = np.random.RandomState(0).randn(Ns)
+        dz = 0.7
+        yp = np.linspace(0.5, 9., 12)
+        zp = np.zeros(12)
+
+        Ntheta = 20
+        dtheta = np.pi / Ntheta
+        thetaArray = np.linspace(dtheta/2, np.pi - dtheta/2, Ntheta)
+
+        for h, N in ((1e7, 20000), (20., 21)):
+            r, z, G = far_wake_rings(R, -5.*np.ones(Ns) - dz/2, Gamma / dz, h)
+            vr, vz = wake_velocity(yp, zp, r, z, G, h, 0.3, thetaArray, 'elliptic')
+
+            z = -5. - dz * np.arange(1, N+1)
+            vr_s, vz_s = wake_velocity(yp, zp, np.tile(R, N), np.repeat(z, Ns), np.tile(Gamma, N),
+                                       h, 0.3, thetaArray, 'elliptic')
+            assert relative_err(vr_s, vr) < 5e-3
+            assert relative_err(vz_s, vz) < 5e-3
+
+        # the closed wake in the python and cython versions
+        comp, data = self.initialize('VortexRing')
+        comp.far_wake = 8
+        comp.run()
+        assert relative_err(comp.vi - comp.dvi_far, data['vi']) < 1e-7
+
+        compC, data = self.initialize('VortexRingC')
+        compC.far_wake = 8
+        compC.run()
+        assert relative_err(comp.vi, compC.vi) < 1e-10
+        assert relative_err(comp.dvi_far, compC.dvi_far) < 1e-10
+
+        # a short march closed by the far wake against a long march
+        # out of ground effect, in the mean vi over the rotor disk
+        def mean_vi(comp):
+            yE = (comp.yN[1:] + comp.yN[:-1]).flatten() / 2
+            return np.sum(comp.vi.flatten() * yE) / np.sum(yE)
+
+        comp, data = self.initialize('VortexRingC')
+        comp.h = 100.
+        comp.Nw = 40
+        comp.run()
+
+        compF, data = self.initialize('VortexRingC')
+        compF.h = 100.
+        compF.Nw = 40
+        compF.far_wake = 24
+        compF.run()
+        self.assertEqual(compF.r.shape[0], 25)
+        self.assertTrue(abs(mean_vi(compF) / mean_vi(comp) - 1.) < 0.02)
+
+    def test_frozen_wake(self):
+        """ test the frozen wake against marching the whole wake
+        """
+        for classname in ('VortexRing', 'VortexRingC'):
+            comp, data = self.initialize(classname)
+            comp.frozen_wake = True
+            comp.far_wake = 8
+            comp.run()
+            vi, dvi_far = comp.vi.copy(), comp.dvi_far.copy()
+
+            # vi is linear in the thrust on the stored wake
+            comp.dT = data['dT'] * 1.05
+            comp.run()
+            assert relative_err(vi * 1.05, comp.vi) < 1e-12
+            assert relative_err(dvi_far * 1.05, comp.dvi_far) < 1e-12
+
+            # and the wake is marched again beyond frozen_tol
+            comp.Omega = data['Omega'] * 1.1
+            comp.run()
+
+            cold, data = self.initialize(classname)
+            cold.far_wake = 8
+            cold.dT = data['dT'] * 1.05
+            cold.Omega = data['Omega'] * 1.1
+            cold.run()
+            assert relative_err(cold.vi, comp.vi) < 1e-12
+
+            # as is it for other wake settings
+            for name, value in (('kernel', 'elliptic'), ('Ntheta', 30), ('far_wake', 4), ('b', 3)):
+                setattr(comp, name, value)
+                comp.run()
+
+                setattr(cold, name, value)
+                cold.run()
+                assert relative_err(cold.vi, comp.vi) < 1e-12
+
+    def test_wake_file(self):
+        """ test recording the wake of each time step
+        """
+        import os
+        import shutil
+        import tempfile
+        from Atlas.wake_recorder import read_wake
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            for classname in ('VortexRing', 'VortexRingC'):
+                filename = os.path.join(tempdir, classname + '.wake')
+
+                comp, data = self.initialize(classname)
+                comp.wake_file = filename
+                comp.run()
+                comp.run()
+                self.check_outputs(comp, data)
+
+                # one frame for each of the Nw+1 steps of each run
+                frames = read_wake(filename)
+                Nw = comp.r.shape[0] - 1
+                self.assertEqual(len(frames), 2*(Nw+1))
+                assert np.all(frames['run'] == np.repeat([0, 1], Nw+1))
+                assert np.all(frames['disks'][:Nw+1] == np.arange(1, Nw+2))
+                assert np.all(frames['Gamma'][-1] == comp.Gamma)
+                assert np.all(frames['r'][-1] == comp.r)
+                assert np.all(frames['z'][-1] == comp.z)
+
+                comp.wake_file = ''
+                comp.run()
+                self.assertEqual(len(read_wake(filename)), 2*(Nw+1))
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_profile(self):
+        """ test the phase timers and interaction counters
+        """
+        comp, data = self.initialize('VortexRing')
+        comp.profile = True
+        comp.run()
+        self.check_outputs(comp, data)
+
+        # Nw+1 steps of Ntt substeps, then the rotor
+        Nw, Ns = comp.r.shape[0] - 1, comp.Ns
+        Ntt = 3
+        t = np.arange(1, Nw+1)
+        self.assertEqual(comp.n_convect, Ntt * np.sum(t * (Ns+1) * t * Ns))
+        self.assertEqual(comp.n_rotor, Ns * Nw * Ns)
+        self.assertTrue(comp.time_convect > 0 and comp.time_rotor > 0)
+
+        compC, data = self.initialize('VortexRingC')
+        compC.profile = True
+        compC.run()
+        self.check_outputs(compC, data)
+        self.assertEqual(compC.n_convect, comp.n_convect)
+        self.assertEqual(compC.n_rotor, comp.n_rotor)
+        self.assertTrue(compC.time_convect > 0 and compC.time_rotor > 0)
+
+        compC.profile = False
+        compC.run()
+        self.assertEqual(compC.n_convect, 0)
+        self.assertEqual(compC.time_rotor, 0)
+
+        # the treecode counts the interactions it evaluates, all of them
+        # when no cluster is far enough
+        for tree_theta in (1e-9, 0.5):
+            compT, data = self.initialize('VortexRing')
+            compT.profile = True
+            compT.tree_theta = tree_theta
+            compT.run()
+
+            if tree_theta < 1e-6:
+                self.assertEqual(compT.n_convect, comp.n_convect)
+                self.assertEqual(compT.n_rotor, comp.n_rotor)
+            else:
+                self.assertTrue(0 < compT.n_convect < comp.n_convect)
+                self.assertTrue(0 < compT.n_rotor <= comp.n_rotor)
+
+    def test_warm_start(self):
+        """ test warm starts against marching the whole wake
+        """
+        for classname in ('VortexRing', 'VortexRingC'):
+            comp, data = self.initialize(classname)
+            comp.warm_start = True
+            comp.run()
+
+            # unchanged inputs reproduce the full march
+            comp.run()
+            assert relative_err(comp.vi, data['vi']) < 1e-7
+
+            # small changes start from the stored wake
+            for scale, tol in ((1.001, 1e-2), (1.1, 1e-12)):
+                comp.dT = data['dT'] * scale
+                comp.run()
+
+                cold, data = self.initialize(classname)
+                cold.dT = data['dT'] * scale
+                cold.run()
+
+                assert relative_err(comp.vi, cold.vi) < tol
+
+            # marching every step again is the full march
+            comp.warm_remarch = 100
+            comp.dT = data['dT'] * 1.002
+            comp.run()
+
+            cold, data = self.initialize(classname)
+            cold.dT = data['dT'] * 1.002
+            cold.run()
+            assert relative_err(comp.vi, cold.vi) < 1e-12
+
+            # and at least one step is marched again
+            comp.warm_remarch = 0
+            self.assertRaises(Exception, comp.run)
+
+        # marching no steps leaves the wake and its vi
+        comp, data = self.initialize('VortexRing')
+        comp.run()
+        yE, dy, qh, Nw, Ntt, cr = comp.wake_inputs()
+        comp.free_wake(yE, dy, qh, Nw, Ntt, cr, t0=Nw+1)
+        assert relative_err(-comp.vi, data['vi']) < 1e-7
+
+    def test_tree_velocity(self):
+        """ test the treecode against direct evaluation of the rings
+        """
+        from Atlas.vortex import wake_velocity
+
+        rs = np.random.RandomState(0)
+        Nw, Ns = 12, 20
+        r  = np.tile(np.linspace(0., 10., Ns+1), (Nw, 1))
+        z  = np.tile(-np.linspace(0., 6., Nw)[:, np.newaxis], (1, Ns+1))
+        Gamma = rs.randn(Nw, Ns+1)
+
+        Ntheta = 20
+        dtheta = np.pi / Ntheta
+        thetaArray = np.linspace(dtheta/2, np.pi - dtheta/2, Ntheta)
+
+        args = (r.flatten(), z.flatten(), r[:, 1:].flatten(), z[:, 1:].flatten(),
+                Gamma[:, 1:].flatten(), 1.5, 0.25, thetaArray)
+
+        for kernel in ('quadrature', 'elliptic'):
+            vr, vz = wake_velocity(*args, kernel=kernel)
+
+            # a vanishing opening ratio never uses the proxy rings
+            vr_t, vz_t = wake_velocity(*args, kernel=kernel, tree_theta=1e-12)
+            assert relative_err(vr, vr_t) < 1e-12
+            assert relative_err(vz, vz_t) < 1e-12
+
+            vr_t, vz_t = wake_velocity(*args, kernel=kernel, tree_theta=0.3, tree_degree=4)
+            assert relative_err(vr, vr_t) < 1e-3
+            assert relative_err(vz, vz_t) < 1e-3
+
+    def test_VortexRing_tree(self):
+        """ test the vortex ring component with the treecode
+        """
+        comp, data = self.initialize('VortexRing')
+        comp.tree_theta = 0.3
+        comp.tree_degree = 5
+        comp.run()
+
+        assert relative_err(comp.vi, data['vi']) < 1e-4
+
     def test_TimeVortex(self):
-        """ test that the cython version is at least 50x faster
+        """ test that the cython version is faster than the vectorized
+            python version
         """
         import timeit
 
@@ -113,9 +708,9 @@ class Test_Vortex(unittest.TestCase):
         t = timeit.Timer("comp.run()", setup_code % 'VortexRingC')
         tc = t.timeit(1)
 
-        # assert a 50x speed-up
+        # assert a 2x speed-up
         speedup = tp/tc
-        self.assertTrue(speedup > 50)
+        self.assertTrue(speedup > 2)
 
         print
         print "Python function:", tp, "sec"
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from scipy.io import loadmat
+
+from Atlas import VortexRingC, build_vortex_table, TabulatedInducedVelocity
+from Atlas.aero import Aero2
+
+
+def relative_err(x, y):
+    return (np.abs(x-y)/np.linalg.norm(x)).max()
+
+
+class Test_VortexTable(unittest.TestCase):
+    """
+    Tests the induced velocity tables
+    """
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.table = os.path.join(self.tempdir, 'vortex.npz')
+
+        path = os.path.join(os.path.dirname(__file__), 'vortex.mat')
+        self.data = loadmat(path, struct_as_record=True, mat_dtype=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def vortex_ring(self, scale=1.):
+        """ rigid VortexRing at the test operating point """
+        comp = VortexRingC(10)
+
+        comp.b        = int(self.data['b'][0][0])
+        comp.yN       = self.data['yN'].flatten()
+        comp.Ns       = max(comp.yN.shape) - 1
+
+        comp.rho      = self.data['rho'][0][0]
+        comp.Omega    = self.data['Omega'][0][0]
+        comp.h        = self.data['h'][0][0] * scale
+        comp.dT       = self.data['dT'] * scale
+        comp.q        = np.zeros(comp.q.shape)
+        comp.Nw       = 5
+
+        comp.run()
+        return comp
+
+    def test_table(self):
+        """ test the interpolated induced velocity against the free wake
+        """
+        comp = self.vortex_ring()
+
+        # thrust modes about the test operating point
+        R = np.max(comp.yN)
+        yE = (comp.yN[1:] + comp.yN[:-1]) / 2
+        L = comp.dT.flatten() / (comp.rho * comp.Omega**2 * R**4)
+        modes = [L, L * (yE/R - 0.5)]
+
+        build_vortex_table(self.table, comp.b, comp.yN / R, modes,
+                           [[0.8, 1., 1.2], [-0.4, 0., 0.4]], [0.4, comp.h/R, 0.5],
+                           Nw=5, processes=2)
+
+        table = TabulatedInducedVelocity(10)
+        table.table = self.table
+        for name in ('b', 'Ns', 'yN', 'rho', 'Omega', 'h', 'dT'):
+            setattr(table, name, getattr(comp, name))
+
+        # exact on the grid
+        table.run()
+        assert relative_err(comp.vi, table.vi) < 1e-12
+        assert relative_err(table.amplitudes, [1., 0.]) < 1e-12
+
+        # and interpolated between grid points
+        comp = self.vortex_ring(1.05)
+        table.h = comp.h
+        table.dT = comp.dT
+        table.run()
+        assert relative_err(comp.vi, table.vi) < 2e-2
+        self.assertFalse(table.extrapolated)
+
+        # and extrapolated beyond them
+        table.h = 0.6 * R
+        table.run()
+        self.assertTrue(table.extrapolated)
+        table.h = comp.h
+
+        # the table is read again when its file changes
+        build_vortex_table(self.table, comp.b, comp.yN / R, [2 * m for m in modes],
+                           [[0.4, 0.5, 0.6], [-0.2, 0., 0.2]], [0.4, 0.5],
+                           Nw=5, processes=2)
+        table.run()
+        assert relative_err(table.amplitudes, [0.525, 0.]) < 1e-12
+
+        # the table is for the rotor it was built for
+        table.b = 3
+        self.assertRaises(Exception, table.run)
+
+        # every axis interpolates between at least 2 values
+        self.assertRaises(Exception, build_vortex_table, self.table, comp.b, comp.yN / R, modes,
+                          [[1.], [-0.4, 0., 0.4]], [0.4, 0.5])
+        self.assertRaises(Exception, build_vortex_table, self.table, comp.b, comp.yN / R, modes,
+                          [[0.8, 1.2], [-0.4, 0., 0.4]], [0.5, 0.4])
+
+    def test_Aero2(self):
+        """ test the table in place of the free wake in Aero2
+        """
+        build_vortex_table(self.table, 2, np.linspace(0., 1., 11), [np.ones(10)],
+                           [[1e-6, 2e-6]], [0.4, 0.5], Nw=3, processes=1)
+
+        comp = Aero2(10, table=self.table)
+        self.assertTrue(isinstance(comp.induced, TabulatedInducedVelocity))
+        self.assertEqual(comp.induced.table, self.table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,10 @@ import numpy as np
 from openmdao.main.api import Component
 from openmdao.main.datatypes.api import Int, Float, Array
 
+from Atlas.lift_drag import elements
+from Atlas.blade_element import chord_fraction, blade_thrust, thrust_jacobian
+from Atlas.derivatives import apply_jacobian, apply_jacobianT
+
 
 class Thrust(Component):
 
@@ -29,21 +33,28 @@ class Thrust(Component):
         self.add('chordFrac', Array(np.zeros(Ns), iotype='out'))
 
     def execute(self):
-        self.chordFrac = np.ones((self.Ns, 1))
-        self.dT = np.zeros((self.Ns, 1))
+        # multiplyer for the partial element, and thrust assuming small angles
+        chordFrac = chord_fraction(self.yN, self.ycmax)
+
+        self.chordFrac = chordFrac.reshape(self.Ns, 1)
+        self.dT = blade_thrust(chordFrac, self.rho, self.Omega,
+                               *[elements(getattr(self, name), self.Ns)
+                                 for name in ('r', 'Cl', 'c', 'dr')]).reshape(self.Ns, 1)
+
+    def list_deriv_vars(self):
+        return ('yN', 'ycmax', 'dr', 'r', 'Cl', 'c', 'rho', 'Omega'), ('dT', 'chordFrac')
 
-        # Compute multiplyer for partial element
-        for index, element in enumerate(self.yN):
-            if element < self.ycmax:
-                sTrans = index  # determine transitional partial element
-        self.chordFrac[sTrans] = self.yN[sTrans+1] - self.ycmax  \
-                               / (self.yN[sTrans+1] - self.yN[sTrans])
+    def linearize(self):
+        """ Jacobian of the thrust and chord fraction """
+        self.J = thrust_jacobian(chord_fraction(self.yN, self.ycmax), self.rho, self.Omega,
+                                 *[elements(getattr(self, name), self.Ns)
+                                   for name in ('r', 'Cl', 'c', 'dr')] + [self.yN, self.ycmax])
 
-        # Compute thrust assuming small angles
-        for s in range(self.Ns):
-            self.dT[s] = self.chordFrac[s] * 0.5 * self.rho \
-                       * (self.Omega * self.r[s])**2        \
-                       * self.Cl[s] * self.c[s] * self.dr[s]
+    def apply_deriv(self, arg, result):
+        apply_jacobian(self.J, arg, result)
+
+    def apply_derivT(self, arg, result):
+        apply_jacobianT(self.J, arg, result)
 
 
 class ActuatorDiskInducedVelocity(Component):
@@ -71,12 +82,39 @@ class ActuatorDiskInducedVelocity(Component):
         self.add('vi',  Array(np.zeros(Ns), iotype='out', desc='induced downwash distribution'))
 
     def execute(self):
-        self.vi = np.zeros((self.Ns, 1))
+        r, dr, dT = [elements(getattr(self, name), self.Ns) for name in ('r', 'dr', 'dT')]
 
-        for s in range(self.Ns):
-            sq = 0.25 * self.vc**2 + \
-                 0.25 * self.b * self.dT[s] / (np.pi * self.rho * self.r[s] * self.dr[s])
-            self.vi[s] = -0.5*self.vc + np.sqrt(sq)
+        sq = 0.25 * self.vc**2 + 0.25 * self.b * dT / (np.pi * self.rho * r * dr)
+        vi = -0.5*self.vc + np.sqrt(sq)
 
         # Add ground effect Cheesemen & Benett's
-        self.vi /= (1. + (self.R / self.h / 4.) ** 2)
+        self.vi = (vi / (1. + (self.R / self.h / 4.) ** 2)).reshape(self.Ns, 1)
+
+    def list_deriv_vars(self):
+        return ('r', 'dr', 'R', 'h', 'vc', 'rho', 'dT'), ('vi',)
+
+    def linearize(self):
+        """ Jacobian of the induced velocity """
+        r, dr, dT = [elements(getattr(self, name), self.Ns) for name in ('r', 'dr', 'dT')]
+
+        a = 0.25 * self.b * dT / (np.pi * self.rho * r * dr)
+        s = np.sqrt(0.25 * self.vc**2 + a)
+        vi = -0.5*self.vc + s
+
+        k = self.R / self.h / 4.
+        g = 1. / (1. + k**2)
+
+        self.J = {}
+        self.J['vi', 'dT'] = np.diag(g * 0.25 * self.b / (np.pi * self.rho * r * dr) / (2*s))
+        self.J['vi', 'r'] = np.diag(-g * a / r / (2*s))
+        self.J['vi', 'dr'] = np.diag(-g * a / dr / (2*s))
+        self.J['vi', 'rho'] = (-g * a / self.rho / (2*s)).reshape(-1, 1)
+        self.J['vi', 'vc'] = (g * (-0.5 + 0.25 * self.vc / s)).reshape(-1, 1)
+        self.J['vi', 'R'] = (-2 * k * g**2 * vi / (4 * self.h)).reshape(-1, 1)
+        self.J['vi', 'h'] = (2 * k**2 * g**2 * vi / self.h).reshape(-1, 1)
+
+    def apply_deriv(self, arg, result):
+        apply_jacobian(self.J, arg, result)
+
+    def apply_derivT(self, arg, result):
+        apply_jacobianT(self.J, arg, result)
@@ -1,7 +1,698 @@
 from openmdao.main.api import Component
-from openmdao.lib.datatypes.api import Float, Array, Int
+from openmdao.lib.datatypes.api import Float, Array, Int, Enum, Bool, Str
+import time
+
 import numpy as np
 from numpy import pi, cos, sin, mean, linspace, sqrt
+from scipy.special import ellipk, ellipe
+
+from Atlas.wake_recorder import WakeRecorder
+
+
+def ring_velocity(yp, zp, r, zr, Gamma, cr, thetaArray):
+    """ Velocity induced at the points (yp, zp) by the vortex rings of
+        radius r at height zr with strength Gamma, by midpoint quadrature
+        over the half ring at the stations in thetaArray. The distance
+        from each station is clamped to the core radius cr.
+
+        Points and rings are broadcast against each other (and against any
+        leading axes), returns the radial and axial velocity at each point.
+    """
+    dtheta = pi / len(thetaArray)
+    cos_t = cos(thetaArray)
+    sin_t = sin(thetaArray)
+
+    yp = yp[..., :, np.newaxis]
+    dz = zp[..., :, np.newaxis] - zr[..., np.newaxis, :]
+    rr = r[..., np.newaxis, :]
+
+    # 1/|x - x'|^3 for every point, ring and theta station
+    X2 = (rr[..., np.newaxis] * sin_t)**2
+    Y2 = (yp[..., np.newaxis] - rr[..., np.newaxis] * cos_t)**2
+    Z2 = (dz**2)[..., np.newaxis]
+    Normal = np.maximum(sqrt(X2 + Y2 + Z2), cr)
+    inv_n3 = 1. / Normal**3
+
+    sum_cos = np.dot(inv_n3, cos_t)
+    sum_one = np.sum(inv_n3, axis=-1)
+
+    M = Gamma[..., np.newaxis, :] * rr * dtheta / (2*pi)
+
+    vr = np.sum(-sum_cos * dz * M, axis=-1)
+    vz = np.sum((sum_cos * yp - sum_one * rr) * M, axis=-1)
+
+    return vr, vz
+
+
+def ring_velocity_elliptic(yp, zp, r, zr, Gamma, cr):
+    """ Velocity induced at the points (yp, zp) by the vortex rings of
+        radius r at height zr with strength Gamma, from the closed form
+        solution in complete elliptic integrals K and E. The core radius cr
+        is added to the distance squared (smooth core) rather than clamping
+        the distance.
+
+        Points and rings are broadcast against each other (and against any
+        leading axes), returns the radial and axial velocity at each point.
+    """
+    yp = yp[..., :, np.newaxis]
+    dz = zp[..., :, np.newaxis] - zr[..., np.newaxis, :]
+    rr = r[..., np.newaxis, :]
+
+    # integrals over the half ring of 1/|x - x'|^3 and cos(theta)/|x - x'|^3
+    p = yp**2 + rr**2 + dz**2 + cr**2
+    q = 2 * yp * rr
+    A = p + q
+    B = p - q
+    m = 2 * q / A
+    K = ellipk(m)
+    E = ellipe(m)
+
+    I0 = 2 * E / (B * sqrt(A))
+
+    # use the series expansion where the point is on the axis of the ring
+    axis = q < 1e-8 * p
+    q_safe = np.where(axis, 1., q)
+    I1 = np.where(axis, 0.75 * pi * q / p**2.5,
+                  2 / (q_safe * sqrt(A)) * (p * E / B - K))
+
+    M = Gamma[..., np.newaxis, :] * rr / (2*pi)
+
+    vr = np.sum(-I1 * dz * M, axis=-1)
+    vz = np.sum((I1 * yp - I0 * rr) * M, axis=-1)
+
+    return vr, vz
+
+
+def ring_kernel(yp, zp, r, zr, Gamma, cr, thetaArray, kernel='quadrature'):
+    """ Velocity induced at the points (yp, zp) by the vortex rings, using
+        either the quadrature or the closed form kernel.
+    """
+    if kernel == 'elliptic':
+        return ring_velocity_elliptic(yp, zp, r, zr, Gamma, cr)
+    else:
+        return ring_velocity(yp, zp, r, zr, Gamma, cr, thetaArray)
+
+
+def chebyshev_basis(x, degree):
+    """ Lagrange basis polynomials on the Chebyshev points of the second
+        kind in [-1, 1], evaluated at x by the barycentric formula.
+        Returns the points and the basis values, shape (len(x), degree+1).
+    """
+    k = np.arange(degree+1)
+    nodes = cos(pi * k / degree)
+    w = (-1.)**k
+    w[0] *= 0.5
+    w[-1] *= 0.5
+
+    diff = x[:, np.newaxis] - nodes
+    exact = diff == 0
+    diff[exact] = 1.
+    L = w / diff
+    L /= np.sum(L, axis=1)[:, np.newaxis]
+
+    # x falls on a Chebyshev point
+    on_node = np.any(exact, axis=1)
+    L[on_node] = exact[on_node]
+
+    return nodes, L
+
+
+class RingCluster(object):
+    """ Node of the tree of vortex rings in the meridional (r, z) plane.
+        Rings are split recursively at the median of the longer side of
+        their bounding box. Each node that is not a leaf carries a set of
+        proxy rings at the tensor Chebyshev points of its box, with
+        strengths that interpolate the rings it holds (barycentric
+        Lagrange treecode).
+    """
+
+    def __init__(self, r, zr, Gamma, degree):
+        lo = np.array([np.min(r), np.min(zr)])
+        hi = np.array([np.max(r), np.max(zr)])
+        self.center = 0.5 * (lo + hi)
+        half = np.maximum(0.5 * (hi - lo), 1e-9 * (1. + np.abs(self.center)))
+        self.radius = sqrt(np.sum(half**2))
+
+        if len(r) <= (degree+1)**2:
+            # leaf, evaluated directly
+            self.children = ()
+            self.r, self.zr, self.Gamma = r, zr, Gamma
+            return
+
+        split = np.argmax(half)
+        order = np.argsort(r if split == 0 else zr)
+        n = len(order) // 2
+        self.children = tuple(RingCluster(r[ix], zr[ix], Gamma[ix], degree)
+                              for ix in (order[:n], order[n:]))
+
+        # proxy rings and their strengths
+        nodes, Lr = chebyshev_basis((r - self.center[0]) / half[0], degree)
+        _, Lz = chebyshev_basis((zr - self.center[1]) / half[1], degree)
+        self.r = np.repeat(self.center[0] + half[0]*nodes, degree+1)
+        self.zr = np.tile(self.center[1] + half[1]*nodes, degree+1)
+        self.Gamma = np.dot(Lr.T * Gamma, Lz).flatten()
+
+
+def tree_velocity(yp, zp, r, zr, Gamma, cr, thetaArray, kernel='quadrature',
+                  tree_theta=0.5, tree_degree=3, counts=None):
+    """ Velocity induced at the points (yp, zp) by the vortex rings, using a
+        tree of ring clusters. A cluster is replaced by its proxy rings
+        for the points further from its center than radius / tree_theta
+        (in the meridional plane), other points descend into its children,
+        down to direct evaluation at the leaves. The number of point-ring
+        interactions evaluated is added to counts[0], if given.
+    """
+    vr = np.zeros(len(yp))
+    vz = np.zeros(len(yp))
+
+    stack = [(RingCluster(r, zr, Gamma, tree_degree), np.arange(len(yp)))]
+    while stack:
+        node, ix = stack.pop()
+
+        if node.children:
+            dist = sqrt((yp[ix] - node.center[0])**2 + (zp[ix] - node.center[1])**2)
+            far = node.radius < tree_theta * dist
+            near = ix[~far]
+            ix = ix[far]
+            if len(near):
+                stack.extend((child, near) for child in node.children)
+
+        if len(ix):
+            dvr, dvz = ring_kernel(yp[ix], zp[ix], node.r, node.zr, node.Gamma,
+                                   cr, thetaArray, kernel)
+            vr[ix] += dvr
+            vz[ix] += dvz
+
+            if counts is not None:
+                counts[0] += float(len(ix)) * len(node.r)
+
+    return vr, vz
+
+
+def wake_velocity(yp, zp, r, zr, Gamma, h, cr, thetaArray, kernel='quadrature',
+                  tree_theta=0., tree_degree=3, counts=None):
+    """ Velocity induced at the points (yp, zp) by the vortex rings and by
+        their ground effect images at -2h - zr, in a single pass.
+        With tree_theta > 0 the rings and images are evaluated with the
+        treecode rather than directly. The number of point-ring
+        interactions evaluated, counting a ring and its image once, is
+        added to counts[0], if given.
+    """
+    h = np.asarray(h)[..., np.newaxis]
+
+    if counts is not None and tree_theta <= 0:
+        counts[0] += float(len(yp)) * np.shape(r)[-1]
+
+    r     = np.concatenate((r, r), axis=-1)
+    zr    = np.concatenate((zr, -2*h - zr), axis=-1)
+    Gamma = np.concatenate((Gamma, -Gamma), axis=-1)
+
+    if tree_theta > 0:
+        tree_counts = None if counts is None else np.zeros(1)
+        v = tree_velocity(yp, zp, r, zr, Gamma, cr, thetaArray, kernel,
+                          tree_theta, tree_degree, tree_counts)
+        if counts is not None:
+            counts[0] += tree_counts[0] / 2
+        return v
+    else:
+        return ring_kernel(yp, zp, r, zr, Gamma, cr, thetaArray, kernel)
+
+
+def ring_velocity_partials(yp, zp, r, zr, Gamma, cr, thetaArray):
+    """ ring_velocity for points yp, zp (P,) and rings r, zr, Gamma (Q,),
+        along with the partial derivatives of the velocity induced at each
+        point by each ring, as (P, Q) arrays keyed by output ('vr', 'vz')
+        and by variable ('yp', 'dz', 'r', 'Gamma'), where dz = zp - zr.
+    """
+    dtheta = pi / len(thetaArray)
+    cos_t = cos(thetaArray)
+    sin_t = sin(thetaArray)
+
+    yp = yp[:, np.newaxis]
+    dz = zp[:, np.newaxis] - zr[np.newaxis, :]
+    rr = r[np.newaxis, :]
+
+    S = (rr[..., np.newaxis] * sin_t)**2 + \
+        (yp[..., np.newaxis] - rr[..., np.newaxis] * cos_t)**2 + \
+        (dz**2)[..., np.newaxis]
+    clamped = S < cr**2
+    S = np.where(clamped, cr**2, S)
+    g = S**-1.5
+    dg = np.where(clamped, 0., -1.5 * S**-2.5)    # d(1/|x - x'|^3) / d(|x - x'|^2)
+
+    A0 = np.sum(g, axis=-1)
+    A1 = np.dot(g, cos_t)
+    H0 = np.sum(dg, axis=-1)
+    H1 = np.dot(dg, cos_t)
+    H2 = np.dot(dg, cos_t**2)
+
+    # derivatives of A0 and A1
+    A0_yp = 2 * (yp*H0 - rr*H1)
+    A1_yp = 2 * (yp*H1 - rr*H2)
+    A0_r  = 2 * (rr*H0 - yp*H1)
+    A1_r  = 2 * (rr*H1 - yp*H2)
+    A0_dz = 2 * dz * H0
+    A1_dz = 2 * dz * H1
+
+    MG = rr * dtheta / (2*pi) * np.ones_like(A0)    # M / Gamma
+    Mr = Gamma[np.newaxis, :] * dtheta / (2*pi)      # M / r
+    M  = Gamma[np.newaxis, :] * MG
+
+    J = {'vr': {}, 'vz': {}}
+    J['vr']['yp']    = -M * dz * A1_yp
+    J['vr']['dz']    = -M * (A1 + dz*A1_dz)
+    J['vr']['r']     = -dz * (Mr*A1 + M*A1_r)
+    J['vr']['Gamma'] = -MG * dz * A1
+    J['vz']['yp']    = M * (A1 + yp*A1_yp - rr*A0_yp)
+    J['vz']['dz']    = M * (yp*A1_dz - rr*A0_dz)
+    J['vz']['r']     = Mr * (yp*A1 - rr*A0) + M * (yp*A1_r - A0 - rr*A0_r)
+    J['vz']['Gamma'] = MG * (yp*A1 - rr*A0)
+
+    vr = np.sum(-M * dz * A1, axis=-1)
+    vz = np.sum(M * (yp*A1 - rr*A0), axis=-1)
+
+    return vr, vz, J
+
+
+def wake_velocity_partials(yp, zp, r, zr, Gamma, h, cr, thetaArray):
+    """ wake_velocity (quadrature kernel) along with the partial
+        derivatives of the velocity at each point with respect to the
+        point ('yp', 'zp'), each ring ('r', 'zr', 'Gamma') as (P, Q) arrays,
+        and the height of the rotor ('h') as (P,) arrays.
+    """
+    Q = len(r)
+    vr, vz, JJ = ring_velocity_partials(yp, zp, np.concatenate((r, r)),
+                                        np.concatenate((zr, -2*h - zr)),
+                                        np.concatenate((Gamma, -Gamma)), cr, thetaArray)
+
+    J = {}
+    for out in ('vr', 'vz'):
+        ring = dict((var, JJ[out][var][:, :Q]) for var in JJ[out])
+        image = dict((var, JJ[out][var][:, Q:]) for var in JJ[out])
+        J[out] = {
+            'yp':    ring['yp'] + image['yp'],
+            'zp':    ring['dz'] + image['dz'],
+            'r':     ring['r'] + image['r'],
+            'zr':    image['dz'] - ring['dz'],
+            'Gamma': ring['Gamma'] - image['Gamma'],
+            'h':     2 * np.sum(image['dz'], axis=1),
+        }
+
+    return vr, vz, J
+
+
+def wake_march(Gamma0, yN, qh, h, dt, Nw, Ntt, Nd, cr, thetaArray):
+    """ free-wake march of VortexRing (quadrature kernel, direct
+        evaluation) for nacent ring strengths Gamma0, stopping after Nd+1
+        time steps. Returns the final ring positions and the positions
+        before each substep (the tape for wake_tangent and wake_adjoint).
+    """
+    Ns = len(yN) - 1
+    r = np.zeros((Nw+1, Ns+1))
+    z = np.zeros((Nw+1, Ns+1))
+    tape = []
+
+    for t in range(Nd+1):
+        for tt in range(Ntt):
+            if t > 0:
+                tape.append((r[:t].copy(), z[:t].copy()))
+                vr, vz = wake_velocity(r[:t].flatten(), z[:t].flatten(),
+                                       r[:t, 1:].flatten(), z[:t, 1:].flatten(),
+                                       np.tile(Gamma0[1:], t), h, cr, thetaArray)
+                r[:t] = r[:t] + vr.reshape(t, Ns+1)*dt
+                z[:t] = z[:t] + vz.reshape(t, Ns+1)*dt
+
+        r[1:t+1] = r[:t].copy()
+        z[1:t+1] = z[:t].copy()
+        r[0] = yN
+        z[0] = qh
+
+    return r, z, tape
+
+
+def wake_tangent(Gamma0, yN, yE, qh, h, dt, Nw, Ntt, Nd, cr, thetaArray,
+                 dGamma0, dqh, dh, ddt):
+    """ forward (tangent) derivative of the rotor vi of the free-wake march
+        in the directions dGamma0 (Ns+1, D), dqh (Ns+1, D), dh (D,) and
+        ddt (D,). Returns dvi (Ns, D).
+    """
+    Ns = len(yN) - 1
+    D = dGamma0.shape[1]
+    r, z, tape = wake_march(Gamma0, yN, qh, h, dt, Nw, Ntt, Nd, cr, thetaArray)
+
+    dr = np.zeros((Nw+1, Ns+1, D))
+    dz = np.zeros((Nw+1, Ns+1, D))
+
+    k = 0
+    for t in range(Nd+1):
+        for tt in range(Ntt):
+            if t > 0:
+                rt, zt = tape[k]
+                k += 1
+                vr, vz, J = wake_velocity_partials(rt.flatten(), zt.flatten(),
+                                                   rt[:, 1:].flatten(), zt[:, 1:].flatten(),
+                                                   np.tile(Gamma0[1:], t), h, cr, thetaArray)
+                drt = dr[:t].reshape(-1, D)
+                dzt = dz[:t].reshape(-1, D)
+                drs = dr[:t, 1:].reshape(-1, D)
+                dzs = dz[:t, 1:].reshape(-1, D)
+                dGs = np.tile(dGamma0[1:], (t, 1))
+
+                dv = {}
+                for out in ('vr', 'vz'):
+                    Jo = J[out]
+                    dv[out] = np.sum(Jo['yp'], axis=1)[:, np.newaxis] * drt \
+                        + np.sum(Jo['zp'], axis=1)[:, np.newaxis] * dzt \
+                        + Jo['r'].dot(drs) + Jo['zr'].dot(dzs) + Jo['Gamma'].dot(dGs) \
+                        + Jo['h'][:, np.newaxis] * dh
+
+                dr[:t] += (dv['vr']*dt + vr[:, np.newaxis]*ddt).reshape(t, Ns+1, D)
+                dz[:t] += (dv['vz']*dt + vz[:, np.newaxis]*ddt).reshape(t, Ns+1, D)
+
+        dr[1:t+1] = dr[:t].copy()
+        dz[1:t+1] = dz[:t].copy()
+        dr[0] = 0.
+        dz[0] = dqh
+
+    # induced velocity on the rotor
+    ringFrac = np.ones((Nd, 1))
+    ringFrac[0] = 0.675
+
+    _, _, J = wake_velocity_partials(yE, (qh[:-1] + qh[1:]) / 2,
+                                     r[:Nd, 1:].flatten(), z[:Nd, 1:].flatten(),
+                                     (ringFrac * Gamma0[1:]).flatten(), h, cr, thetaArray)
+    Jo = J['vz']
+    dvz = np.sum(Jo['zp'], axis=1)[:, np.newaxis] * (dqh[:-1] + dqh[1:]) / 2 \
+        + Jo['r'].dot(dr[:Nd, 1:].reshape(-1, D)) + Jo['zr'].dot(dz[:Nd, 1:].reshape(-1, D)) \
+        + Jo['Gamma'].dot((ringFrac[:, :, np.newaxis] * dGamma0[1:]).reshape(-1, D)) \
+        + Jo['h'][:, np.newaxis] * dh
+
+    return -dvz
+
+
+def wake_adjoint(Gamma0, yN, yE, qh, h, dt, Nw, Ntt, Nd, cr, thetaArray, vi_bar,
+                 Nv=None, r_bar=None, z_bar=None):
+    """ reverse (adjoint) derivative of the rotor vi of the free-wake march
+        for the seeds vi_bar (Ns, S), with vi from the first Nv disks (Nd
+        by default) and the seeds r_bar and z_bar (Nw+1, Ns+1, S) on the
+        final rings, if given. Returns the adjoints of Gamma0 (Ns+1, S),
+        qh (Ns+1, S), h (S,) and dt (S,).
+    """
+    Ns = len(yN) - 1
+    S = vi_bar.shape[1]
+    r, z, tape = wake_march(Gamma0, yN, qh, h, dt, Nw, Ntt, Nd, cr, thetaArray)
+
+    if Nv is None:
+        Nv = Nd
+
+    Gamma0_bar = np.zeros((Ns+1, S))
+    qh_bar = np.zeros((Ns+1, S))
+    h_bar = np.zeros(S)
+    dt_bar = np.zeros(S)
+    r_bar = np.zeros((Nw+1, Ns+1, S)) if r_bar is None else r_bar.copy()
+    z_bar = np.zeros((Nw+1, Ns+1, S)) if z_bar is None else z_bar.copy()
+
+    # induced velocity on the rotor
+    ringFrac = np.ones((Nv, 1))
+    ringFrac[0] = 0.675
+
+    _, _, J = wake_velocity_partials(yE, (qh[:-1] + qh[1:]) / 2,
+                                     r[:Nv, 1:].flatten(), z[:Nv, 1:].flatten(),
+                                     (ringFrac * Gamma0[1:]).flatten(), h, cr, thetaArray)
+    Jo = J['vz']
+    vz_bar = -vi_bar
+    zp_bar = np.sum(Jo['zp'], axis=1)[:, np.newaxis] * vz_bar
+    qh_bar[:-1] += zp_bar / 2
+    qh_bar[1:] += zp_bar / 2
+    r_bar[:Nv, 1:] += Jo['r'].T.dot(vz_bar).reshape(Nv, Ns, S)
+    z_bar[:Nv, 1:] += Jo['zr'].T.dot(vz_bar).reshape(Nv, Ns, S)
+    Gamma0_bar[1:] += np.sum(ringFrac[:, :, np.newaxis] *
+                             Jo['Gamma'].T.dot(vz_bar).reshape(Nv, Ns, S), axis=0)
+    h_bar += Jo['h'].dot(vz_bar)
+
+    k = len(tape)
+    for t in reversed(range(Nd+1)):
+        # nacent rings and shift
+        qh_bar += z_bar[0]
+        r_bar[:t+1] = np.concatenate((r_bar[1:t+1], np.zeros((1, Ns+1, S))))
+        z_bar[:t+1] = np.concatenate((z_bar[1:t+1], np.zeros((1, Ns+1, S))))
+
+        for tt in range(Ntt):
+            if t > 0:
+                k -= 1
+                rt, zt = tape[k]
+                vr, vz, J = wake_velocity_partials(rt.flatten(), zt.flatten(),
+                                                   rt[:, 1:].flatten(), zt[:, 1:].flatten(),
+                                                   np.tile(Gamma0[1:], t), h, cr, thetaArray)
+
+                v_bar = {'vr': r_bar[:t].reshape(-1, S) * dt,
+                         'vz': z_bar[:t].reshape(-1, S) * dt}
+                dt_bar += np.sum(vr[:, np.newaxis] * r_bar[:t].reshape(-1, S), axis=0) \
+                    + np.sum(vz[:, np.newaxis] * z_bar[:t].reshape(-1, S), axis=0)
+
+                for out in ('vr', 'vz'):
+                    Jo = J[out]
+                    vb = v_bar[out]
+                    r_bar[:t] += (np.sum(Jo['yp'], axis=1)[:, np.newaxis] * vb).reshape(t, Ns+1, S)
+                    z_bar[:t] += (np.sum(Jo['zp'], axis=1)[:, np.newaxis] * vb).reshape(t, Ns+1, S)
+                    r_bar[:t, 1:] += Jo['r'].T.dot(vb).reshape(t, Ns, S)
+                    z_bar[:t, 1:] += Jo['zr'].T.dot(vb).reshape(t, Ns, S)
+                    Gamma0_bar[1:] += np.sum(Jo['Gamma'].T.dot(vb).reshape(t, Ns, S), axis=0)
+                    h_bar += Jo['h'].dot(vb)
+
+    return Gamma0_bar, qh_bar, h_bar, dt_bar
+
+
+# Butcher tableaus (stage coefficients, weights) of the ring convection
+# integrators, the adaptive integrator is Heun's method with an embedded
+# Euler step for the error estimate
+INTEGRATORS = {
+    'euler':    ([], [1.]),
+    'rk2':      ([[1.]], [0.5, 0.5]),
+    'rk4':      ([[0.5], [0., 0.5], [0., 0., 1.]], [1/6., 1/3., 1/3., 1/6.]),
+    'adaptive': ([[1.]], [0.5, 0.5]),
+}
+
+
+def far_wake_rings(R, z0, gamma, h, Nq=16):
+    """ Proxy rings for semi-infinite vortex cylinders of radius R and
+        sheet strength gamma, from z0 down to the ground at -h. The integral
+        along each cylinder is by Gauss-Legendre quadrature in
+        s = R / (R + z0 - z), which maps the cylinder out of ground effect
+        onto (0, 1].
+    """
+    # the ground (s = 0 out of ground effect) to the top of the cylinder
+    s0 = np.clip(R / (R + np.maximum(z0 + h, 0.)), 0., 1.)
+
+    x, w = np.polynomial.legendre.leggauss(Nq)
+    s = s0 + (1 - s0) * (x[:, np.newaxis] + 1) / 2
+    ws = (1 - s0) * w[:, np.newaxis] / 2
+
+    zq = z0 - R * (1/s - 1)
+    Gq = gamma * R * ws / s**2
+
+    return np.tile(R, (Nq, 1)).flatten(), zq.flatten(), Gq.flatten()
+
+
+def far_wake_rings_partials(R, z0, gamma, h, Nq=16):
+    """ far_wake_rings along with the partial derivatives of the proxy
+        rings ('r', 'z', 'Gamma') with respect to R, z0, gamma and h of
+        each cylinder, as (Nq, Nc) arrays
+    """
+    e = z0 + h
+    above = e > 0
+    e = np.maximum(e, 0.)
+    s0 = R / (R + e)
+
+    # derivatives of s0
+    ds0 = {'R':     e / (R + e)**2,
+           'z0':    np.where(above, -R / (R + e)**2, 0.),
+           'h':     np.where(above, -R / (R + e)**2, 0.),
+           'gamma': np.zeros_like(R)}
+
+    x, w = np.polynomial.legendre.leggauss(Nq)
+    a = (x[:, np.newaxis] + 1) / 2
+    w = w[:, np.newaxis]
+    s = s0 + (1 - s0) * a
+    ws = (1 - s0) * w / 2
+
+    zq = z0 - R * (1/s - 1)
+    Gq = gamma * R * ws / s**2
+
+    J = {'r': {}, 'z': {}, 'Gamma': {}}
+    for var in ('R', 'z0', 'gamma', 'h'):
+        ds = (1 - a) * ds0[var]
+        dws = -w / 2 * ds0[var]
+
+        J['r'][var] = np.ones_like(s) * (var == 'R')
+        J['z'][var] = (var == 'z0') - (var == 'R') * (1/s - 1) + R / s**2 * ds
+        J['Gamma'][var] = gamma / s**2 * ((var == 'R') * ws + R * dws - 2 * R * ws * ds / s) + \
+                          (var == 'gamma') * R * ws / s**2
+
+    return np.tile(R, (Nq, 1)).flatten(), zq.flatten(), Gq.flatten(), J
+
+
+def far_wake_adjoint(Gamma0, yE, dy, qh, h, dt, Ntt, r, z, vi, cr, thetaArray, vi_bar):
+    """ reverse (adjoint) derivative of the far-wake closure of the rotor vi
+        (see VortexRing.far_wake_closure) for the seeds vi_bar (Ns, S), with
+        the rings r, z of the last disk kept and the rotor vi (positive
+        downwards) of the disks kept. Returns the seeds of that vi (Ns, S)
+        and the adjoints of r and z (Ns+1, S), Gamma0 (Ns+1, S),
+        qh (Ns+1, S), h (S,) and dt (S,).
+    """
+    Ns, S = vi_bar.shape
+    weight = (yE * dy).flatten() / np.sum(yE * dy)
+
+    r_bar = np.zeros((Ns+1, S))
+    z_bar = np.zeros((Ns+1, S))
+    Gamma0_bar = np.zeros((Ns+1, S))
+    qh_bar = np.zeros((Ns+1, S))
+    h_bar = np.zeros(S)
+    dt_bar = np.zeros(S)
+
+    # far wake descent per time step
+    dz = 2 * weight.dot(vi.flatten()) * Ntt * dt
+    if dz <= 0:
+        return vi_bar, r_bar, z_bar, Gamma0_bar, qh_bar, h_bar, dt_bar
+
+    # induced velocity of the cylinders (vi is positive downwards)
+    gamma = Gamma0[1:] / dz
+    rq, zq, Gq, JF = far_wake_rings_partials(r[1:], z[1:] - dz/2, gamma, h)
+    _, _, J = wake_velocity_partials(yE.flatten(), (qh[:-1] + qh[1:]) / 2, rq, zq, Gq,
+                                     h, cr, thetaArray)
+    Jo = J['vz']
+    vz_bar = -vi_bar
+
+    zp_bar = np.sum(Jo['zp'], axis=1)[:, np.newaxis] * vz_bar
+    qh_bar[:-1] += zp_bar / 2
+    qh_bar[1:] += zp_bar / 2
+    h_bar += Jo['h'].dot(vz_bar)
+
+    ring_bar = {'r':     Jo['r'].T.dot(vz_bar).reshape(-1, Ns, S),
+                'z':     Jo['zr'].T.dot(vz_bar).reshape(-1, Ns, S),
+                'Gamma': Jo['Gamma'].T.dot(vz_bar).reshape(-1, Ns, S)}
+    cyl_bar = dict((var, sum(np.sum(JF[out][var][:, :, np.newaxis] * ring_bar[out], axis=0)
+                             for out in ring_bar))
+                   for var in ('R', 'z0', 'gamma', 'h'))
+
+    r_bar[1:] += cyl_bar['R']
+    z_bar[1:] += cyl_bar['z0']
+    Gamma0_bar[1:] += cyl_bar['gamma'] / dz
+    h_bar += np.sum(cyl_bar['h'], axis=0)
+    dz_bar = -np.sum(cyl_bar['z0'], axis=0) / 2 - gamma.dot(cyl_bar['gamma']) / dz
+
+    dt_bar += dz / dt * dz_bar
+    return vi_bar + 2 * Ntt * dt * np.outer(weight, dz_bar), \
+        r_bar, z_bar, Gamma0_bar, qh_bar, h_bar, dt_bar
+
+
+def wake_fidelity(Ns, Nw=0, Ntt=0, Ntheta=0):
+    """ number of wake time steps, substeps and quadrature stations,
+        values of 0 are set from the number of elements
+    """
+    if Ns == 15:
+        fidelity = [15, 5, 40]
+    elif Ns == 10:
+        fidelity = [8, 3, 20]
+    else:
+        fidelity = [5, 1, 15]
+
+    return tuple(n if n > 0 else default for n, default in zip((Nw, Ntt, Ntheta), fidelity))
+
+
+def batch_inputs(yN, Omega, h, dT, q, anhedral=0., Nw=0, Ntt=0, Ntheta=0):
+    """ inputs of a batch of operating points as arrays with a leading
+        batch axis, along with the element geometry and wake fidelity
+    """
+    yN = np.asarray(yN, dtype=float).flatten()
+    Ns = len(yN) - 1
+    Omega = np.ascontiguousarray(Omega, dtype=float).reshape(-1)
+    B = len(Omega)
+    h = np.ascontiguousarray(h, dtype=float).reshape(B)
+    dT = np.ascontiguousarray(dT, dtype=float).reshape(B, Ns)
+    q = np.ascontiguousarray(q, dtype=float).reshape(B, 6*(Ns+1))
+
+    dy = yN[1:] - yN[:-1]             # length of each element
+    yE = 0.5 * (yN[:-1] + yN[1:])     # radial location of each element
+
+    # vertical deflection of each node
+    qh = q[:, 2::6].copy()
+    qh[:, 0] = 0.
+    qh = qh - yN * anhedral
+
+    fidelity = wake_fidelity(Ns, Nw, Ntt, Ntheta)
+
+    cr = 0.5 * mean(dy)
+    dtheta = pi / fidelity[2]
+    thetaArray = linspace(dtheta/2, pi - dtheta/2, fidelity[2])
+
+    return yN, Omega, h, dT, qh, yE, dy, fidelity, cr, thetaArray
+
+
+def vortex_ring_batch(b, yN, rho, Omega, h, dT, q, anhedral=0., kernel='quadrature',
+                      Nw=0, Ntt=0, Ntheta=0):
+    """ VortexRing evaluated for a batch of operating points in one
+        vectorized free-wake march.
+
+        Omega and h have shape (B,), dT shape (B, Ns) and q shape
+        (B, 6*(Ns+1)) (trailing unit axes are dropped), other inputs are
+        shared by the batch. Returns vi with shape (B, Ns) and Gamma, r and
+        z with shape (B, Nw+1, Ns+1).
+    """
+    yN, Omega, h, dT, qh, yE, dy, (Nw, Ntt, Ntheta), cr, thetaArray = \
+        batch_inputs(yN, Omega, h, dT, q, anhedral, Nw, Ntt, Ntheta)
+    B = len(Omega)
+    Ns = len(yN) - 1
+
+    dt = (2*pi / Omega / b / Ntt)[:, np.newaxis, np.newaxis]
+
+    # nacent vortex rings
+    GammaBound = dT / (rho*(Omega[:, np.newaxis]*yE)*dy)
+    Gamma0 = np.zeros((B, Ns+1))
+    Gamma0[:, 0] = -GammaBound[:, 0]
+    Gamma0[:, 1:Ns] = GammaBound[:, :-1] - GammaBound[:, 1:]
+    Gamma0[:, Ns] = GammaBound[:, -1]
+
+    Gamma = np.zeros((B, Nw+1, Ns+1))
+    r     = np.zeros((B, Nw+1, Ns+1))
+    z     = np.zeros((B, Nw+1, Ns+1))
+
+    Gamma[:, 0] = Gamma0
+    r[:, 0] = yN
+    z[:, 0] = qh
+
+    # free-wake time stepping
+    for t in range(Nw+1):
+        for tt in range(Ntt):
+            if t > 0:
+                vr, vz = wake_velocity(r[:, :t].reshape(B, -1), z[:, :t].reshape(B, -1),
+                                       r[:, :t, 1:].reshape(B, -1), z[:, :t, 1:].reshape(B, -1),
+                                       Gamma[:, :t, 1:].reshape(B, -1),
+                                       h, cr, thetaArray, kernel)
+                z[:, :t] = z[:, :t] + vz.reshape(B, t, Ns+1)*dt
+                r[:, :t] = r[:, :t] + vr.reshape(B, t, Ns+1)*dt
+
+        # Shift elements in ring array
+        Gamma[:, 1:t+1] = Gamma[:, :t].copy()
+        r[:, 1:t+1] = r[:, :t].copy()
+        z[:, 1:t+1] = z[:, :t].copy()
+
+        # Create nacent vortex rings
+        Gamma[:, 0] = Gamma0
+        r[:, 0] = yN
+        z[:, 0] = qh
+
+    # induced velocity on the rotor
+    ringFrac = np.ones((Nw, 1))
+    ringFrac[0] = 0.675
+
+    _, vz = wake_velocity(np.tile(yE, (B, 1)), (qh[:, :-1] + qh[:, 1:]) / 2,
+                          r[:, :Nw, 1:].reshape(B, -1), z[:, :Nw, 1:].reshape(B, -1),
+                          (ringFrac * Gamma[:, :Nw, 1:]).reshape(B, -1),
+                          h, cr, thetaArray, kernel)
+
+    # vi is positive downwards
+    return -vz, Gamma, r, z
 
 
 class VortexRing(Component):
@@ -29,6 +720,50 @@ class VortexRing(Component):
 
         self.add('anhedral', Float(0., iotype='in'))
 
+        self.add('Nw',       Int(0, iotype='in', desc='number of wake time steps, 0 to set from Ns'))
+        self.add('Ntt',      Int(0, iotype='in', desc='number of substeps per time step, 0 to set from Ns'))
+        self.add('Ntheta',   Int(0, iotype='in', desc='number of quadrature stations on each ring, 0 to set from Ns'))
+        self.add('vi_tol',   Float(0., iotype='in',
+                                   desc='relative change in vi between time steps to stop adding wake disks, '
+                                        '0 to march all Nw steps'))
+
+        self.add('far_wake', Int(0, iotype='in',
+                                 desc='number of wake disks marched (at most Nw), below which the wake is closed '
+                                      'by semi-infinite vortex cylinders, 0 for no far-wake closure'))
+
+        self.add('integrator', Enum('euler', ('euler', 'rk2', 'rk4', 'adaptive'), iotype='in',
+                                    desc='time integration of the ring convection'))
+        self.add('ode_tol',  Float(1e-3, iotype='in',
+                                   desc='error tolerance of the adaptive integrator per step, relative to the rotor radius'))
+
+        self.add('kernel',   Enum('quadrature', ('quadrature', 'elliptic'), iotype='in',
+                                  desc='ring influence by quadrature over theta or in closed form'))
+        self.add('tree_theta',  Float(0., iotype='in',
+                                      desc='treecode opening ratio (cluster radius / distance), 0 for direct evaluation'))
+        self.add('tree_degree', Int(3, iotype='in', desc='treecode interpolation degree'))
+
+        self.add('warm_start', Bool(False, iotype='in',
+                                    desc='start from the early wake of a previous run'))
+        self.add('warm_remarch', Int(3, iotype='in',
+                                     desc='fixed number of final time steps marched again on a warm start, '
+                                          'with no test of the convergence of the wake'))
+        self.add('warm_tol',   Float(0.01, iotype='in',
+                                     desc='relative change in ring strength or geometry since the stored wake '
+                                          'beyond which the whole wake is marched again'))
+
+        self.add('frozen_wake', Bool(False, iotype='in',
+                                     desc='evaluate vi from the influence matrix of a stored wake geometry'))
+        self.add('frozen_tol',  Float(0.01, iotype='in',
+                                      desc='relative change in rotor deflection, height or time step since the '
+                                           'stored wake beyond which the wake is marched again'))
+
+        self.add('wake_file', Str('', iotype='in',
+                                  desc='file to append the ring geometry of each time step to (see '
+                                       'wake_recorder.read_wake), empty for no recording'))
+
+        self.add('profile', Bool(False, iotype='in',
+                                 desc='time the ring convection and rotor phases and count the ring interactions'))
+
         # outputs
         self.add('vi',       Array(np.zeros(Ns), iotype='out', desc='induced velocity'))
         self.add('Gamma',    Array(np.zeros(Ns), iotype='out', desc='vortex strength'))
@@ -36,8 +771,39 @@ class VortexRing(Component):
         self.add('r',        Array(np.zeros(Ns), iotype='out', desc=''))
         self.add('vz',       Array(np.zeros(Ns), iotype='out', desc=''))
         self.add('vr',       Array(np.zeros(Ns), iotype='out', desc=''))
+        self.add('dvi_far',  Array(np.zeros(Ns), iotype='out',
+                                   desc='change in induced velocity from the far-wake closure'))
 
-    def execute(self):
+        self.add('time_convect', Float(0., iotype='out', units='s',
+                                       desc='wall-clock time of the ring convection (with profile)'))
+        self.add('n_convect',    Float(0., iotype='out',
+                                       desc='number of ring interactions in the convection, those evaluated '
+                                            'by the treecode with tree_theta (with profile)'))
+        self.add('time_rotor',   Float(0., iotype='out', units='s',
+                                       desc='wall-clock time of the rotor induced velocity (with profile)'))
+        self.add('n_rotor',      Float(0., iotype='out',
+                                       desc='number of ring interactions for the rotor induced velocity, those '
+                                            'evaluated by the treecode with tree_theta (with profile)'))
+
+        # early wake of a previous run, for warm starts
+        self._wake = None
+
+        # influence matrices of a previous wake geometry, for frozen wakes
+        self._frozen = None
+
+        # writer of the wake_file
+        self._recorder = None
+
+        # time and number of ring interactions of the convection and rotor
+        # phases, with profile
+        self._stats = None
+
+        # number of disks in the rotor vi of the last march
+        self._Nd = 0
+
+    def wake_inputs(self):
+        """ element geometry, wake fidelity, rotor deflection and core radius
+        """
         dy = np.zeros((self.Ns, 1))
         yE = np.zeros((self.Ns, 1))
         for s in range(self.Ns):
@@ -45,18 +811,10 @@ class VortexRing(Component):
             yE[s] = 0.5 * (self.yN[s] + self.yN[s+1])  # radial location of each element
 
         # set fidelity
-        if self.Ns == 15:
-            Nw = 15
-            Ntt = 5
-            Ntheta = 40
-        elif self.Ns == 10:
-            Nw = 8
-            Ntt = 3
-            Ntheta = 20
-        else:
-            Nw = 5
-            Ntt = 1
-            Ntheta = 15
+        Nw, Ntt, Ntheta = wake_fidelity(self.Ns, self.Nw, self.Ntt, self.Ntheta)
+        if self.far_wake > 0:
+            # the wake below the first far_wake disks is closed, not marched
+            Nw = min(self.far_wake, Nw)
 
         # Break out deformations
         qq = np.zeros((6, self.Ns+1))
@@ -68,6 +826,28 @@ class VortexRing(Component):
         dtheta = pi / Ntheta
         self.thetaArray = linspace(dtheta/2, pi - dtheta/2, Ntheta)
 
+        return yE, dy, qh, Nw, Ntt, cr
+
+    def execute(self):
+        yE, dy, qh, Nw, Ntt, cr = self.wake_inputs()
+        dt = 2*pi / self.Omega / self.b / Ntt
+
+        self._stats = np.zeros(4) if self.profile else None
+
+        if not self.frozen_wake:
+            self._frozen = None
+
+        elif self._frozen is not None and self._frozen[7] == self.wake_settings(Nw, Ntt) \
+             and self.geometry_drift(qh, dt, *self._frozen[-3:]) <= self.frozen_tol:
+            # vi is linear in the ring strengths on the stored wake
+            self.frozen_velocity(yE, dy)
+
+            # vi is positive downwards
+            self.vi = -self.vi
+            self.dvi_far = -self.dvi_far
+            self.profile_outputs()
+            return
+
         # pre-allocate
         self.Gamma = np.zeros((Nw+1, self.Ns+1))
         self.z     = np.zeros((Nw+1, self.Ns+1))
@@ -77,123 +857,416 @@ class VortexRing(Component):
         self.vi    = np.zeros((self.Ns, 1))
 
         # create nacent vortex rings
-        GammaBound = self.dT / (self.rho*(self.Omega*yE)*dy)
-
-        self.Gamma[0, 0] = -GammaBound[0]
-        for s in range(1, self.Ns):
-            self.Gamma[0, s] = GammaBound[s-1] - GammaBound[s]
-        self.Gamma[0, self.Ns] = GammaBound[self.Ns-1]
-
+        self.Gamma[0] = self.nacent_strength(yE, dy)
         self.r[0, :] = self.yN.T
         self.z[0, :] = qh[:]
 
-        # free-wake time stepping
-        for t in range(Nw+1):
-            # proceed with substeps
-            for tt in range(Ntt):
-                # Compute induced velocity on all ix(Ns+1) rings from all iix(Ns+1) rings
-                self.vz = np.zeros((Nw+1, self.Ns+1))
-                self.vr = np.zeros((Nw+1, self.Ns+1))
-                for i in range(t):                          # for each disk
-                    for s in range(self.Ns+1):              # and for each ring on each disk
-                        for ii in range(t):                 # add the velocity induced from each disk
-                            for ss in range(1, self.Ns+1):  # and each ring on each disk (inner ring cancels itself out)
-                                zr = self.z[ii, ss]
-                                r  = self.r[ii, ss]
-                                zp = self.z[i, s]
-                                yp = self.r[i, s]
-
-                                M  = self.Gamma[ii, ss] * r * dtheta / (2*pi)
-                                X2 = (-r*sin(self.thetaArray))**2
-                                Y2 = (yp - r*cos(self.thetaArray))**2
-                                Z2 = (zp - zr)**2
-                                Normal = sqrt(X2 + Y2 + Z2)
-                                for iii in range(max(self.thetaArray.shape)):
-                                    if Normal[iii] < cr:
-                                        Normal[iii] = cr
-                                Norm3 = Normal**3
-
-                                self.vr[i, s] = self.vr[i, s] + np.sum(-cos(self.thetaArray) * (zp - zr) / Norm3) * M
-                                self.vz[i, s] = self.vz[i, s] + np.sum((cos(self.thetaArray) * yp - r) / Norm3) * M
-
-                                # ground effect ring
-                                zr = -2*self.h - self.z[ii, ss]
-                                Z2 = (zp - zr)**2
-                                Normal = sqrt(X2 + Y2 + Z2)
-                                for iii in range(max(self.thetaArray.shape)):
-                                    if Normal[iii] < cr:
-                                        Normal[iii] = cr
-                                Norm3 = Normal**3
-
-                                self.vr[i, s] = self.vr[i, s] - np.sum(-cos(self.thetaArray) * (zp - zr) / Norm3) * M
-                                self.vz[i, s] = self.vz[i, s] - np.sum((cos(self.thetaArray) * yp - r) / Norm3) * M
+        self.open_wake_file(Nw)
+
+        if self.warm_start and self.warm_remarch < 1:
+            raise Exception('warm starts march at least one final step again (warm_remarch >= 1)')
+        m = max(Nw + 1 - self.warm_remarch, 0)
+
+        if not self.warm_start:
+            self._wake = None
+            self.free_wake(yE, dy, qh, Nw, Ntt, cr, vi_tol=self.vi_tol)
+
+        elif self._wake is not None and self._wake[0].shape == self.Gamma.shape \
+             and self.wake_drift(qh, dt) <= self.warm_tol:
+            # start from the stored early wake with the new ring strengths,
+            # the rings of every disk are convected again in the final
+            # warm_remarch steps. Relaxing the whole wake until vi settles
+            # does not converge in ground effect, where vi swings by ~10%
+            # from one step to the next
+            Gamma0 = self.Gamma[0].copy()
+            self.Gamma, self.r, self.z = [a.copy() for a in self._wake[:3]]
+            self.Gamma[:m] = Gamma0
+            self.r[0, :] = self.yN.T
+            self.z[0, :] = qh[:]
+
+            self.free_wake(yE, dy, qh, Nw, Ntt, cr, t0=m, vi_tol=self.vi_tol)
+
+        else:
+            # march the whole wake, storing it before the final steps
+            if m > 0:
+                self.free_wake(yE, dy, qh, Nw, Ntt, cr, steps=m)
+            self._wake = (self.Gamma.copy(), self.r.copy(), self.z.copy(),
+                          self.Gamma[0].copy(), qh.copy(), self.h, dt)
+
+            self.free_wake(yE, dy, qh, Nw, Ntt, cr, t0=m, vi_tol=self.vi_tol)
+
+        self.dvi_far = np.zeros((self.Ns, 1))
+        Nd, dz = 0, 0.
+        if self.far_wake > 0:
+            Nd, dz = self.far_wake_closure(yE, dy, qh, cr)
+
+        if self.frozen_wake:
+            self.freeze_wake(yE, qh, Nw, Ntt, dt, cr, Nd, dz)
+
+        if self._recorder is not None:
+            self._recorder.flush()
+
+        self.profile_outputs()
+
+        # vi is positive downwards
+        self.vi = -self.vi
+        self.dvi_far = -self.dvi_far
+
+    def list_deriv_vars(self):
+        return ('dT', 'q', 'Omega', 'h', 'anhedral'), ('vi',)
+
+    def linearize(self):
+        """ Jacobian of vi by the adjoint of the free-wake march, with one
+            seed for each element. These are the derivatives of the march
+            (to the disks it stopped at with vi_tol) and of the far-wake
+            closure, with the quadrature kernel and euler integrator.
+            The treecode, warm starts and frozen wakes are not
+            differentiated.
+        """
+        if self.kernel != 'quadrature' or self.integrator != 'euler':
+            raise Exception('VortexRing derivatives are only available for the quadrature kernel '
+                            'and euler integrator')
+
+        if self.tree_theta > 0 or self.warm_start or self.frozen_wake:
+            raise Exception('VortexRing derivatives are not available with the treecode, '
+                            'warm starts or frozen wakes')
+
+        yE, dy, qh, Nw, Ntt, cr = self.wake_inputs()
+        dt = 2*pi / self.Omega / self.b / Ntt
+        Nd = self._Nd    # disks in the rotor vi
+
+        GammaBound = (self.dT / (self.rho*(self.Omega*yE)*dy)).flatten()
+        Gamma0 = self.nacent_strength(yE, dy)
+
+        vi_bar = np.eye(self.Ns)
+        Nv, r_bar, z_bar, far_bar = Nd, None, None, (0., 0., 0., 0.)
+        if self.far_wake > 0:
+            # the closure of the wake below the first Nv disks
+            Nv = min(self.far_wake, Nd)
+            r_bar = np.zeros((Nw+1, self.Ns+1, self.Ns))
+            z_bar = np.zeros((Nw+1, self.Ns+1, self.Ns))
+            vi = -self.rotor_velocity(yE, qh, Nv, cr)
 
+            vi_bar, r_bar[Nv-1], z_bar[Nv-1], Gamma0_far, qh_far, h_far, dt_far = far_wake_adjoint(
+                Gamma0, yE, dy, qh, self.h, dt, Ntt, self.r[Nv-1], self.z[Nv-1], vi,
+                cr, self.thetaArray, vi_bar)
+            far_bar = (Gamma0_far, qh_far, h_far, dt_far)
+
+        Gamma0_bar, qh_bar, h_bar, dt_bar = [bar + far for bar, far in zip(wake_adjoint(
+            Gamma0, self.yN.flatten(), yE.flatten(), qh, self.h, dt, Nw, Ntt, Nd,
+            cr, self.thetaArray, vi_bar, Nv, r_bar, z_bar), far_bar)]
+
+        # ring strengths from thrust
+        GammaBound_bar = np.zeros((self.Ns, self.Ns))
+        GammaBound_bar[:-1] += Gamma0_bar[1:self.Ns]
+        GammaBound_bar[1:] -= Gamma0_bar[1:self.Ns]
+        GammaBound_bar[-1] += Gamma0_bar[self.Ns]
+
+        self.J = {}
+        self.J['dT'] = (GammaBound_bar / (self.rho*(self.Omega*yE)*dy)).T
+        self.J['Omega'] = (-GammaBound.dot(GammaBound_bar) - dt_bar*dt) / self.Omega
+        self.J['h'] = h_bar
+        self.J['anhedral'] = -self.yN.flatten().dot(qh_bar)
+        self.J['q'] = np.zeros((self.Ns, 6*(self.Ns+1)))
+        self.J['q'][:, 8::6] = qh_bar[1:].T
+
+    def apply_deriv(self, arg, result):
+        """ forward mode, vi from the Jacobian of the adjoint march
+        """
+        if 'vi' in result:
+            for name in arg:
+                dvi = np.dot(np.reshape(self.J[name], (self.Ns, -1)), np.reshape(arg[name], -1))
+                result['vi'] += dvi.reshape(np.shape(result['vi']))
+
+    def apply_derivT(self, arg, result):
+        """ adjoint mode, inputs from the Jacobian of the adjoint march
+        """
+        if 'vi' in arg:
+            for name in result:
+                dx = np.dot(np.reshape(self.J[name], (self.Ns, -1)).T, np.reshape(arg['vi'], -1))
+                result[name] += dx.reshape(np.shape(result[name]))
+
+    def profile_outputs(self):
+        """ set the profile outputs from the stats of the last run
+        """
+        stats = self._stats if self._stats is not None else np.zeros(4)
+        self.time_convect, self.n_convect, self.time_rotor, self.n_rotor = stats
+
+    def stats_counter(self, k):
+        """ view of the kth profile stat, to add an interaction count to,
+            None without profile
+        """
+        return self._stats[k:k+1] if self._stats is not None else None
+
+    def open_wake_file(self, Nw):
+        """ start a run of the recorder of the wake_file, opening the file
+            if it has changed
+        """
+        shape = (Nw+1, self.Ns+1)
+        if self._recorder is not None and \
+           (self._recorder.filename != self.wake_file or self._recorder.shape != shape):
+            self._recorder.close()
+            self._recorder = None
+
+        if self.wake_file and self._recorder is None:
+            self._recorder = WakeRecorder(self.wake_file, shape)
+
+        if self._recorder is not None:
+            self._recorder.new_run()
+
+    def wake_drift(self, qh, dt):
+        """ largest relative change in the nacent ring strengths, rotor
+            deflection, height and time step since the stored wake
+        """
+        Gamma0, qh0, h0, dt0 = self._wake[3:]
+
+        return max(np.max(np.abs(self.Gamma[0] - Gamma0)) / np.max(np.abs(Gamma0)),
+                   self.geometry_drift(qh, dt, qh0, h0, dt0))
+
+    def wake_settings(self, Nw, Ntt):
+        """ the inputs of the wake model other than the rotor deflection,
+            height and time step, which must match for a stored wake to be
+            used again
+        """
+        return (tuple(self.yN.flatten()), self.b, Nw, Ntt, len(self.thetaArray), self.kernel,
+                self.integrator, self.ode_tol, self.tree_theta, self.tree_degree, self.vi_tol,
+                self.far_wake)
+
+    def geometry_drift(self, qh, dt, qh0, h0, dt0):
+        """ largest relative change in the rotor deflection, height and time
+            step since a stored wake
+        """
+        R = np.max(self.yN)
+
+        return max(np.max(np.abs(qh - qh0)) / R,
+                   abs(self.h - h0) / R,
+                   abs(dt - dt0) / dt0)
+
+    def free_wake(self, yE, dy, qh, Nw, Ntt, cr, t0=0, steps=None, vi_tol=0.):
+        """ free-wake time stepping of the vortex rings, followed by the
+            induced velocity on the rotor. Marches the given number of
+            steps (all Nw+1 by default) starting with t0 disks in the wake,
+            or until vi changes by less than vi_tol between steps. The
+            rotor vi is from the disks of the last step.
+        """
+        if steps is None:
+            steps = Nw + 1 - t0
+
+        vi = None
+        Nd = min(t0, Nw)
+
+        for step in range(steps):
+            t = min(t0 + step, Nw)
+            Nd = t
+            # Convect rings downstream
+            self.vz = np.zeros((Nw+1, self.Ns+1))
+            self.vr = np.zeros((Nw+1, self.Ns+1))
+            if t > 0:
+                self.convect(t, Ntt, cr)
+
+            # Shift elements in ring array
+            self.Gamma[1:t+1] = self.Gamma[:t].copy()
+            self.r[1:t+1] = self.r[:t].copy()
+            self.z[1:t+1] = self.z[:t].copy()
+
+            # Create nacent vortex rings
+            self.Gamma[0] = self.nacent_strength(yE, dy)
+            self.r[0, :] = self.yN.T
+            self.z[0, :] = qh[:]
+
+            if self._recorder is not None:
+                self._recorder.record(t+1, self.Gamma, self.r, self.z)
+
+            # stop adding disks once vi has converged
+            if vi_tol > 0 and t > 0:
+                vi_last, vi = vi, self.rotor_velocity(yE, qh, t, cr)
+                if vi_last is not None and \
+                   np.max(np.abs(vi - vi_last)) <= vi_tol * np.max(np.abs(vi)):
+                    break
+
+        self._Nd = Nd
+        self.vi = self.rotor_velocity(yE, qh, Nd, cr)
+
+    def wake_rates(self, r, z, t, cr):
+        """ velocity of the rings of the first t disks at the positions r, z
+        """
+        if self._stats is not None:
+            start = time.time()
+
+        # Compute induced velocity on all ix(Ns+1) rings from all iix(Ns+1) rings
+        # (inner ring cancels itself out), including the ground effect rings
+        vr, vz = wake_velocity(r.flatten(), z.flatten(), r[:, 1:].flatten(), z[:, 1:].flatten(),
+                               self.Gamma[:t, 1:].flatten(),
+                               self.h, cr, self.thetaArray, self.kernel,
+                               self.tree_theta, self.tree_degree, self.stats_counter(1))
+
+        if self._stats is not None:
+            self._stats[0] += time.time() - start
+
+        return vr.reshape(t, self.Ns+1), vz.reshape(t, self.Ns+1)
+
+    def rk_step(self, t, dt, cr, k1=None):
+        """ explicit Runge-Kutta step of the first t disks, returns the new
+            positions and the velocities at each stage
+        """
+        a, w = INTEGRATORS[self.integrator]
+        r, z = self.r[:t], self.z[:t]
+
+        if k1 is None:
+            k1 = self.wake_rates(r, z, t, cr)
+        k = [k1]
+        for ai in a:
+            k.append(self.wake_rates(r + dt*sum(aij*kj[0] for aij, kj in zip(ai, k)),
+                                     z + dt*sum(aij*kj[1] for aij, kj in zip(ai, k)), t, cr))
+
+        return r + dt*sum(wi*ki[0] for wi, ki in zip(w, k)), \
+               z + dt*sum(wi*ki[1] for wi, ki in zip(w, k)), k
+
+    def convect(self, t, Ntt, cr):
+        """ convect the rings of the first t disks over one time step, in Ntt
+            substeps or in adaptive steps starting from Ntt substeps
+        """
+        T = 2*pi / self.Omega / self.b
+
+        if self.integrator != 'adaptive':
+            for tt in range(Ntt):
                 # Compute altitude and time power approximation
                 # if tt == 0:
                 #     PiApprox = 8 * np.sum(self.dT.dot(vi))
                 # realtime = 2*pi / self.Omega / self.b * ((t-1) * Ntt + tt) / Ntt
                 # altitude = self.vc * realtime
+                self.r[:t], self.z[:t], k = self.rk_step(t, T / Ntt, cr)
+        else:
+            tol = self.ode_tol * np.max(self.yN)
+            dt = T / Ntt
+            time = 0.
+            k1 = None
+            while time < T * (1 - 1e-12):
+                dt = min(dt, T - time)
+                r, z, k = self.rk_step(t, dt, cr, k1)
 
-                # Convect rings downstream
-                dt = 2*pi / self.Omega / self.b / Ntt
-                for i in range(t):              # for each disk
-                    for s in range(self.Ns+1):  # and for each ring on each disk
-                        self.z[i, s] = self.z[i, s] + self.vz[i, s]*dt
-                        self.r[i, s] = self.r[i, s] + self.vr[i, s]*dt
-                        self.Gamma[i, s] = self.Gamma[i, s]
+                # difference of the Heun and Euler steps
+                err = dt/2 * max(np.max(np.abs(k[1][0] - k[0][0])), np.max(np.abs(k[1][1] - k[0][1])))
+                if err <= tol or dt < 1e-6 * T:
+                    self.r[:t], self.z[:t] = r, z
+                    time += dt
+                    k1 = None
+                else:
+                    k1 = k[0]
+                dt = dt * min(2., max(0.2, 0.9 * sqrt(tol / max(err, 1e-300))))
 
-            # Shift elements in ring array
-            for i in range(t)[::-1]:
-                self.Gamma[i+1, :] = self.Gamma[i, :]
-                self.r[i+1, :] = self.r[i, :]
-                self.z[i+1, :] = self.z[i, :]
+        # velocity at the start of the last step
+        self.vr[:t], self.vz[:t] = k[0]
 
-            # Create nacent vortex rings
-            GammaBound = self.dT / (self.rho*(self.Omega*yE)*dy)
-            self.Gamma[0, 0] = -GammaBound[0]
-            for s in range(1, self.Ns):
-                self.Gamma[0, s] = GammaBound[s-1] - GammaBound[s]
-            self.Gamma[0, self.Ns] = GammaBound[self.Ns-1]
-            self.r[0, :] = self.yN.T
-            self.z[0, :] = qh[:]
+    def far_wake_closure(self, yE, dy, qh, cr):
+        """ induced velocity on the rotor from the first far_wake disks of
+            the wake, closed by semi-infinite vortex cylinders (and their
+            ground effect images) continuing the rings of the last disk.
+            The cylinders are spaced by the descent of the far wake in one
+            time step at twice the mean induced velocity on the rotor, from
+            momentum theory. Returns the number of disks and the spacing.
+        """
+        Nd = min(self.far_wake, self._Nd)
+        vi = self.rotor_velocity(yE, qh, Nd, cr)
 
-        # Compute induced velocity on rotor (rp = [0 r(s) 0])
-        for s in range(self.Ns):                # for each element
-            self.vi[s] = 0
-            for ii in range(Nw):                # add the velocity induced from each disk
-                for ss in range(1, self.Ns+1):  # and each ring on each disk (inner ring cancels itself out)
-                    if (ii == 0):
-                        ringFrac = 0.675
-                    else:
-                        ringFrac = 1
-
-                    zr = self.z[ii, ss]
-                    r  = self.r[ii, ss]
-                    zp = (qh[s] + qh[s+1]) / 2
-                    yp = yE[s]
-
-                    M  = self.Gamma[ii, ss] * r * dtheta / (2*pi)
-                    X2 = (-r*sin(self.thetaArray))**2
-                    Y2 = (yp - r*cos(self.thetaArray))**2
-                    Z2 = (zp - zr)**2
-                    Normal = sqrt(X2 + Y2 + Z2)
-                    for iii in range(max(self.thetaArray.shape)):
-                        if Normal[iii] < cr:
-                            Normal[iii] = cr
-                    Norm3 = Normal**3
-
-                    self.vi[s] = self.vi[s] + ringFrac * np.sum((cos(self.thetaArray)*yp - r) / Norm3) * M
-
-                    # ground effect ring
-                    zr = -2*self.h - self.z[ii, ss]
-                    Z2 = (zp - zr)**2
-                    Normal = sqrt(X2 + Y2 + Z2)
-                    for iii in range(max(self.thetaArray.shape)):
-                        if Normal[iii] < cr:
-                            Normal[iii] = cr
-                    Norm3 = Normal**3
-
-                    self.vi[s] = self.vi[s] - ringFrac * np.sum((cos(self.thetaArray)*yp - r) / Norm3) * M
+        # far wake descent per time step (vi is positive upwards here)
+        dz = -2 * np.sum(vi * yE * dy) / np.sum(yE * dy) * 2*pi / self.Omega / self.b
+        vi = vi + self.cylinder_velocity(yE, qh, Nd, cr, dz)
 
-        # vi is positive downwards
-        self.vi = -self.vi
+        self.dvi_far = vi - self.vi
+        self.vi = vi
+
+        return Nd, dz
+
+    def cylinder_velocity(self, yE, qh, Nd, cr, dz, Gamma=None):
+        """ induced velocity on the rotor from the semi-infinite vortex
+            cylinders below disk Nd-1, spaced by dz
+        """
+        if Gamma is None:
+            Gamma = self.Gamma
+
+        if dz <= 0:
+            return np.zeros((self.Ns, 1))
+
+        r, z, G = far_wake_rings(self.r[Nd-1, 1:], self.z[Nd-1, 1:] - dz/2,
+                                 Gamma[Nd-1, 1:] / dz, self.h)
+        _, vz = wake_velocity(yE.flatten(), (qh[:-1] + qh[1:]) / 2, r, z, G,
+                              self.h, cr, self.thetaArray, self.kernel)
+        return vz.reshape(self.Ns, 1)
+
+    def freeze_wake(self, yE, qh, Nw, Ntt, dt, cr, Nd, dz):
+        """ store the influence matrices of the wake on the rotor, from the
+            strength of the nacent rings (which every disk of the wake
+            carries) to vi and to dvi_far, with the far wake closed below
+            Nd disks at the spacing dz
+        """
+        Nm = self._Nd
+        A = np.zeros((self.Ns, self.Ns+1))
+        A_far = np.zeros((self.Ns, self.Ns+1))
+
+        # the inner ring cancels itself out
+        for s in range(1, self.Ns+1):
+            Gamma = np.zeros(self.Gamma.shape)
+            Gamma[:, s] = 1.
+
+            A[:, s] = self.rotor_velocity(yE, qh, Nm, cr, Gamma).flatten()
+            if self.far_wake > 0:
+                vi = self.rotor_velocity(yE, qh, Nd, cr, Gamma) + \
+                     self.cylinder_velocity(yE, qh, Nd, cr, dz, Gamma)
+                A_far[:, s] = vi.flatten() - A[:, s]
+                A[:, s] = vi.flatten()
+
+        self._frozen = (A, A_far, Nm, self.r.copy(), self.z.copy(), self.vr.copy(), self.vz.copy(),
+                        self.wake_settings(Nw, Ntt), qh.copy(), self.h, dt)
+
+    def frozen_velocity(self, yE, dy):
+        """ induced velocity on the rotor from the stored wake geometry
+        """
+        A, A_far, Nm, r, z, vr, vz = self._frozen[:7]
+        Gamma0 = self.nacent_strength(yE, dy)
+
+        self.Gamma = np.zeros(r.shape)
+        self.Gamma[:Nm+1] = Gamma0
+        self._Nd = Nm
+        self.r, self.z, self.vr, self.vz = r.copy(), z.copy(), vr.copy(), vz.copy()
+
+        self.vi = A.dot(Gamma0).reshape(self.Ns, 1)
+        self.dvi_far = A_far.dot(Gamma0).reshape(self.Ns, 1)
+
+    def nacent_strength(self, yE, dy):
+        """ strength of the nacent vortex rings from the bound circulation
+        """
+        GammaBound = (self.dT / (self.rho*(self.Omega*yE)*dy)).flatten()
+
+        Gamma0 = np.zeros(self.Ns+1)
+        Gamma0[0] = -GammaBound[0]
+        Gamma0[1:self.Ns] = GammaBound[:-1] - GammaBound[1:]
+        Gamma0[self.Ns] = GammaBound[-1]
+
+        return Gamma0
+
+    def rotor_velocity(self, yE, qh, Nd, cr, Gamma=None):
+        """ induced velocity on the rotor from the first Nd disks of the wake,
+            with the ring strengths Gamma (the wake rings by default)
+        """
+        if Gamma is None:
+            Gamma = self.Gamma
+
+        if self._stats is not None:
+            start = time.time()
+
+        # Compute induced velocity on rotor (rp = [0 r(s) 0]) from each ring on
+        # each disk (inner ring cancels itself out), including the ground effect rings
+        ringFrac = np.ones((Nd, 1))
+        ringFrac[0] = 0.675
+
+        _, vz = wake_velocity(yE.flatten(), (qh[:-1] + qh[1:]) / 2,
+                              self.r[:Nd, 1:].flatten(), self.z[:Nd, 1:].flatten(),
+                              (ringFrac * Gamma[:Nd, 1:]).flatten(),
+                              self.h, cr, self.thetaArray, self.kernel,
+                              self.tree_theta, self.tree_degree, self.stats_counter(3))
+
+        if self._stats is not None:
+            self._stats[2] += time.time() - start
+
+        return vz.reshape(self.Ns, 1)
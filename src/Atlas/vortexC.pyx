@@ -1,290 +1,794 @@
+# distutils: extra_compile_args = -fopenmp
+# distutils: extra_link_args = -fopenmp
 import numpy as np
 cimport cython
 cimport numpy as np
+from cython.parallel cimport prange
+from openmp cimport omp_get_wtime
 
-from openmdao.main.api import Component
-from openmdao.lib.datatypes.api import Float, Array, Int
+from Atlas.vortex import VortexRing, batch_inputs
 
-from numpy import mean, linspace
-from libc.math cimport sqrt, cos, sin
+from openmdao.lib.datatypes.api import Int, Enum, Array
+
+from libc.math cimport sqrt, cos, sin, fabs
 from math import pi
 
+cdef extern from "math.h" nogil:
+    float sqrtf(float x)
+    float fabsf(float x)
+
 DTYPE = np.double
 ctypedef double DTYPE_t
 
+# called after each time step of the march with the number of disks in use
+ctypedef void (*step_hook)(void *ctx, int disks) nogil
+
+
+@cython.cdivision(True)
+cdef inline void ellipke(double m, double *K, double *E) nogil:
+    """ complete elliptic integrals of the first and second kind,
+        by the arithmetic-geometric mean (m is kept below 1, where K is
+        infinite)
+    """
+    cdef double a = 1.0
+    cdef double b, c
+    cdef double a_next
+    cdef double p2 = 0.5
+    cdef double acc
+    cdef int n = 0
+
+    if m > 1.0 - 1e-16:
+        m = 1.0 - 1e-16
+    b = sqrt(1.0 - m)
+    c = sqrt(m)
+    acc = 0.5 * m
+
+    while fabs(c) > 1e-15 and n < 40:
+        a_next = 0.5 * (a + b)
+        c = 0.5 * (a - b)
+        b = sqrt(a * b)
+        a = a_next
+        p2 *= 2.0
+        acc += p2 * c * c
+        n += 1
+
+    K[0] = 0.5 * 3.141592653589793 / a
+    E[0] = K[0] * (1.0 - acc)
+
+
+@cython.cdivision(True)
+cdef inline void ring_elliptic(double yp, double zp, double r, double zr, double cr,
+                               double *acc_r, double *acc_z) nogil:
+    """ closed form half ring integrals of the quadrature kernel, with a
+        smooth core of radius cr (see vortex.ring_velocity_elliptic)
+    """
+    cdef double dz = zp - zr
+    cdef double p = yp*yp + r*r + dz*dz + cr*cr
+    cdef double q = 2.0 * yp * r
+    cdef double A = p + q
+    cdef double B = p - q
+    cdef double K, E, I0, I1
+
+    ellipke(2.0 * q / A, &K, &E)
+    I0 = 2.0 * E / (B * sqrt(A))
+    if q < 1e-8 * p:
+        I1 = 0.75 * 3.141592653589793 * q / (p * p * sqrt(p))
+    else:
+        I1 = 2.0 / (q * sqrt(A)) * (p * E / B - K)
+
+    acc_r[0] = -I1 * dz
+    acc_z[0] = I1 * yp - I0 * r
+
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-@cython.nonecheck(False)
 @cython.cdivision(True)
-def main_loop(
-    double h,
-    double rho,
-    np.ndarray[DTYPE_t, ndim=2] yE,
-    np.ndarray[DTYPE_t, ndim=2] dy,
-    double[:] qh,
-    int Nw,
-    int Ntt,
-    int Ns,
-    np.ndarray[DTYPE_t, ndim=2] z,
-    np.ndarray[DTYPE_t, ndim=2] r,
-    np.ndarray[DTYPE_t, ndim=2]  Gamma,
-    #double[:, ::1]  Gamma,
-    double Omega,
-    np.ndarray[DTYPE_t, ndim=2] dT,
-    np.ndarray[DTYPE_t, ndim=1] yN,
-    double b,
-    double dtheta,
-    unsigned int Ntheta,
-    double[:] thetaArray,
-    double cr,
-    np.ndarray[DTYPE_t, ndim=2] vi):
+cdef void wake_point(double yp, double zp,
+                     double[:, ::1] r, double[:, ::1] z, double[:, ::1] Gamma,
+                     int Nd, int Ns, double h, double cr, double dtheta,
+                     double[::1] cos_t, double[::1] sin_t, bint elliptic,
+                     double frac0, double *vr, double *vz) nogil:
+    """ velocity induced at (yp, zp) by rings 1..Ns of the first Nd disks
+        and by their ground effect images, the rings of the first disk
+        are scaled by frac0
+    """
+    cdef int ii, ss, j
+    cdef int Ntheta = cos_t.shape[0]
+    cdef double two_pi = 2.0 * 3.141592653589793
+    cdef double r_scalar, zr, zi, M, Z2, Zi2, XY2, normal, inv_n3
+    cdef double acc1, acc2, img1, img2
+    cdef double sum_r = 0.0
+    cdef double sum_z = 0.0
+
+    for ii in range(Nd):                 # add the velocity induced from each disk
+        for ss in range(1, Ns+1):        # and each ring on each disk (inner ring cancels itself out)
+            r_scalar = r[ii, ss]
+            zr = z[ii, ss]
+            zi = -2*h - zr               # ground effect ring
+
+            if elliptic:
+                M = Gamma[ii, ss] * r_scalar / two_pi
+                ring_elliptic(yp, zp, r_scalar, zr, cr, &acc1, &acc2)
+                ring_elliptic(yp, zp, r_scalar, zi, cr, &img1, &img2)
+            else:
+                M = Gamma[ii, ss] * r_scalar * dtheta / two_pi
+                Z2 = (zp - zr)**2
+                Zi2 = (zp - zi)**2
+                acc1 = acc2 = img1 = img2 = 0.0
+                for j in range(Ntheta):
+                    XY2 = (r_scalar*sin_t[j])**2 + (yp - r_scalar*cos_t[j])**2
+
+                    normal = sqrt(XY2 + Z2)
+                    if normal < cr:
+                        normal = cr
+                    inv_n3 = 1.0 / (normal * normal * normal)
+                    acc1 += -cos_t[j] * (zp - zr) * inv_n3
+                    acc2 += (cos_t[j] * yp - r_scalar) * inv_n3
+
+                    normal = sqrt(XY2 + Zi2)
+                    if normal < cr:
+                        normal = cr
+                    inv_n3 = 1.0 / (normal * normal * normal)
+                    img1 += -cos_t[j] * (zp - zi) * inv_n3
+                    img2 += (cos_t[j] * yp - r_scalar) * inv_n3
+
+            if ii == 0:
+                M = M * frac0
+
+            sum_r += (acc1 - img1) * M
+            sum_z += (acc2 - img2) * M
+
+    vr[0] = sum_r
+    vz[0] = sum_z
+
+
+@cython.cdivision(True)
+cdef inline void ellipke_f(float m, float *K, float *E) nogil:
+    """ single precision ellipke
+    """
+    cdef float half = 0.5
+    cdef float one = 1.0
+    cdef float a = one
+    cdef float b, c
+    cdef float a_next
+    cdef float p2 = half
+    cdef float acc
+    cdef int n = 0
+
+    if m > one - 1e-7:
+        m = one - 1e-7
+    b = sqrtf(one - m)
+    c = sqrtf(m)
+    acc = half * m
+
+    while fabsf(c) > 1e-7 and n < 20:
+        a_next = half * (a + b)
+        c = half * (a - b)
+        b = sqrtf(a * b)
+        a = a_next
+        p2 = p2 + p2
+        acc = acc + p2 * c * c
+        n = n + 1
+
+    K[0] = <float>(0.5 * 3.141592653589793) / a
+    E[0] = K[0] * (one - acc)
+
+
+@cython.cdivision(True)
+cdef inline void ring_elliptic_f(float yp, float zp, float r, float zr, float cr,
+                                 float *acc_r, float *acc_z) nogil:
+    """ single precision ring_elliptic
+    """
+    cdef float two = 2.0
+    cdef float dz = zp - zr
+    cdef float p = yp*yp + r*r + dz*dz + cr*cr
+    cdef float q = two * yp * r
+    cdef float A = p + q
+    cdef float B = p - q
+    cdef float K, E, I0, I1
+
+    ellipke_f(two * q / A, &K, &E)
+    I0 = two * E / (B * sqrtf(A))
+    if q < <float>1e-4 * p:
+        I1 = <float>(0.75 * 3.141592653589793) * q / (p * p * sqrtf(p))
+    else:
+        I1 = two / (q * sqrtf(A)) * (p * E / B - K)
+
+    acc_r[0] = -I1 * dz
+    acc_z[0] = I1 * yp - I0 * r
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void wake_point_f(float yp, float zp,
+                       float[:, ::1] r, float[:, ::1] z, float[:, ::1] Gamma,
+                       int Nd, int Ns, float h, float cr, float dtheta,
+                       float[::1] cos_t, float[::1] sin_t, bint elliptic,
+                       float frac0, double *vr, double *vz) nogil:
+    """ single precision wake_point, with the velocity of each ring
+        summed by compensated (Kahan) summation
+    """
+    cdef int ii, ss, j
+    cdef int Ntheta = cos_t.shape[0]
+    cdef float two_pi = 2.0 * 3.141592653589793
+    cdef float one = 1.0
+    cdef float r_scalar, zr, zi, M, Z2, Zi2, X, Y, XY2, normal, inv_n3
+    cdef float acc1, acc2, img1, img2
+    cdef float sum_r = 0.0
+    cdef float sum_z = 0.0
+    cdef float err_r = 0.0
+    cdef float err_z = 0.0
+    cdef float term, total
+
+    for ii in range(Nd):                 # add the velocity induced from each disk
+        for ss in range(1, Ns+1):        # and each ring on each disk (inner ring cancels itself out)
+            r_scalar = r[ii, ss]
+            zr = z[ii, ss]
+            zi = -2*h - zr               # ground effect ring
+
+            if elliptic:
+                M = Gamma[ii, ss] * r_scalar / two_pi
+                ring_elliptic_f(yp, zp, r_scalar, zr, cr, &acc1, &acc2)
+                ring_elliptic_f(yp, zp, r_scalar, zi, cr, &img1, &img2)
+            else:
+                M = Gamma[ii, ss] * r_scalar * dtheta / two_pi
+                Z2 = (zp - zr) * (zp - zr)
+                Zi2 = (zp - zi) * (zp - zi)
+                acc1 = acc2 = img1 = img2 = 0.0
+                for j in range(Ntheta):
+                    X = r_scalar*sin_t[j]
+                    Y = yp - r_scalar*cos_t[j]
+                    XY2 = X*X + Y*Y
+
+                    normal = sqrtf(XY2 + Z2)
+                    if normal < cr:
+                        normal = cr
+                    inv_n3 = one / (normal * normal * normal)
+                    acc1 = acc1 - cos_t[j] * (zp - zr) * inv_n3
+                    acc2 = acc2 + (cos_t[j] * yp - r_scalar) * inv_n3
+
+                    normal = sqrtf(XY2 + Zi2)
+                    if normal < cr:
+                        normal = cr
+                    inv_n3 = one / (normal * normal * normal)
+                    img1 = img1 - cos_t[j] * (zp - zi) * inv_n3
+                    img2 = img2 + (cos_t[j] * yp - r_scalar) * inv_n3
+
+            if ii == 0:
+                M = M * frac0
+
+            term = (acc1 - img1) * M - err_r
+            total = sum_r + term
+            err_r = (total - sum_r) - term
+            sum_r = total
+
+            term = (acc2 - img2) * M - err_z
+            total = sum_z + term
+            err_z = (total - sum_z) - term
+            sum_z = total
+
+    vr[0] = sum_r
+    vz[0] = sum_z
 
-    '''made this code a function so it can be Cythonized'''
 
-    cdef unsigned int t, tt, i, s, ii, ss, j
-    cdef double zr, r_scalar, zp, yp, M, Z2
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void mirror(int Nd, int Ns, double[:, ::1] r, double[:, ::1] z, double[:, ::1] Gamma,
+                 float[:, :, ::1] fring) nogil:
+    """ single precision copy of the rings of the first Nd disks
+    """
+    cdef int i, s
+
+    for i in range(Nd):
+        for s in range(Ns+1):
+            fring[0, i, s] = r[i, s]
+            fring[1, i, s] = z[i, s]
+            fring[2, i, s] = Gamma[i, s]
+
 
-    cdef np.ndarray[DTYPE_t, ndim=2] vz,vr
-    cdef np.ndarray[np.double_t, ndim=1] Normal, X2, Y2, Norm3, sin_thetaArray, cos_thetaArray
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void rotor_point(int Nd, int Ns, double[:, :] yE, double[:] qh,
+                      double[:, ::1] r, double[:, ::1] z, double[:, ::1] Gamma,
+                      double h, double cr, double dtheta, double[::1] cos_t, double[::1] sin_t,
+                      bint elliptic, int num_threads, bint single,
+                      float[:, :, ::1] fring, float[:, ::1] ftheta,
+                      double[:] vr, double[:] vi, bint profile, double[::1] stats) nogil:
+    """ induced velocity on the rotor (rp = [0 r(s) 0]) from the first Nd
+        disks, with profile the time and number of ring interactions are
+        added to stats[2:4]
+    """
+    cdef int s
+    cdef double start = 0.0
 
-    cdef double acc1, acc2
-    cdef double two_pi = 2.0 * pi
-    cdef double dt
-    cdef double nl, n3, normal, inv_n3
+    if profile:
+        start = omp_get_wtime()
 
-    # init some arrays
-    sin_thetaArray = np.empty(Ntheta)
-    cos_thetaArray = np.empty(Ntheta)
-    for j in range(Ntheta):
-        sin_thetaArray[j] = sin(thetaArray[j] )
-        cos_thetaArray[j] = cos(thetaArray[j] )
+    if single:
+        mirror(Nd, Ns, r, z, Gamma, fring)
+        for s in prange(Ns, num_threads=num_threads, schedule='static'):
+            wake_point_f(yE[s, 0], (qh[s] + qh[s+1]) / 2, fring[0], fring[1], fring[2], Nd, Ns,
+                         h, cr, dtheta, ftheta[0], ftheta[1], elliptic, 0.675, &vr[s], &vi[s])
+    else:
+        for s in prange(Ns, num_threads=num_threads, schedule='static'):
+            wake_point(yE[s, 0], (qh[s] + qh[s+1]) / 2, r, z, Gamma, Nd, Ns, h, cr, dtheta,
+                       cos_t, sin_t, elliptic, 0.675, &vr[s], &vi[s])
 
-    X2 = np.empty(Ntheta)
-    Y2 = np.empty(Ntheta)
-    Normal = np.empty(Ntheta)
-    Norm3 = np.empty(Ntheta)
-    vz = np.empty((Nw+1, Ns+1))
-    vr = np.empty((Nw+1, Ns+1))
+    if profile:
+        stats[2] += omp_get_wtime() - start
+        stats[3] += <double>Ns * Nd * Ns
 
-    dt = two_pi / Omega / b / Ntt
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void wake_rates(int t, int Ns, double[:, ::1] r, double[:, ::1] z, double[:, ::1] Gamma,
+                     double h, double cr, double dtheta, double[::1] cos_t, double[::1] sin_t,
+                     bint elliptic, int num_threads, bint single,
+                     float[:, :, ::1] fring, float[:, ::1] ftheta,
+                     double[:, ::1] vr, double[:, ::1] vz, bint profile, double[::1] stats) nogil:
+    """ velocity of the rings of the first t disks at the positions r, z,
+        with profile the time and number of ring interactions are added to
+        stats[0:2]
+    """
+    cdef int k, i, s
+    cdef double start = 0.0
+
+    if profile:
+        start = omp_get_wtime()
+
+    # Compute induced velocity on all ix(Ns+1) rings from all iix(Ns+1) rings
+    if single:
+        mirror(t, Ns, r, z, Gamma, fring)
+        for k in prange(t*(Ns+1), num_threads=num_threads, schedule='static'):
+            i = k / (Ns+1)      # for each disk
+            s = k % (Ns+1)      # and for each ring on each disk
+            wake_point_f(fring[0, i, s], fring[1, i, s], fring[0], fring[1], fring[2], t, Ns,
+                         h, cr, dtheta, ftheta[0], ftheta[1], elliptic, 1.0, &vr[i, s], &vz[i, s])
+    else:
+        for k in prange(t*(Ns+1), num_threads=num_threads, schedule='static'):
+            i = k / (Ns+1)      # for each disk
+            s = k % (Ns+1)      # and for each ring on each disk
+            wake_point(r[i, s], z[i, s], r, z, Gamma, t, Ns, h, cr, dtheta,
+                       cos_t, sin_t, elliptic, 1.0, &vr[i, s], &vz[i, s])
+
+    if profile:
+        stats[0] += omp_get_wtime() - start
+        stats[1] += <double>t * (Ns+1) * t * Ns
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef double rk_step(int integrator, int t, int Ns, double dt, bint reuse_k1,
+                    double[:, ::1] r, double[:, ::1] z, double[:, ::1] Gamma,
+                    double h, double cr, double dtheta, double[::1] cos_t, double[::1] sin_t,
+                    bint elliptic, int num_threads, bint single,
+                    float[:, :, ::1] fring, float[:, ::1] ftheta, double[:, :, ::1] stages,
+                    bint profile, double[::1] stats) nogil:
+    """ explicit Runge-Kutta step of the first t disks (see
+        vortex.INTEGRATORS). The stage velocities are left in stages[0:4]
+        (radial) and stages[4:8] (axial) and the new positions in stages[8]
+        and stages[9]. Returns the difference of the Heun and Euler steps.
+    """
+    cdef int n, st, j, i, s
+    cdef double a[4][4]
+    cdef double w[4]
+    cdef double acc_r, acc_z
+    cdef double err = 0.0
+
+    for i in range(4):
+        w[i] = 0.0
+        for j in range(4):
+            a[i][j] = 0.0
+
+    if integrator == 0:        # euler
+        n = 1
+        w[0] = 1.0
+    elif integrator == 2:      # rk4
+        n = 4
+        a[1][0] = 0.5
+        a[2][1] = 0.5
+        a[3][2] = 1.0
+        w[0] = w[3] = 1.0 / 6.0
+        w[1] = w[2] = 1.0 / 3.0
+    else:                      # rk2 and adaptive (Heun)
+        n = 2
+        a[1][0] = 1.0
+        w[0] = w[1] = 0.5
+
+    if not reuse_k1:
+        wake_rates(t, Ns, r, z, Gamma, h, cr, dtheta, cos_t, sin_t, elliptic, num_threads,
+                   single, fring, ftheta, stages[0], stages[4], profile, stats)
+
+    for st in range(1, n):
+        for i in range(t):
+            for s in range(Ns+1):
+                acc_r = acc_z = 0.0
+                for j in range(st):
+                    acc_r = acc_r + a[st][j] * stages[j, i, s]
+                    acc_z = acc_z + a[st][j] * stages[4+j, i, s]
+                stages[8, i, s] = r[i, s] + dt*acc_r
+                stages[9, i, s] = z[i, s] + dt*acc_z
+        wake_rates(t, Ns, stages[8], stages[9], Gamma, h, cr, dtheta, cos_t, sin_t, elliptic,
+                   num_threads, single, fring, ftheta, stages[st], stages[4+st], profile, stats)
+
+    for i in range(t):
+        for s in range(Ns+1):
+            acc_r = acc_z = 0.0
+            for st in range(n):
+                acc_r = acc_r + w[st] * stages[st, i, s]
+                acc_z = acc_z + w[st] * stages[4+st, i, s]
+            stages[8, i, s] = r[i, s] + dt*acc_r
+            stages[9, i, s] = z[i, s] + dt*acc_z
+            if n == 2:
+                err = max(err, 0.5*dt*fabs(stages[1, i, s] - stages[0, i, s]))
+                err = max(err, 0.5*dt*fabs(stages[5, i, s] - stages[4, i, s]))
+
+    return err
+
+
+cdef void record_step(void *ctx, int disks) with gil:
+    """ step_hook passing the rings to a wake recorder, ctx is the tuple
+        (recorder, Gamma, r, z)
+    """
+    recorder, Gamma, r, z = <object>ctx
+    recorder.record(disks, Gamma, r, z)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef int march(double h, double rho, double Omega, double b,
+                double[:, :] yE, double[:, :] dy, double[:] qh, double[:] dT, double[:] yN,
+                int Nw, int Ntt, int Ns,
+                double[:, ::1] z, double[:, ::1] r, double[:, ::1] Gamma,
+                double[:, ::1] vz, double[:, ::1] vr, double[:, ::1] work,
+                double[:, :, ::1] stages,
+                double dtheta, double[::1] cos_t, double[::1] sin_t, double cr,
+                double[:] vi, bint elliptic, int num_threads,
+                int t0, int steps, double vi_tol, int integrator, double ode_tol,
+                bint single, float[:, :, ::1] fring, float[:, ::1] ftheta,
+                step_hook hook, void *ctx, bint profile, double[::1] stats) nogil:
+    """ free-wake time stepping and rotor induced velocity for one
+        operating point, the rings on each disk are updated in place, work
+        holds (4, Ns) and stages (10, Nw+1, Ns+1) scratch values. With
+        single, the kernel runs in single precision on the copies of the
+        rings in fring (3, Nw+1, Ns+1) with the cos and sin of the theta
+        stations in ftheta. hook (if not NULL) is called with ctx after
+        each time step. With profile, the time and number of ring
+        interactions of the convection and rotor phases are added to stats.
+        Returns the number of disks in the rotor vi, those of the last step.
+    """
+    cdef int step, t, tt, i, s
+    cdef int Nd = t0
+    cdef bint have_last = False
+    cdef bint reuse_k1
+    cdef double dvi, vi_max
+    cdef double T = 2.0 * 3.141592653589793 / Omega / b
+    cdef double tol = ode_tol * yN[Ns]
+    cdef double dt, time, err, fac
+
+    cdef double[:] GammaBound = work[0]
+    cdef double[:] vr_rotor = work[1]
+    cdef double[:] vi_step = work[2]
+    cdef double[:] vi_last = work[3]
 
     # free-wake time stepping
-    for t in range(Nw+1):
-        # proceed with substeps
-        for tt in range(Ntt):
-            # Compute induced velocity on all ix(Ns+1) rings from all iix(Ns+1) rings
-            #vz = np.zeros((Nw+1, Ns+1))
-            #vr = np.zeros((Nw+1, Ns+1))
-            for i in range(Nw+1):
-                for j in range(Ns+1):
-                    vz[i, j] = 0.0
-                    vr[i, j] = 0.0
-            for i in range(t):                       # for each disk
-                for s in range(Ns+1):                # and for each ring on each disk
-                    for ii in range(t):              # add the velocity induced from each disk
-                        for ss in range(1, Ns+1):    # and each ring on each disk (inner ring cancels itself out)
-                            zr = z[ii, ss]
-                            r_scalar  = r[ii, ss]
-                            zp = z[i, s]
-                            yp = r[i, s]
-                            M  = Gamma[ii, ss] * r_scalar * dtheta / two_pi
-                            Z2 = (zp - zr)**2
-
-                            #X2 = (-r_scalar*sin_thetaArray)**2
-                            #Y2 = (yp - r_scalar*cos_thetaArray)**2
-                            #Normal = sqrt(X2 + Y2 + Z2)
-                            #vr[i, s] += np.sum(-cos_thetaArray * (zp - zr) / Norm3) * M
-                            #vz[i, s] += np.sum((cos(thetaArray) * yp - r_scalar) / Norm3) * M
-                            acc1 = acc2 = 0.0
-                            for j in range(Ntheta):
-                                X2[j] = (-r_scalar*sin_thetaArray[j])**2
-                                Y2[j] = (yp - r_scalar*cos_thetaArray[j])**2
-                                normal = sqrt(X2[j] + Y2[j] + Z2)
-                                if normal < cr:
-                                    normal = cr
-                                inv_n3 = 1.0 / ( normal * normal * normal )
-                                acc1 += -cos_thetaArray[j] * (zp - zr) * inv_n3
-                                acc2 += (cos_thetaArray[j] * yp - r_scalar) * inv_n3
-                            vr[i, s] += acc1 * M
-                            vz[i, s] += acc2 * M
-
-                            zr = -2*h - z[ii, ss]
-                            Z2 = (zp - zr)**2
-
-                            #Normal = sqrt(X2 + Y2 + Z2)
-                            #vr[i, s] -= np.sum(-cos_thetaArray * (zp - zr) / Norm3) * M
-                            #vz[i, s] -= np.sum((cos_thetaArray * yp - r_scalar) / Norm3) * M
-                            acc1 = acc2 = 0.0
-                            for j in range(Ntheta):
-                                normal = sqrt(X2[j] + Y2[j] + Z2)
-                                if normal < cr:
-                                    normal = cr
-                                inv_n3 = 1.0 / ( normal * normal * normal )
-                                acc1 -= - cos_thetaArray[j] * (zp - zr) * inv_n3
-                                acc2 -= (cos_thetaArray[j] * yp - r_scalar) * inv_n3
-                            vr[i, s] += acc1 * M
-                            vz[i, s] += acc2 * M
-
-            # Compute altitude and time power approximation
-            # if tt == 0:
-            #     PiApprox = 8 * np.sum(dT.dot(vi))
-            # realtime = two_pi / Omega / b * ((t-1) * Ntt + tt) / Ntt
-            # altitude = vc * realtime
-
-            # Convect rings downstream
-            for i in range(t):              # for each disk
-                for s in range(Ns+1):  # and for each ring on each disk
-                    z[i, s] = z[i, s] + vz[i, s]*dt
-                    r[i, s] = r[i, s] + vr[i, s]*dt
-                    Gamma[i, s] = Gamma[i, s]
+    for step in range(steps):
+        t = t0 + step
+        if t > Nw:
+            t = Nw
+        Nd = t
+
+        # Convect rings downstream
+        for i in range(Nw+1):
+            for s in range(Ns+1):
+                vz[i, s] = 0.0
+                vr[i, s] = 0.0
+
+        if t > 0:
+            if integrator != 3:
+                # proceed with substeps
+                for tt in range(Ntt):
+                    rk_step(integrator, t, Ns, T / Ntt, False, r, z, Gamma, h, cr, dtheta,
+                            cos_t, sin_t, elliptic, num_threads, single, fring, ftheta, stages,
+                            profile, stats)
+                    for i in range(t):
+                        for s in range(Ns+1):
+                            r[i, s] = stages[8, i, s]
+                            z[i, s] = stages[9, i, s]
+            else:
+                # adaptive steps starting from Ntt substeps
+                dt = T / Ntt
+                time = 0.0
+                reuse_k1 = False
+                while time < T * (1 - 1e-12):
+                    if dt > T - time:
+                        dt = T - time
+                    err = rk_step(integrator, t, Ns, dt, reuse_k1, r, z, Gamma, h, cr, dtheta,
+                                  cos_t, sin_t, elliptic, num_threads, single, fring, ftheta,
+                                  stages, profile, stats)
+                    if err <= tol or dt < 1e-6 * T:
+                        for i in range(t):
+                            for s in range(Ns+1):
+                                r[i, s] = stages[8, i, s]
+                                z[i, s] = stages[9, i, s]
+                        time = time + dt
+                        reuse_k1 = False
+                    else:
+                        reuse_k1 = True
+                    fac = 0.9 * sqrt(tol / max(err, 1e-300))
+                    dt = dt * min(2.0, max(0.2, fac))
+
+            # velocity at the start of the last step
+            for i in range(t):
+                for s in range(Ns+1):
+                    vr[i, s] = stages[0, i, s]
+                    vz[i, s] = stages[4, i, s]
 
         # Shift elements in ring array
-        for i in range(t)[::-1]:
-            Gamma[i+1, :] = Gamma[i, :]
-            r[i+1, :] = r[i, :]
-            z[i+1, :] = z[i, :]
+        for i in range(t-1, -1, -1):
+            for s in range(Ns+1):
+                Gamma[i+1, s] = Gamma[i, s]
+                r[i+1, s] = r[i, s]
+                z[i+1, s] = z[i, s]
 
         # Create nacent vortex rings
-        GammaBound = dT / (rho*(Omega*yE)*dy)
+        for s in range(Ns):
+            GammaBound[s] = dT[s] / (rho*(Omega*yE[s, 0])*dy[s, 0])
         Gamma[0, 0] = -GammaBound[0]
         for s in range(1, Ns):
             Gamma[0, s] = GammaBound[s-1] - GammaBound[s]
         Gamma[0, Ns] = GammaBound[Ns-1]
-        r[0, :] = yN.T
-        z[0, :] = qh[:]
+        for s in range(Ns+1):
+            r[0, s] = yN[s]
+            z[0, s] = qh[s]
+
+        if hook != NULL:
+            hook(ctx, t+1)
+
+        # stop adding disks once vi has converged
+        if vi_tol > 0 and t > 0:
+            rotor_point(t, Ns, yE, qh, r, z, Gamma, h, cr, dtheta, cos_t, sin_t, elliptic,
+                        num_threads, single, fring, ftheta, vr_rotor, vi_step, profile, stats)
+            dvi = vi_max = 0.0
+            for s in range(Ns):
+                dvi = max(dvi, fabs(vi_step[s] - vi_last[s]))
+                vi_max = max(vi_max, fabs(vi_step[s]))
+                vi_last[s] = vi_step[s]
+            if have_last and dvi <= vi_tol * vi_max:
+                break
+            have_last = True
 
     # Compute induced velocity on rotor (rp = [0 r(s) 0])
-    for s in range(Ns):                # for each element
-        vi[s, 0] = 0
-        for ii in range(Nw):           # add the velocity induced from each disk
-            for ss in range(1, Ns+1):  # and each ring on each disk (inner ring cancels itself out)
-                if (ii == 0):
-                    ringFrac = 0.675
-                else:
-                    ringFrac = 1
-
-                zr = z[ii, ss]
-                r_scalar  = r[ii, ss]
-                zp = (qh[s] + qh[s+1]) / 2
-                yp = yE[s, 0]
-
-                Z2 = (zp - zr)**2
-                M  = Gamma[ii, ss] * r_scalar * dtheta / two_pi
+    rotor_point(Nd, Ns, yE, qh, r, z, Gamma, h, cr, dtheta, cos_t, sin_t, elliptic,
+                num_threads, single, fring, ftheta, vr_rotor, vi, profile, stats)
 
-                #vi[s] = vi[s] + ringFrac * np.sum((cos(self.thetaArray)*yp - r) / Norm3) * M
-                acc1 = 0.0
-                for j in range(Ntheta):
-                    X2[j] = (-r_scalar*sin_thetaArray[j])**2
-                    Y2[j] = (yp - r_scalar*cos_thetaArray[j])**2
-                    normal = sqrt(X2[j] + Y2[j] + Z2)
-                    if normal < cr:
-                        normal = cr
-                    inv_n3 = 1.0 / ( normal * normal * normal )
-                    acc1 += (cos_thetaArray[j]*yp - r_scalar) * inv_n3
-                vi[s, 0] += ringFrac * acc1 * M
+    return Nd
 
-                # ground effect ring
-                zr = -2*h - z[ii, ss]
-                Z2 = (zp - zr)**2
 
-                #vi[s] = vi[s] - ringFrac * np.sum((cos(self.thetaArray)*yp - r) / Norm3) * M
-                acc2 = 0.0
-                for j in range(Ntheta):
-                    normal = sqrt(X2[j] + Y2[j] + Z2)
-                    if normal < cr:
-                        normal = cr
-                    inv_n3 = 1.0 / ( normal * normal * normal )
-                    acc2 += (cos_thetaArray[j]*yp - r_scalar) * inv_n3
-                vi[s, 0] -= ringFrac * acc2 * M
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+@cython.cdivision(True)
+def main_loop(
+    double h,
+    double rho,
+    double[:, :] yE,
+    double[:, :] dy,
+    double[:] qh,
+    int Nw,
+    int Ntt,
+    int Ns,
+    double[:, ::1] z,
+    double[:, ::1] r,
+    double[:, ::1] Gamma,
+    double Omega,
+    double[:, :] dT,
+    double[:] yN,
+    double b,
+    double dtheta,
+    unsigned int Ntheta,
+    double[:] thetaArray,
+    double cr,
+    double[:, :] vi,
+    bint elliptic=False,
+    int num_threads=1,
+    int t0=0,
+    int steps=-1,
+    double vi_tol=0.,
+    int integrator=0,
+    double ode_tol=1e-3,
+    bint single=False,
+    recorder=None,
+    stats=None):
+
+    """ free-wake time stepping and rotor induced velocity, the rings on
+        each disk are updated in place. Runs without the GIL, with the
+        target rings shared out over num_threads OpenMP threads.
+        Marches the given number of steps (all Nw+1 by default) starting
+        with t0 disks in the wake, or until vi changes by less than vi_tol
+        between steps. With single, the kernel runs in single precision.
+        The rings of each time step are passed to the record method of
+        the recorder, if given. The time and number of ring interactions
+        of the convection and rotor phases are added to stats, if given.
+        Also returns the number of disks in the rotor vi.
+    """
 
-    return vz, vr, z, r, Gamma, vi
+    cdef double[::1] cos_t = np.cos(np.asarray(thetaArray))
+    cdef double[::1] sin_t = np.sin(np.asarray(thetaArray))
+    cdef double[:, ::1] vz = np.zeros((Nw+1, Ns+1))
+    cdef double[:, ::1] vr = np.zeros((Nw+1, Ns+1))
+    cdef double[:, ::1] work = np.zeros((4, Ns))
+    cdef double[:, :, ::1] stages = np.zeros((10, Nw+1, Ns+1))
+    cdef float[:, :, ::1] fring = np.zeros((3, Nw+1, Ns+1), dtype=np.float32)
+    cdef float[:, ::1] ftheta = np.array([cos_t, sin_t], dtype=np.float32)
+    cdef step_hook hook = NULL
+    cdef void *ctx = NULL
+    cdef bint profile = stats is not None
+    cdef double[::1] stats_v = stats if profile else np.zeros(4)
+    cdef int Nd
+
+    state = None
+    if recorder is not None:
+        state = (recorder, np.asarray(Gamma), np.asarray(r), np.asarray(z))
+        hook = record_step
+        ctx = <void *>state
+
+    if num_threads < 1:
+        num_threads = 1
+    if steps < 0:
+        steps = Nw + 1 - t0
+
+    with nogil:
+        Nd = march(h, rho, Omega, b, yE, dy, qh, dT[:, 0], yN, Nw, Ntt, Ns,
+                   z, r, Gamma, vz, vr, work, stages, dtheta, cos_t, sin_t, cr,
+                   vi[:, 0], elliptic, num_threads, t0, steps, vi_tol, integrator, ode_tol,
+                   single, fring, ftheta, hook, ctx, profile, stats_v)
+
+    return np.asarray(vz), np.asarray(vr), np.asarray(z), np.asarray(r), \
+           np.asarray(Gamma), np.asarray(vi), Nd
 
 
-class VortexRingC(Component):
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def vortex_ring_batchC(b, yN, rho, Omega, h, dT, q, anhedral=0., kernel='quadrature',
+                       Nw=0, Ntt=0, Ntheta=0, int num_threads=1):
+    """ VortexRing evaluated for a batch of operating points (see
+        vortex.vortex_ring_batch), compiled and with the operating points
+        shared out over num_threads OpenMP threads.
+    """
+    cdef int i, B, Ns_, Nw_, Ntt_
+    cdef double b_ = b, rho_ = rho, cr, dtheta
+    cdef bint elliptic = kernel == 'elliptic'
+
+    yN, Omega, h, dT, qh, yE, dy, (Nw, Ntt, Ntheta), cr, thetaArray = \
+        batch_inputs(yN, Omega, h, dT, q, anhedral, Nw, Ntt, Ntheta)
+
+    B = len(Omega)
+    Ns_ = len(yN) - 1
+    Nw_ = Nw
+    Ntt_ = Ntt
+    dtheta = pi / Ntheta
+
+    cdef double[::1] Omega_v = Omega
+    cdef double[::1] h_v = h
+    cdef double[:, ::1] dT_v = dT
+    cdef double[:, ::1] qh_v = qh
+    cdef double[::1] yN_v = yN
+    cdef double[:, :] yE_v = yE.reshape(Ns_, 1)
+    cdef double[:, :] dy_v = dy.reshape(Ns_, 1)
+
+    cdef double[::1] cos_t = np.cos(thetaArray)
+    cdef double[::1] sin_t = np.sin(thetaArray)
+
+    cdef double[:, :, ::1] Gamma = np.zeros((B, Nw+1, Ns_+1))
+    cdef double[:, :, ::1] r = np.zeros((B, Nw+1, Ns_+1))
+    cdef double[:, :, ::1] z = np.zeros((B, Nw+1, Ns_+1))
+    cdef double[:, :, ::1] vz = np.zeros((B, Nw+1, Ns_+1))
+    cdef double[:, :, ::1] vr = np.zeros((B, Nw+1, Ns_+1))
+    cdef double[:, :, ::1] work = np.zeros((B, 4, Ns_))
+    cdef double[:, :, :, ::1] stages = np.zeros((B, 10, Nw+1, Ns_+1))
+    cdef float[:, :, :, ::1] fring = np.zeros((B, 3, 1, 1), dtype=np.float32)
+    cdef float[:, ::1] ftheta = np.zeros((2, 1), dtype=np.float32)
+    cdef double[::1] stats = np.zeros(4)
+    cdef double[:, ::1] vi = np.zeros((B, Ns_))
+
+    if num_threads < 1:
+        num_threads = 1
+
+    with nogil:
+        for i in prange(B, num_threads=num_threads, schedule='dynamic'):
+            march(h_v[i], rho_, Omega_v[i], b_, yE_v, dy_v, qh_v[i], dT_v[i], yN_v,
+                  Nw_, Ntt_, Ns_, z[i], r[i], Gamma[i], vz[i], vr[i], work[i], stages[i],
+                  dtheta, cos_t, sin_t, cr, vi[i], elliptic, 1, 0, Nw_+1, 0., 0, 0.,
+                  False, fring[i], ftheta, NULL, NULL, False, stats)
+
+    # vi is positive downwards
+    return -np.asarray(vi), np.asarray(Gamma), np.asarray(r), np.asarray(z)
+
+
+class VortexRingC(VortexRing):
     """ Vortex ring calculations
         Computes the induced velocity on the rotor blades given the
-        thrust distribution on the rotor
+        thrust distribution on the rotor (cython compiled version)
     """
 
     def __init__(self, Ns):
-        super(VortexRingC, self).__init__()
-
-        # inputs
-        self.add('b',        Int(0, iotype='in', desc='number of blades'))
-        self.add('Ns',       Int(0, iotype='in', desc='number of elements'))
+        super(VortexRingC, self).__init__(Ns)
 
-        self.add('yN',       Array(np.zeros(Ns+1), iotype='in', desc='node locations'))
+        self.add('num_threads', Int(1, iotype='in', desc='number of threads for the wake kernel'))
+        self.add('precision', Enum('double', ('double', 'single', 'validate'), iotype='in',
+                                   desc='precision of the wake kernel, validate runs the single '
+                                        'precision kernel and reports the difference from double'))
 
-        self.add('rho',      Float(0., iotype='in', desc='air density'))
-        self.add('vc',       Float(0., iotype='in', desc='vertical velocity'))
-        self.add('Omega',    Float(0., iotype='in', desc='rotor angular velocity'))
-        self.add('h',        Float(0., iotype='in', desc='height of rotor'))
+        self.add('dvi_single', Array(np.zeros(Ns), iotype='out',
+                                     desc='difference in vi of the single precision kernel from double '
+                                          '(with precision validate)'))
 
-        self.add('dT',       Array(np.zeros((Ns, 1)),       iotype='in', desc='thrust'))
-        self.add('q',        Array(np.zeros((6*(Ns+1), 1)), iotype='in', desc='deformation'))
+        self._single = False
 
-        self.add('anhedral', Float(0., iotype='in'))
-
-        # outputs
-        self.add('vi',       Array(np.zeros(Ns), iotype='out', desc='induced velocity'))
-        self.add('Gamma',    Array(np.zeros(Ns), iotype='out', desc='vortex strength'))
-        self.add('z',        Array(np.zeros(Ns), iotype='out', desc=''))
-        self.add('r',        Array(np.zeros(Ns), iotype='out', desc=''))
-        self.add('vz',       Array(np.zeros(Ns), iotype='out', desc=''))
-        self.add('vr',       Array(np.zeros(Ns), iotype='out', desc=''))
+        # frozen and warm wakes of the double precision reference of
+        # validate, which is not recorded
+        self._reference = (None, None)
 
     def execute(self):
-        dy = np.zeros((self.Ns, 1))
-        yE = np.zeros((self.Ns, 1))
-        for s in range(self.Ns):
-            dy[s] = self.yN[s+1] - self.yN[s]  # length of each element
-            yE[s] = 0.5 * (self.yN[s] + self.yN[s+1])  # radial location of each element
-
-        # set fidelity
-        if self.Ns == 15:
-            Nw = 15
-            Ntt = 5
-            Ntheta = 40
-        elif self.Ns == 10:
-            Nw = 8
-            Ntt = 3
-            Ntheta = 20
+        self.dvi_single = np.zeros((self.Ns, 1))
+
+        if self.precision != 'validate':
+            self._single = self.precision == 'single'
+            super(VortexRingC, self).execute()
+            return
+
+        # reference solution in double precision, on its own frozen and
+        # warm wakes
+        frozen, wake, recorder = self._frozen, self._wake, self._recorder
+        self._frozen, self._wake = self._reference
+
+        self._single = False
+        try:
+            super(VortexRingC, self).execute()
+        finally:
+            self._reference = (self._frozen, self._wake)
+            self._frozen, self._wake, self._recorder = frozen, wake, recorder
+        vi = self.vi.copy()
+
+        self._single = True
+        super(VortexRingC, self).execute()
+        self.dvi_single = self.vi - vi
+
+    def open_wake_file(self, Nw):
+        """ start a run of the recorder of the wake_file, except for the
+            double precision reference of validate
+        """
+        if self._single or self.precision != 'validate':
+            super(VortexRingC, self).open_wake_file(Nw)
         else:
-            Nw = 5
-            Ntt = 1
-            Ntheta = 15
-
-        # Break out deformations
-        qq = np.zeros((6, self.Ns+1))
-        for s in range(1, self.Ns+1):
-            qq[:, s] = self.q[s*6:s*6+6].T
-        qh = (qq[2, :] - self.yN.T * self.anhedral).flatten()
-
-        cr = 0.5 * mean(dy)
+            self._recorder = None
+
+    def free_wake(self, yE, dy, qh, Nw, Ntt, cr, t0=0, steps=None, vi_tol=0.):
+        """ free-wake time stepping of the vortex rings, followed by the
+            induced velocity on the rotor. Marches the given number of
+            steps (all Nw+1 by default) starting with t0 disks in the wake,
+            or until vi changes by less than vi_tol between steps. The
+            rotor vi is from the disks of the last step.
+        """
+        if self.tree_theta > 0:
+            # the treecode is only available in the python version
+            if self._single:
+                raise Exception('the single precision kernel is not available with the treecode')
+            return super(VortexRingC, self).free_wake(yE, dy, qh, Nw, Ntt, cr, t0, steps, vi_tol)
+
+        if steps is None:
+            steps = Nw + 1 - t0
+
+        Ntheta = len(self.thetaArray)
         dtheta = pi / Ntheta
-        self.thetaArray = linspace(dtheta/2, pi - dtheta/2, Ntheta)
-
-        # pre-allocate
-        self.Gamma = np.zeros((Nw+1, self.Ns+1))
-        self.z     = np.zeros((Nw+1, self.Ns+1))
-        self.r     = np.zeros((Nw+1, self.Ns+1))
-        self.vz    = np.zeros((Nw+1, self.Ns+1))
-        self.vr    = np.zeros((Nw+1, self.Ns+1))
-        self.vi    = np.zeros((self.Ns, 1))
 
-        # create nacent vortex rings
-        GammaBound = self.dT / (self.rho*(self.Omega*yE)*dy)
-
-        self.Gamma[0, 0] = -GammaBound[0]
-        for s in range(1, self.Ns):
-            self.Gamma[0, s] = GammaBound[s-1] - GammaBound[s]
-        self.Gamma[0, self.Ns] = GammaBound[self.Ns-1]
-
-        self.r[0, :] = self.yN.T
-        self.z[0, :] = qh[:]
-
-        self.vz, self.vr, self.z, self.r, self.Gamma, self.vi = main_loop(
+        self.vz, self.vr, self.z, self.r, self.Gamma, self.vi, self._Nd = main_loop(
             self.h,
             self.rho,
             yE,
@@ -304,7 +808,14 @@ class VortexRingC(Component):
             Ntheta,
             self.thetaArray,
             cr,
-            self.vi)
-
-        # vi is positive downwards
-        self.vi = -self.vi
+            self.vi,
+            self.kernel == 'elliptic',
+            self.num_threads,
+            t0,
+            steps,
+            vi_tol,
+            ('euler', 'rk2', 'rk4', 'adaptive').index(self.integrator),
+            self.ode_tol,
+            self._single,
+            self._recorder,
+            self._stats)
@@ -0,0 +1,154 @@
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+from openmdao.main.api import Component
+from openmdao.main.datatypes.api import Int, Float, Array, Str, Bool
+
+from Atlas import vortex_ring_batchC
+
+
+def table_chunk(args):
+    """ normalized vi for a chunk of table points (used by the pool of
+        build_vortex_table)
+    """
+    b, yN, L, hR, kernel, Nw, Ntt, Ntheta = args
+    B = len(hR)
+
+    vi, _, _, _ = vortex_ring_batchC(b, yN, 1., np.ones(B), hR, L, np.zeros((B, 6*len(yN))),
+                                     kernel=kernel, Nw=Nw, Ntt=Ntt, Ntheta=Ntheta)
+    return np.asarray(vi)
+
+
+def build_vortex_table(filename, b, yN, modes, amplitudes, hR, kernel='quadrature',
+                       Nw=0, Ntt=0, Ntheta=0, processes=None, chunk=16):
+    """ Sample the free wake over a grid of normalized operating points and
+        save the induced velocity as a table (.npz) for
+        TabulatedInducedVelocity.
+
+        yN are the node locations normalized by the rotor radius and modes
+        (K, Ns) the shapes of the normalized thrust dT / (rho Omega^2 R^4)
+        on each element. The grid is the product of the mode amplitudes
+        (K sequences) and the heights h/R, each increasing with at least 2
+        values. The table holds vi / (Omega R) for the rigid rotor at every
+        grid point, and is evaluated by chunks of points on a pool of
+        processes (all cpus by default).
+    """
+    yN = np.asarray(yN, dtype=float).flatten()
+    modes = np.atleast_2d(np.asarray(modes, dtype=float))
+    amplitudes = [np.asarray(a, dtype=float) for a in amplitudes]
+    hR = np.asarray(hR, dtype=float)
+    Ns = len(yN) - 1
+
+    if modes.shape != (len(amplitudes), Ns):
+        raise Exception('modes must have one row of %d elements for each set of amplitudes' % Ns)
+
+    for axis in amplitudes + [hR]:
+        if axis.ndim != 1 or len(axis) < 2 or np.any(np.diff(axis) <= 0):
+            raise Exception('the amplitudes and heights must each be increasing sequences of '
+                            'at least 2 values')
+
+    points = np.array(list(itertools.product(*(amplitudes + [hR]))))
+    L = points[:, :-1].dot(modes)
+
+    chunks = [(b, yN, L[i:i+chunk], points[i:i+chunk, -1], kernel, Nw, Ntt, Ntheta)
+              for i in range(0, len(points), chunk)]
+
+    if processes == 1:
+        vi = map(table_chunk, chunks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            vi = pool.map(table_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+
+    shape = [len(a) for a in amplitudes] + [len(hR), Ns]
+    tables = dict(('amplitudes%d' % k, a) for k, a in enumerate(amplitudes))
+    np.savez_compressed(filename, b=b, yN=yN, modes=modes, hR=hR,
+                        vi=np.concatenate(vi).reshape(shape), **tables)
+
+
+def interpolate(axes, values, x):
+    """ multilinear interpolation of values on the grid of axes at the
+        point x, extrapolating linearly from the boundary cells
+    """
+    i0 = []
+    t = []
+    for axis, xk in zip(axes, x):
+        i = min(max(np.searchsorted(axis, xk) - 1, 0), len(axis) - 2)
+        i0.append(i)
+        t.append((xk - axis[i]) / (axis[i+1] - axis[i]))
+
+    cell = values[tuple(slice(i, i+2) for i in i0)]
+    for tk in t:
+        cell = (1 - tk) * cell[0] + tk * cell[1]
+
+    return cell
+
+
+class TabulatedInducedVelocity(Component):
+    """ Induced velocity on the rotor interpolated from a table of free-wake
+        solutions (see build_vortex_table). The thrust is projected onto the
+        modes of the table by least squares.
+    """
+
+    def __init__(self, Ns):
+        super(TabulatedInducedVelocity, self).__init__()
+
+        # inputs
+        self.add('table',    Str('', iotype='in', desc='induced velocity table file'))
+
+        self.add('b',        Int(0, iotype='in', desc='number of blades'))
+        self.add('Ns',       Int(0, iotype='in', desc='number of elements'))
+
+        self.add('yN',       Array(np.zeros(Ns+1), iotype='in', desc='node locations'))
+
+        self.add('rho',      Float(0., iotype='in', desc='air density'))
+        self.add('Omega',    Float(0., iotype='in', desc='rotor angular velocity'))
+        self.add('h',        Float(0., iotype='in', desc='height of rotor'))
+
+        self.add('dT',       Array(np.zeros((Ns, 1)), iotype='in', desc='thrust'))
+
+        # outputs
+        self.add('vi',       Array(np.zeros(Ns), iotype='out', desc='induced velocity'))
+        self.add('amplitudes', Array(np.zeros(0), iotype='out', desc='amplitudes of the thrust modes'))
+        self.add('extrapolated', Bool(False, iotype='out',
+                                      desc='the amplitudes or height are outside the table, and vi is '
+                                           'extrapolated'))
+
+        # table of the last file read, with its name, modification time and
+        # size
+        self._table = None
+
+    def load(self):
+        """ read the table file, again only when the file has changed
+        """
+        stat = os.stat(self.table)
+        key = (self.table, stat.st_mtime, stat.st_size)
+        if self._table is None or self._table[0] != key:
+            with np.load(self.table) as data:
+                modes = data['modes']
+                axes = [data['amplitudes%d' % k] for k in range(len(modes))] + [data['hR']]
+                self._table = (key, int(data['b']), data['yN'], np.linalg.pinv(modes.T),
+                               axes, data['vi'])
+
+        return self._table[1:]
+
+    def execute(self):
+        b, yN, P, axes, vi = self.load()
+
+        R = np.max(self.yN)
+        if b != self.b or len(yN) != self.Ns+1 or not np.allclose(yN, self.yN / R):
+            raise Exception('the blades and nodes of the rotor do not match the table %s' % self.table)
+
+        # normalized thrust, height and induced velocity
+        L = np.asarray(self.dT, dtype=float).flatten() / (self.rho * self.Omega**2 * R**4)
+        self.amplitudes = P.dot(L)
+
+        x = np.append(self.amplitudes, self.h / R)
+        self.extrapolated = any(xk < axis[0] or xk > axis[-1] for axis, xk in zip(axes, x))
+        self.vi = (interpolate(axes, vi, x) * self.Omega * R).reshape(self.Ns, 1)
@@ -0,0 +1,119 @@
+import os
+import threading
+from Queue import Queue
+
+import numpy as np
+
+
+# file header, followed by fixed-size frames of the ring geometry
+HEADER = np.dtype([('magic', 'S4'), ('version', '<i4'), ('rows', '<i4'), ('cols', '<i4')])
+MAGIC = 'WAKE'
+
+
+def frame_dtype(shape):
+    """ one frame of the wake: run and step number, number of disks in
+        the wake and the ring strength and geometry (shape (Nw+1, Ns+1))
+    """
+    return np.dtype([('run',   '<i4'),
+                     ('step',  '<i4'),
+                     ('disks', '<i4'),
+                     ('pad',   '<i4'),
+                     ('Gamma', '<f8', shape),
+                     ('r',     '<f8', shape),
+                     ('z',     '<f8', shape)])
+
+
+def read_header(filename):
+    """ frame shape of a wake file """
+    header = np.fromfile(filename, dtype=HEADER, count=1)
+    if len(header) != 1 or header['magic'][0] != MAGIC:
+        raise Exception('%s is not a wake file' % filename)
+
+    return int(header['rows'][0]), int(header['cols'][0])
+
+
+def read_wake(filename):
+    """ frames of a wake file, memory mapped (read only) as a record array
+        with the fields of frame_dtype
+    """
+    dtype = frame_dtype(read_header(filename))
+    n = (os.path.getsize(filename) - HEADER.itemsize) // dtype.itemsize
+
+    if n == 0:
+        return np.zeros(0, dtype=dtype)
+
+    return np.memmap(filename, dtype=dtype, mode='r', offset=HEADER.itemsize, shape=(n,))
+
+
+class WakeRecorder(object):
+    """ Appends the ring geometry of each wake time step to a binary file,
+        one fixed-size frame per step, from a background writer thread.
+        The frames of each run of the wake are numbered by run and step.
+    """
+
+    def __init__(self, filename, shape):
+        self.filename = filename
+        self.shape = tuple(shape)
+        self.dtype = frame_dtype(self.shape)
+        self.run = -1
+        self.step = 0
+
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            if read_header(filename) != self.shape:
+                raise Exception('the frames of %s do not have the shape %s' % (filename, self.shape))
+            frames = read_wake(filename)
+            if len(frames) > 0:
+                self.run = int(frames['run'][-1])
+            del frames
+            self._file = open(filename, 'ab')
+        else:
+            self._file = open(filename, 'ab')
+            header = np.zeros(1, dtype=HEADER)
+            header['magic'] = MAGIC
+            header['version'] = 1
+            header['rows'], header['cols'] = self.shape
+            self._file.write(header.tostring())
+
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._write)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _write(self):
+        """ writer thread """
+        while True:
+            data = self._queue.get()
+            if data is None:
+                self._queue.task_done()
+                break
+            self._file.write(data)
+            self._queue.task_done()
+
+    def new_run(self):
+        """ start numbering the frames of a new run """
+        self.run += 1
+        self.step = 0
+
+    def record(self, disks, Gamma, r, z):
+        """ queue a frame with the first disks of the wake in use """
+        frame = np.zeros(1, dtype=self.dtype)
+        frame['run'] = self.run
+        frame['step'] = self.step
+        frame['disks'] = disks
+        frame['Gamma'] = Gamma
+        frame['r'] = r
+        frame['z'] = z
+
+        self._queue.put(frame.tostring())
+        self.step += 1
+
+    def flush(self):
+        """ wait for the queued frames to be written """
+        self._queue.join()
+        self._file.flush()
+
+    def close(self):
+        """ write the queued frames and close the file """
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()